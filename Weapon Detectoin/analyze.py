@@ -0,0 +1,338 @@
+"""
+Offline analysis of recorded footage, as fast as the hardware allows.
+
+Each video is split into time segments, and segments from every file are spread over
+a pool of worker processes (one WeaponDetector each). Inside a worker a decoder
+thread reads ahead while the model runs batched calls over consecutive frames.
+
+Output, per video, under --out:
+    <video>-<key>/seg_00003.jsonl   One line per frame with detections (frame, t, detections)
+    <video>-<key>/detections.jsonl  All segments merged in order, once the video is done
+    summary.json                    Throughput, as multiples of real time
+
+Frames with confirmed detections (at most one per --evidence-interval seconds) go into
+the EvidenceLocker as one incident per video. Interrupted runs resume: finished
+segments are skipped and unfinished ones redone, without securing their frames twice.
+
+    python analyze.py recordings/*.mp4 --out analysis --workers 4
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+_detector = None  # One per worker process
+
+
+def _init_worker(options):
+    global _detector
+    cv2.setNumThreads(1)  # Parallelism comes from the processes; don't oversubscribe cores
+    from detector import WeaponDetector
+    _detector = WeaponDetector(options["model_path"], options["confidence"], backend=options["backend"],
+                               int8=options["int8"], calibration=options["calibration"],
+                               model_cache=options["model_cache"])
+    _detector.set_high_res_mode(options["high_res"], wait=True)
+    _detector.set_tiled_mode(options["tiled"], wait=True)
+    _detector.set_privacy(options["privacy"])
+
+
+def _decode(path, start, end, stride, frames, stop):
+    """Decoder thread: (frame index, frame) for every `stride`th frame in [start, end), then None."""
+    cap = cv2.VideoCapture(path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    index = start
+    try:
+        while (end is None or index < end) and not stop.is_set():
+            if (index - start) % stride:
+                ok, frame = cap.grab(), None
+            else:
+                ok, frame = cap.read()
+            if not ok:
+                break
+            if frame is not None:
+                frames.put((index, frame))
+            index += 1
+    finally:
+        cap.release()
+        frames.put(None)
+
+
+def analyze_segment(task):
+    """
+    Worker: run one segment, streaming detections to its .part file.
+    Returns stats and the flagged frames (annotated, privacy-blurred) for the evidence locker.
+    """
+    from incident import annotate
+    detector = _detector
+    detector.reset_tracks()  # Every segment is tracked on its own
+
+    frames = queue.Queue(maxsize=task["batch_size"] * 2)
+    stop = threading.Event()
+    # Pre-roll: tracks need `persistence_threshold` hits before they confirm, so decoding
+    # starts a little early and those frames are tracked but not reported
+    decode_from = max(0, task["start"] - detector.persistence_threshold * task["stride"])
+    decoder = threading.Thread(target=_decode, args=(task["path"], decode_from, task["end"], task["stride"],
+                                                     frames, stop), daemon=True)
+    started = time.perf_counter()
+    decoder.start()
+
+    fps = task["fps"]
+    flagged, last_flagged = [], None
+    infer_s, analyzed, last_index, done = 0.0, 0, task["start"], False
+    try:
+        with open(task["part_path"], 'w') as out:
+            while not done:
+                batch = []
+                while len(batch) < task["batch_size"]:
+                    item = frames.get()
+                    if item is None:
+                        done = True
+                        break
+                    batch.append(item)
+                if not batch:
+                    break
+
+                infer_start = time.perf_counter()
+                outputs = detector.detect_sequence([frame for _, frame in batch])
+                infer_s += time.perf_counter() - infer_start
+
+                for (index, frame), (detections, _, _) in zip(batch, outputs):
+                    last_index = index
+                    if index < task["start"]:
+                        continue
+                    analyzed += 1
+                    if not detections:
+                        continue
+                    out.write(json.dumps({"frame": index, "t": round(index / fps, 3),
+                                          "detections": detections}) + "\n")
+                    confirmed = [det for det in detections if det.get('confirmed')]
+                    if confirmed and (last_flagged is None or index - last_flagged >= task["evidence_interval"] * fps):
+                        last_flagged = index
+                        annotate(frame, detections)
+                        flagged.append((index, frame, confirmed))
+                out.flush()
+    finally:
+        # Stop the decoder and unblock it if it is waiting on a full queue, so it
+        # always reaches its final put and exits
+        stop.set()
+        while not done and frames.get() is not None:
+            pass
+
+    end = task["end"] if task["end"] is not None else last_index + 1
+    return {
+        "video": task["video"],
+        "segment": task["segment"],
+        "frames": analyzed,
+        "video_seconds": (end - task["start"]) / fps,
+        "wall_seconds": time.perf_counter() - started,
+        "infer_seconds": infer_s,
+        "flagged": flagged,
+    }
+
+
+def _video_key(path):
+    """Stable per-video directory name; stat instead of hashing hours of footage."""
+    st = os.stat(path)
+    digest = hashlib.sha256(f"{os.path.abspath(path)}|{st.st_size}|{int(st.st_mtime)}".encode()).hexdigest()
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{digest[:10]}"
+
+
+def plan(paths, out_dir, segment_seconds):
+    """Per-video manifests (created once, reused on resume)."""
+    videos = []
+    for path in paths:
+        key = _video_key(path)
+        video_dir = os.path.join(out_dir, key)
+        manifest_path = os.path.join(video_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                videos.append(json.load(f))
+            continue
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"Could not open {path}, skipping")
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total > 0:
+            step = max(1, int(segment_seconds * fps))
+            bounds = [(s, min(s + step, total)) for s in range(0, total, step)]
+        else:
+            bounds = [(0, None)]  # Unknown length: one segment to the end of the file
+        manifest = {"path": path, "key": key, "dir": video_dir, "fps": fps, "frames": total,
+                    "segments": bounds, "incident_id": None, "secured": []}
+        os.makedirs(video_dir, exist_ok=True)
+        _write_json(manifest_path, manifest)
+        videos.append(manifest)
+    return videos
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _segment_path(video, segment):
+    return os.path.join(video["dir"], f"seg_{segment:05d}.jsonl")
+
+
+def _secured_frames(locker, video):
+    """
+    Frame indices of this video already in the evidence chain. The manifest is updated
+    after every flush; the chain also covers a crash between the flush and that write.
+    """
+    secured = set(video.get("secured", []))
+    if video["incident_id"] is not None:
+        for entry in locker.iter_chain():
+            data = entry["data"]
+            if data["incident_id"] == video["incident_id"] and data["meta"]:
+                secured.add(data["meta"][0]["frame"])
+    return secured
+
+
+def _merge(video):
+    """Concatenate a finished video's segments in order into detections.jsonl."""
+    target = os.path.join(video["dir"], "detections.jsonl")
+    with open(target + ".tmp", 'w') as out:
+        for segment in range(len(video["segments"])):
+            with open(_segment_path(video, segment)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    record["video"] = video["path"]
+                    out.write(json.dumps(record) + "\n")
+    os.replace(target + ".tmp", target)
+    return target
+
+
+def run(paths, out_dir="analysis", workers=2, segment_seconds=300, batch_size=8, stride=1,
+        evidence_dir="snapshots", evidence_interval=1.0, detector_options=None):
+    from evidence import EvidenceLocker
+
+    os.makedirs(out_dir, exist_ok=True)
+    videos = plan(paths, out_dir, segment_seconds)
+    locker = EvidenceLocker(evidence_dir)
+
+    tasks, remaining = [], {}
+    for video in videos:
+        todo = [i for i in range(len(video["segments"])) if not os.path.exists(_segment_path(video, i))]
+        remaining[video["key"]] = set(todo)
+        for i in todo:
+            start, end = video["segments"][i]
+            tasks.append({"video": video["key"], "path": video["path"], "segment": i, "start": start, "end": end,
+                          "fps": video["fps"], "stride": stride, "batch_size": batch_size,
+                          "evidence_interval": evidence_interval,
+                          "part_path": _segment_path(video, i) + ".part"})
+    by_key = {video["key"]: video for video in videos}
+    # Segments that crashed after their evidence was chained are redone; don't chain it twice
+    secured = {video["key"]: _secured_frames(locker, video) for video in videos if remaining[video["key"]]}
+    skipped = sum(len(v["segments"]) for v in videos) - len(tasks)
+    print(f"{len(videos)} video(s), {len(tasks)} segment(s) to analyze"
+          + (f", {skipped} already done" if skipped else ""))
+
+    totals = {"frames": 0, "video_seconds": 0.0, "infer_seconds": 0.0, "flagged": 0, "segments": 0}
+    started = time.perf_counter()
+    ctx = mp.get_context("spawn")
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                               initargs=(detector_options,))
+    finished = False
+    try:
+        futures = [pool.submit(analyze_segment, task) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            video = by_key[result["video"]]
+
+            if result["flagged"]:
+                if video["incident_id"] is None:
+                    video["incident_id"] = locker.create_incident_id(f"offline_{video['key']}")
+                    _write_json(os.path.join(video["dir"], "manifest.json"), video)
+                done = secured[video["key"]]
+                for index, frame, detections in result["flagged"]:
+                    if index in done:
+                        continue
+                    t = index / video["fps"]
+                    meta = [dict(det, source=video["path"], frame=index, video_time=round(t, 3))
+                            for det in detections]
+                    # Frame index as shot index keeps file names stable across resumed runs
+                    locker.secure_evidence_async(frame, meta, incident_id=video["incident_id"], shot_index=index)
+                    done.add(index)
+                    totals["flagged"] += 1
+                locker.flush()
+                video["secured"] = sorted(done)
+                _write_json(os.path.join(video["dir"], "manifest.json"), video)
+            # Only now is the segment done; a crash before this redoes it on resume
+            part = _segment_path(video, result["segment"]) + ".part"
+            os.replace(part, _segment_path(video, result["segment"]))
+
+            remaining[video["key"]].discard(result["segment"])
+            if not remaining[video["key"]]:
+                print(f"{video['path']}: done -> {_merge(video)}")
+
+            totals["segments"] += 1
+            for key in ("frames", "video_seconds", "infer_seconds"):
+                totals[key] += result[key]
+            elapsed = time.perf_counter() - started
+            print(f"[{totals['segments']}/{len(tasks)}] {video['path']} segment {result['segment']}: "
+                  f"{result['frames']} frames, {result['video_seconds'] / result['wall_seconds']:.1f}x real time "
+                  f"(overall {totals['video_seconds'] / elapsed:.1f}x)")
+        finished = True
+    except KeyboardInterrupt:
+        print("Interrupted; run again with the same --out to resume.")
+        raise
+    finally:
+        # After an error or interrupt, drop the queued segments instead of running them
+        pool.shutdown(wait=finished, cancel_futures=not finished)
+        locker.close()
+
+    elapsed = time.perf_counter() - started
+    summary = dict(totals, wall_seconds=elapsed, workers=workers, batch_size=batch_size, stride=stride,
+                   realtime_multiple=totals["video_seconds"] / elapsed if elapsed else 0.0,
+                   frames_per_second=totals["frames"] / elapsed if elapsed else 0.0)
+    _write_json(os.path.join(out_dir, "summary.json"), summary)
+    print(f"Analyzed {totals['video_seconds'] / 60:.1f} min of video in {elapsed:.1f}s: "
+          f"{summary['realtime_multiple']:.1f}x real time, {summary['frames_per_second']:.1f} frames/s, "
+          f"{totals['flagged']} frame(s) secured as evidence")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded video offline")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--out", default="analysis", help="Output directory (reuse it to resume)")
+    parser.add_argument("--workers", type=int, default=2, help="Detector processes")
+    parser.add_argument("--segment-seconds", type=float, default=300)
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per model call")
+    parser.add_argument("--stride", type=int, default=1, help="Analyze every Nth frame")
+    parser.add_argument("--evidence-dir", default="snapshots")
+    parser.add_argument("--evidence-interval", type=float, default=1.0,
+                        help="Seconds of video between frames secured as evidence")
+    parser.add_argument("--model", default="yolov8m.pt")
+    parser.add_argument("--backend", default="torch", choices=("torch", "onnx", "openvino"))
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--calibration", action="append", default=[])
+    parser.add_argument("--model-cache", default="model_cache")
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--high-res", action="store_true")
+    parser.add_argument("--tiled", action="store_true")
+    parser.add_argument("--no-privacy", dest="privacy", action="store_false")
+    args = parser.parse_args()
+
+    options = {"model_path": args.model, "confidence": args.confidence, "backend": args.backend,
+               "int8": args.int8, "calibration": args.calibration, "model_cache": args.model_cache,
+               "high_res": args.high_res, "tiled": args.tiled, "privacy": args.privacy}
+    run(args.videos, args.out, args.workers, args.segment_seconds, args.batch_size, args.stride,
+        args.evidence_dir, args.evidence_interval, options)
+
+
+if __name__ == "__main__":
+    main()
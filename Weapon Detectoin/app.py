@@ -1,14 +1,26 @@
-import customtkinter as ctk
-from tkinter import filedialog
-import cv2
-from PIL import Image, ImageTk
-from detector import WeaponDetector
-from notifier import AlertManager
-from evidence import EvidenceLocker
+from startup import startup  # First: starts the startup clock
+with startup.importing("customtkinter"):
+    import customtkinter as ctk
+    from tkinter import filedialog
+with startup.importing("cv2"):
+    import cv2
+with startup.importing("PIL"):
+    from display import DisplayRenderer, scale_boxes, scale_detections
+with startup.importing("app modules"):
+    from detector import WeaponDetector
+    from notifier import AlertManager
+    from evidence import EvidenceLocker
+    from pipeline import FramePipeline
+    from motion import MotionGate
+    from scheduler import InferenceScheduler
+    from prebuffer import PreEventBuffer
+    from incident import ThreatState, annotate, describe
+    from metrics import registry
 import threading
 import time
 import os
 import sys
+startup.mark("imports")
 
 # Configuration
 ctk.set_appearance_mode("Dark")
@@ -26,29 +38,28 @@ class WeaponDetectionApp(ctk.CTk):
         self.attributes('-topmost',True)
         self.after_idle(self.attributes,'-topmost',False)
 
-        # Initialize Logic
-        self.detector = WeaponDetector()
+        # Initialize Logic (the model loads in the background; see _watch_model_load)
+        self.detector = WeaponDetector(load_async=True)
         self.alerter = AlertManager()
         self.evidence_locker = EvidenceLocker()
-        self.cap = None
+        self.pipeline = FramePipeline(self.detector)
+        self.pre_event = PreEventBuffer()
+        self.renderer = DisplayRenderer(max_fps=int(os.environ.get("SENTINEL_DISPLAY_FPS", 30)))
+        if os.environ.get("SENTINEL_METRICS_PORT"):
+            registry.serve(int(os.environ["SENTINEL_METRICS_PORT"]))
         self.is_running = False
         self.audio_enabled = True
         
-        # State
-        self.current_threat_level = 0.0
-        self.threat_persistence = {} # Label -> frames
-        self.escalated = False
-        
-        # Incident Capture State
-        self.incident_capture_active = False
-        self.incident_frames_left = 0
-        self.current_incident_id = None
+        # State (threat level, persistence, incident capture)
+        self.threat = ThreatState()
         
         # Performance
         self.frame_count = 0
         self.skip_frames = 0
         self.last_detections = []
         self.last_persons = []
+        self.last_safe_persons = []
+        self.last_stats_time = 0
         
         # Layout
         self.grid_columnconfigure(1, weight=1)
@@ -57,6 +68,12 @@ class WeaponDetectionApp(ctk.CTk):
         self._create_sidebar()
         self._create_main_view()
         self._create_right_panel()
+        startup.mark("window")
+
+        self._watch_model_load()
+        if os.environ.get("SENTINEL_AUTOSTART"):
+            # Watchdog restarts go straight back to monitoring
+            self.after_idle(self.toggle_camera)
 
     def _create_sidebar(self):
         self.sidebar = ctk.CTkFrame(self, width=200, corner_radius=0)
@@ -95,6 +112,12 @@ class WeaponDetectionApp(ctk.CTk):
 
         self.high_res_switch = ctk.CTkSwitch(self.model_frame, text="High-Res (1280px)", command=self.toggle_high_res)
         self.high_res_switch.pack(pady=5)
+
+        self.tiled_switch = ctk.CTkSwitch(self.model_frame, text="Tiled (640px tiles)", command=self.toggle_tiled)
+        self.tiled_switch.pack(pady=5)
+
+        self.motion_switch = ctk.CTkSwitch(self.model_frame, text="Motion Gating", command=self.toggle_motion_gate)
+        self.motion_switch.pack(pady=5)
         
         self.skip_label = ctk.CTkLabel(self.model_frame, text="Skip Frames: 0")
         self.skip_label.pack(pady=(5,0))
@@ -102,6 +125,9 @@ class WeaponDetectionApp(ctk.CTk):
         self.skip_slider.set(0)
         self.skip_slider.pack(pady=5)
 
+        self.adaptive_switch = ctk.CTkSwitch(self.model_frame, text="Adaptive Cadence", command=self.toggle_adaptive)
+        self.adaptive_switch.pack(pady=5)
+
         self.conf_label = ctk.CTkLabel(self.sidebar, text="Sensitivity: 50%", anchor="w")
         self.conf_label.grid(row=5, column=0, padx=20, pady=(10, 0))
         self.conf_slider = ctk.CTkSlider(self.sidebar, from_=0, to=1, number_of_steps=100, command=self.update_conf)
@@ -134,6 +160,9 @@ class WeaponDetectionApp(ctk.CTk):
         self.status_label = ctk.CTkLabel(self.sidebar, text="Status: Ready", text_color="gray")
         self.status_label.grid(row=11, column=0, padx=20, pady=20)
 
+        self.perf_label = ctk.CTkLabel(self.sidebar, text="", text_color="gray", font=ctk.CTkFont(size=11))
+        self.perf_label.grid(row=12, column=0, padx=20, pady=(0, 20))
+
     def _create_main_view(self):
         self.main_frame = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
         self.main_frame.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
@@ -145,27 +174,40 @@ class WeaponDetectionApp(ctk.CTk):
         self.right_panel = ctk.CTkScrollableFrame(self, width=250, label_text="Detection Log")
         self.right_panel.grid(row=0, column=2, sticky="nsew", padx=(0, 20), pady=20)
 
+    def _watch_model_load(self):
+        if self.detector.model_ready.is_set():
+            startup.mark("model_ready")
+            if not self.is_running:
+                self.status_label.configure(text="Model ready", text_color="green")
+        elif self.detector.load_error is not None:
+            self.status_label.configure(text="Failed to load model", text_color="red")
+        else:
+            self.status_label.configure(text="Loading model...", text_color="orange")
+            self.after(100, self._watch_model_load)
+
     def change_model(self, choice):
         model_map = {
             "YOLOv8 Nano": "yolov8n.pt",
             "YOLOv8 Medium": "yolov8m.pt"
         }
         path = model_map.get(choice, "yolov8m.pt")
-        # Run in thread to avoid freezing UI
-        threading.Thread(target=self._load_model_thread, args=(path, choice)).start()
+        # Load and warm up in a thread; detection keeps running on the old model until the swap
+        threading.Thread(target=self._load_model_thread, args=(path, choice), daemon=True).start()
 
     def _load_model_thread(self, path, name):
         self.status_label.configure(text=f"Loading {name}...", text_color="orange")
         success = self.detector.load_model(path)
         if success:
-            self.status_label.configure(text=f"Loaded {name}", text_color="green")
+            swap = self.detector.swap_stats
+            source = "cached" if swap['cached'] else f"{swap['load_ms']:.0f}ms load + {swap['warmup_ms']:.0f}ms warm-up"
+            self.status_label.configure(text=f"Loaded {name} ({source})", text_color="green")
         else:
             self.status_label.configure(text=f"Failed to load {name}", text_color="red")
 
     def load_custom_model(self):
         file_path = filedialog.askopenfilename(filetypes=[("YOLO Weights", "*.pt")])
         if file_path:
-            threading.Thread(target=self._load_model_thread, args=(file_path, "Custom Model")).start()
+            threading.Thread(target=self._load_model_thread, args=(file_path, "Custom Model"), daemon=True).start()
             self.model_option.set("Custom")
 
     def toggle_high_res(self):
@@ -174,21 +216,37 @@ class WeaponDetectionApp(ctk.CTk):
         mode = "High-Res" if enabled else "Standard"
         self.status_label.configure(text=f"Mode: {mode}", text_color="blue")
 
+    def toggle_tiled(self):
+        enabled = self.tiled_switch.get()
+        self.detector.set_tiled_mode(enabled)
+        mode = "Tiled" if enabled else "Standard"
+        self.status_label.configure(text=f"Mode: {mode}", text_color="blue")
+
+    def toggle_motion_gate(self):
+        # Skip inference while the scene is static (forced check every 2s)
+        self.pipeline.set_motion_gate(MotionGate() if self.motion_switch.get() else None)
+
+    def toggle_adaptive(self):
+        # Latency/threat-driven cadence replaces the fixed skip slider while enabled
+        enabled = self.adaptive_switch.get()
+        self.pipeline.set_scheduler(InferenceScheduler() if enabled else None)
+        self.skip_slider.configure(state="disabled" if enabled else "normal")
+
     def update_skip(self, value):
         self.skip_frames = int(value)
+        self.pipeline.set_skip_frames(self.skip_frames)
         self.skip_label.configure(text=f"Skip Frames: {self.skip_frames}")
 
     def toggle_camera(self):
         if self.is_running:
             self.is_running = False
             self.start_btn.configure(text="START CAMERA", fg_color="green")
-            if self.cap:
-                self.cap.release()
+            self.pipeline.stop()
             self.video_label.configure(image=None)
+            self.renderer.reset()
             self.status_label.configure(text="Status: Stopped", text_color="red")
         else:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
+            if not self.pipeline.start(0):
                 self.status_label.configure(text="Error: No Camera", text_color="red")
                 return
             self.is_running = True
@@ -210,9 +268,8 @@ class WeaponDetectionApp(ctk.CTk):
         self.alerter.toggle_sms(self.sms_switch.get())
         
     def acknowledge_alert(self):
-        self.escalated = False
+        self.threat.acknowledge()
         self.ack_btn.configure(state="disabled", fg_color="gray")
-        self.threat_persistence.clear()
         self.threat_bar.set(0)
         self.status_label.configure(text="Status: Monitoring...", text_color="#00ff00")
 
@@ -228,7 +285,7 @@ class WeaponDetectionApp(ctk.CTk):
             self.status_label.configure(text="Twilio Failed", text_color="red")
 
     def play_alarm(self):
-        if self.audio_enabled and not self.escalated:
+        if self.audio_enabled and not self.threat.escalated:
             # macOS native sound with Max Volume
             if sys.platform == 'darwin':
                 try:
@@ -250,113 +307,125 @@ class WeaponDetectionApp(ctk.CTk):
         log_entry.pack(fill="x", padx=5, pady=2)
 
     def update_frame(self):
+        """Render loop: consume inference results, then show the newest captured frame."""
         if not self.is_running:
             return
 
-        ret, frame = self.cap.read()
-        if ret:
+        # Every result counts towards threat persistence, even if the UI fell behind
+        for result in self.pipeline.poll_results():
+            self.process_result(result)
+
+        # Capped display rate: when not due, the newest frame just waits in its queue
+        packet = self.pipeline.poll_frame() if self.renderer.due() else None
+        if packet is not None:
             self.frame_count += 1
-            
-            # Force inference during incident capture to ensure we get bounding boxes for all 5 shots
-            should_infer = (self.skip_frames == 0) or \
-                           (self.frame_count % (self.skip_frames + 1) == 0) or \
-                           self.incident_capture_active
-
-            if should_infer:
-                # Detection
-                self.last_detections, self.last_persons = self.detector.detect(frame)
-                detections = self.last_detections
-            else:
-                detections = self.last_detections
-                self.detector.apply_privacy_blur(frame, self.last_persons)
-            
-            # Threat Logic
-            if detections:
-                self.current_threat_level = min(1.0, self.current_threat_level + 0.1)
-                for det in detections:
-                    label = det['label']
-                    self.threat_persistence[label] = self.threat_persistence.get(label, 0) + 1
-            else:
-                self.current_threat_level = max(0.0, self.current_threat_level - 0.05)
-                # Decay persistence
-                for k in list(self.threat_persistence.keys()):
-                    self.threat_persistence[k] = max(0, self.threat_persistence[k] - 1)
-                    if self.threat_persistence[k] == 0:
-                        del self.threat_persistence[k]
+            self.show_frame(packet.frame)
+            startup.mark("first_frame")
+
+        now = time.time()
+        if now - self.last_stats_time >= 1.0:
+            self.last_stats_time = now
+            stats = self.pipeline.stats()
+            text = f"Infer {stats['infer_ms']:.0f}ms | Latency {stats['latency_ms']:.0f}ms\n" \
+                   f"Dropped: infer {stats['dropped_inference']} / results {stats['dropped_results']}"
+            if stats['motion']:
+                text += f"\nMotion hit rate: {stats['motion']['hit_rate']:.0%}"
+            if stats['schedule']:
+                for schedule in stats['schedule'].values():
+                    text += f"\nCadence: {schedule['rate_fps']:.1f} fps ({schedule['state']})"
+            swap = self.detector.swap_stats
+            if swap.get('first_frame_ms') is not None:
+                text += f"\nModel swap: {swap['swap_ms']:.0f}ms pause, first frame {swap['first_frame_ms']:.0f}ms"
+            pre_event = self.pre_event.stats()
+            text += f"\nPre-event: {pre_event['span_s']:.1f}s / {pre_event['bytes'] / 1e6:.1f} MB"
+            self.perf_label.configure(text=text)
 
-            self.threat_bar.set(self.current_threat_level)
+        self.after(10, self.update_frame)
 
-            # Annotate & Alert
-            detected_threats = []
+    def annotate(self, frame, detections):
+        with registry.timer("annotate_ms", help_text="Drawing detections on one frame"):
+            annotate(frame, detections)
+
+    def process_result(self, result):
+        """Threat logic, escalation and evidence for one inference result."""
+        if result.inferred:
+            startup.mark("first_inference")
+        frame = result.frame
+        detections = result.detections
+        self.last_detections = detections
+        self.last_persons = result.persons
+        self.last_safe_persons = result.safe_persons
+
+        # Threat Logic
+        detected_threats = self.threat.update(detections)
+        self.threat_bar.set(self.threat.current_threat_level)
+        if self.pipeline.scheduler:
+            self.pipeline.scheduler.update_threat(result.stream_id, self.threat.current_threat_level)
+
+        # Annotate & Alert
+        self.annotate(frame, detections)
+
+        # --- ESCALATION LOGIC ---
+        if self.threat.should_escalate(detected_threats):
+            self.ack_btn.configure(state="normal", fg_color="red")
+            self.status_label.configure(text="Status: THREAT DETECTED", text_color="red")
             
-            for det in detections:
-                x1, y1, x2, y2 = det['box']
-                label = f"{det['label']} {det['confidence']:.2f}"
-                color = (0, 0, 255) # Red for weapon
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                # Check Persistence for Alert Escalation
-                # Alert if seen for > 5 frames
-                if self.threat_persistence.get(det['label'], 0) > 5:
-                    detected_threats.append(det)
-
-            # --- ESCALATION LOGIC ---
-            if detected_threats and not self.escalated:
-                self.escalated = True
-                self.ack_btn.configure(state="normal", fg_color="red")
-                self.status_label.configure(text="Status: THREAT DETECTED", text_color="red")
-                
-                # Start Incident Capture (5 shots)
-                label = detected_threats[0]['label']
-                self.incident_capture_active = True
-                self.incident_frames_left = 5
-                self.current_incident_id = self.evidence_locker.create_incident_id(label)
-                
-                # Trigger Alert (Notification)
-                self.alerter.trigger_alert(frame, label, detected_threats)
-                self.play_alarm()
-                
-                # Log to UI (Initial)
-                self.log_detection(label, hash_entry=True)
-
-            # --- INCIDENT CAPTURE (BURST) ---
-            if self.incident_capture_active and self.incident_frames_left > 0:
-                # Capture current frame as evidence
-                shot_idx = 5 - self.incident_frames_left
-                self.evidence_locker.secure_evidence(
-                    frame, 
-                    detections, # Use all current detections
-                    incident_id=self.current_incident_id,
-                    shot_index=shot_idx
-                )
-                self.incident_frames_left -= 1
-                
-                if self.incident_frames_left == 0:
-                    self.incident_capture_active = False
-                    self.status_label.configure(text="Evidence Secured", text_color="orange")
-
-            # Convert to PIL for Tkinter
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame)
+            # Start Incident Capture (5 shots)
+            label = detected_threats[0]['label']
+            self.threat.start_incident(self.evidence_locker.create_incident_id(label))
+            # The seconds leading up to escalation go in first, then the burst
+            self.evidence_locker.secure_pre_event(
+                self.pre_event.snapshot(),
+                self.threat.current_incident_id
+            )
+            # Force inference so all 5 shots have bounding boxes
+            self.pipeline.set_force_infer(True)
             
-            # Resize to fit (maintain aspect ratio)
-            display_w = self.video_label.winfo_width()
-            display_h = self.video_label.winfo_height()
+            # Trigger Alert (Notification)
+            self.alerter.trigger_alert(frame, label, detected_threats)
+            self.play_alarm()
             
-            if display_w > 10 and display_h > 10:
-                img.thumbnail((display_w, display_h))
-                
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-
-        self.after(10, self.update_frame)
+            # Log to UI (Initial)
+            self.log_detection(describe(detected_threats[0]), hash_entry=True)
+
+        # --- INCIDENT CAPTURE (BURST) ---
+        shot_idx = self.threat.next_shot() if result.inferred else None  # Real boxes only, never predictions
+        if shot_idx is not None:
+            # Capture current frame as evidence
+            self.evidence_locker.secure_evidence_async(
+                frame, 
+                detections, # Use all current detections
+                incident_id=self.threat.current_incident_id,
+                shot_index=shot_idx
+            )
+            
+            if not self.threat.incident_capture_active:
+                self.pipeline.set_force_infer(False)
+                self.status_label.configure(text="Evidence Secured", text_color="orange")
+
+        self.pre_event.add(frame, result.captured_at)
+
+    def show_frame(self, frame):
+        """Live view: the frame at display size with the latest known boxes and privacy state."""
+        with registry.timer("display_ms", help_text="Resize, blur, annotate and blit one live-view frame"):
+            # Shrink first; everything after runs on display-sized pixels
+            frame, scale = self.renderer.fit(frame, self.video_label.winfo_width(),
+                                             self.video_label.winfo_height())
+            if not self.detector.model_ready.is_set() and self.detector.privacy_mode:
+                # Nobody can be found to blur until the model is up, so pixelate the whole view
+                h, w = frame.shape[:2]
+                frame[:] = cv2.resize(cv2.resize(frame, (32, 18), interpolation=cv2.INTER_AREA), (w, h),
+                                      interpolation=cv2.INTER_NEAREST)
+            self.detector.apply_privacy_blur(frame, scale_boxes(self.last_safe_persons, scale))
+            self.annotate(frame, scale_detections(self.last_detections, scale))
+            self.renderer.show(self.video_label, frame)
 
     def on_closing(self):
-        if self.cap:
-            self.cap.release()
+        self.is_running = False
+        self.pipeline.stop()
+        self.pre_event.close()
+        self.alerter.close()
+        self.evidence_locker.close()
         self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,362 @@
+"""
+Inference backends for WeaponDetector.
+
+    torch     ultralytics YOLO on the .pt weights (default)
+    onnx      ONNX Runtime on an exported .onnx; INT8 = static QDQ quantization
+    openvino  OpenVINO IR; INT8 = NNCF post-training quantization
+
+Exported artifacts are still run through ultralytics.YOLO, so every backend returns
+the same Results/Boxes objects and WeaponDetector's post-processing is unchanged.
+Exports are cached under `cache_dir`, keyed by weights hash, format, imgsz and
+precision (plus the calibration set for INT8), so each combination is built once.
+INT8 is calibrated on frames from our own recordings (`calibration`: video files or
+image directories).
+
+Compare backends on real footage:
+
+    python backends.py --weights yolov8m.pt --source lobby.mp4 --int8 --json report.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def weights_hash(path, chunk_size=1 << 20):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:16]
+
+
+def _image_files(directory):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.lower().endswith(('.jpg', '.jpeg', '.png'))]
+
+
+def calibration_id(sources, count):
+    """
+    Short hash identifying a calibration set (each file's path, size and mtime, plus the
+    frame count), so INT8 exports calibrated on different footage never share a cache entry.
+    """
+    hasher = hashlib.sha256(str(count).encode('utf-8'))
+    for source in sources:
+        for path in _image_files(source) if os.path.isdir(source) else [source]:
+            stat = os.stat(path)
+            hasher.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return hasher.hexdigest()[:8]
+
+
+def calibration_frames(sources, count=300):
+    """Up to `count` frames spread evenly over the given video files / image directories."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths += [(path, None) for path in _image_files(source)]
+        else:
+            cap = cv2.VideoCapture(source)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            paths += [(source, i) for i in range(max(total, 0))]
+    if not paths:
+        return
+    for path, index in (paths[int(i)] for i in np.linspace(0, len(paths) - 1, min(count, len(paths)))):
+        if index is None:
+            frame = cv2.imread(path)
+        else:
+            cap = cv2.VideoCapture(path)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = cap.read()
+            cap.release()
+            frame = frame if ok else None
+        if frame is not None:
+            yield frame
+
+
+def letterbox(frame, imgsz):
+    """Resize into an imgsz x imgsz square with grey padding, as ultralytics does."""
+    h, w = frame.shape[:2]
+    scale = imgsz / max(h, w)
+    nh, nw = round(h * scale), round(w * scale)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas
+
+
+def _to_tensor(frame, imgsz):
+    image = letterbox(frame, imgsz)[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def quantize_onnx(fp32_path, int8_path, frames, imgsz):
+    """Static INT8 (QDQ) quantization of an exported YOLO .onnx, calibrated on `frames`."""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: _to_tensor(frame, imgsz)}
+
+    # Only the heavy ops are quantized; the box-decoding tail (Mul/Add/Concat/Sigmoid)
+    # stays in float, which is where naive YOLO INT8 loses most of its accuracy
+    quantize_static(fp32_path, int8_path, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True, op_types_to_quantize=['Conv', 'MatMul'])
+
+    # quantize_static drops the metadata ultralytics reads back (names, stride, imgsz)
+    source, quantized = onnx.load(fp32_path), onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, int8_path)
+
+
+def _calibration_dataset(frames, directory, names):
+    """Write frames as an unlabeled image set plus the dataset yaml ultralytics' INT8 export wants."""
+    images = os.path.join(directory, "images")
+    os.makedirs(images, exist_ok=True)
+    for i, frame in enumerate(frames):
+        cv2.imwrite(os.path.join(images, f"{i:05d}.jpg"), frame)
+    path = os.path.join(directory, "calibration.yaml")
+    with open(path, 'w') as f:
+        f.write(f"path: {directory}\ntrain: images\nval: images\nnames:\n")
+        for cls_id, name in sorted(names.items()):
+            f.write(f"  {cls_id}: {name}\n")
+    return path
+
+
+class ExportedModel:
+    """
+    Callable like ultralytics.YOLO, backed by ONNX Runtime or OpenVINO exports.
+
+    Exports are static-shape, so one artifact is built (or loaded from the cache) per
+    imgsz; high-res and tiled modes each get their own. prepare() does that export and
+    a warm-up off the detection path. Calling at an imgsz that was never prepared still
+    works, but builds it inline.
+    """
+
+    def __init__(self, weights, backend='onnx', int8=False, calibration=(), cache_dir="model_cache",
+                 calibration_count=300, imgsz=640):
+        if backend not in ('onnx', 'openvino'):
+            raise ValueError(f"Unknown export backend: {backend}")
+        self.weights = weights
+        self.backend = backend
+        self.int8 = int8
+        self.calibration = list(calibration)
+        self.cache_dir = cache_dir
+        self.calibration_count = calibration_count
+        self._hash = weights_hash(weights)
+        self._models = {}     # imgsz -> YOLO over the exported artifact
+        self._warmed = set()  # imgsz values prepare() has exported, loaded and run once
+        self._lock = threading.Lock()
+        if int8 and not self.calibration:
+            raise ValueError("INT8 needs calibration footage (video files or image directories)")
+        self._calibration_id = calibration_id(self.calibration, calibration_count) if int8 else None
+        self.names = self._model_for(imgsz).names
+
+    def artifact_path(self, imgsz):
+        stem = os.path.splitext(os.path.basename(self.weights))[0]
+        precision = f"int8-{self._calibration_id}" if self.int8 else "fp32"
+        suffix = "_openvino_model" if self.backend == 'openvino' else ".onnx"
+        return os.path.join(self.cache_dir, f"{stem}-{self._hash}-{imgsz}-{precision}{suffix}")
+
+    def _model_for(self, imgsz):
+        model = self._models.get(imgsz)
+        if model is None:
+            with self._lock:
+                model = self._models.get(imgsz)
+                if model is None:
+                    from ultralytics import YOLO
+                    path = self.artifact_path(imgsz)
+                    if not os.path.exists(path):
+                        self._export(imgsz, path)
+                    model = self._models[imgsz] = YOLO(path, task='detect')
+        return model
+
+    def prepare(self, imgsz):
+        """
+        Export (or load from the cache) and warm up the artifact for `imgsz`. Only touches
+        that imgsz's model, so it is safe to run in a background thread while detection
+        uses another size.
+        """
+        model = self._model_for(imgsz)
+        with self._lock:
+            if imgsz not in self._warmed:
+                model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+                self._warmed.add(imgsz)
+        return model
+
+    def is_prepared(self, imgsz):
+        return imgsz in self._warmed
+
+    def _export(self, imgsz, target):
+        from ultralytics import YOLO
+        print(f"Exporting {self.weights} -> {target}")
+        start = time.perf_counter()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        model = YOLO(self.weights)
+        frames = lambda: calibration_frames(self.calibration, self.calibration_count)
+        with tempfile.TemporaryDirectory() as tmp:
+            if self.backend == 'openvino':
+                options = {}
+                if self.int8:
+                    options = {"int8": True, "data": _calibration_dataset(frames(), tmp, model.names)}
+                exported = model.export(format='openvino', imgsz=imgsz, **options)
+            else:
+                exported = model.export(format='onnx', imgsz=imgsz, simplify=True)
+                if self.int8:
+                    int8_path = os.path.join(tmp, "int8.onnx")
+                    quantize_onnx(exported, int8_path, frames(), imgsz)
+                    os.remove(exported)
+                    exported = int8_path
+            # Exports land next to the weights; move them into the cache under their key
+            shutil.move(str(exported), target)
+        print(f"Exported in {time.perf_counter() - start:.1f}s")
+
+    def __call__(self, source, imgsz=640, **kwargs):
+        return self._model_for(imgsz)(source, imgsz=imgsz, **kwargs)
+
+
+def make_model(weights, backend='torch', int8=False, calibration=(), cache_dir="model_cache"):
+    """Build the model object WeaponDetector calls, for the given backend."""
+    if backend == 'torch':
+        from ultralytics import YOLO
+        return YOLO(weights)
+    return ExportedModel(weights, backend, int8, calibration, cache_dir)
+
+
+# Comparison report
+
+def _detections(results, min_conf):
+    boxes = results[0].boxes
+    if len(boxes) == 0:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int32)
+    conf = boxes.conf.cpu().numpy()
+    keep = conf >= min_conf
+    return boxes.xyxy.cpu().numpy()[keep], boxes.cls.cpu().numpy().astype(np.int32)[keep]
+
+
+def _agreement(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class IoU matching; returns matched pairs."""
+    from tracker import iou_matrix
+    (ref_xyxy, ref_cls), (cand_xyxy, cand_cls) = reference, candidate
+    if not len(ref_xyxy) or not len(cand_xyxy):
+        return 0
+    iou = iou_matrix(ref_xyxy, cand_xyxy) * (ref_cls[:, None] == cand_cls[None, :])
+    matched, used = 0, set()
+    for r in range(len(ref_xyxy)):
+        for c in np.argsort(-iou[r]):
+            if iou[r, c] < iou_threshold:
+                break
+            if c not in used:
+                used.add(c)
+                matched += 1
+                break
+    return matched
+
+
+def compare(weights, sources, backends=BACKENDS, int8=False, frames=200, imgsz=640, conf=0.25,
+            cache_dir="model_cache", warmup=5, calibration=None):
+    """
+    Latency and agreement with the PyTorch model for every backend (and INT8 variant).
+    Agreement is precision/recall of each variant's boxes against torch's, same class
+    at IoU >= 0.5, so it measures what the conversion changed, not absolute accuracy.
+
+    INT8 is calibrated on `calibration`. Without it, the first half of `sources` is held
+    out for calibration and the rest evaluated; with a single source, calibration and
+    evaluation share footage and the report marks the INT8 agreement as in-sample.
+    """
+    if int8 and calibration is None:
+        if len(sources) > 1:
+            calibration, sources = sources[:len(sources) // 2], sources[len(sources) // 2:]
+        else:
+            calibration = sources
+    in_sample = bool(int8) and bool(set(calibration) & set(sources))
+    if in_sample:
+        print("Warning: INT8 is calibrated on the evaluation footage; its agreement is measured in-sample. "
+              "Pass separate --calibration footage (or several --source files) for a held-out figure.")
+    clip = list(calibration_frames(sources, frames))
+    variants = [(b, False) for b in backends]
+    if int8:
+        variants += [(b, True) for b in backends if b != 'torch']
+
+    reference, report = None, []
+    for backend, quantized in variants:
+        try:
+            model = make_model(weights, backend, quantized, calibration or (), cache_dir)
+        except Exception as e:
+            print(f"{backend}{' int8' if quantized else ''}: unavailable ({e})")
+            continue
+        for frame in clip[:warmup]:
+            model(frame, verbose=False, conf=conf, imgsz=imgsz)
+        latencies, outputs = [], []
+        for frame in clip:
+            start = time.perf_counter()
+            results = model(frame, verbose=False, conf=conf, imgsz=imgsz)
+            latencies.append((time.perf_counter() - start) * 1000)
+            outputs.append(_detections(results, conf))
+        if backend == 'torch':
+            reference = outputs
+
+        row = {"backend": backend, "precision": "int8" if quantized else "fp32", "frames": len(clip),
+               "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+               "fps": 1000 / float(np.mean(latencies))}
+        if quantized:
+            row["in_sample"] = in_sample
+        if reference is not None:
+            matched = sum(_agreement(r, o) for r, o in zip(reference, outputs))
+            ref_total = sum(len(r[0]) for r in reference)
+            out_total = sum(len(o[0]) for o in outputs)
+            row["recall_vs_torch"] = matched / ref_total if ref_total else 1.0
+            row["precision_vs_torch"] = matched / out_total if out_total else 1.0
+        report.append(row)
+
+    print(f"{'backend':>9} {'prec':>5} {'p50 ms':>8} {'p95 ms':>8} {'fps':>7} {'recall':>7} {'precision':>9}")
+    for row in report:
+        print(f"{row['backend']:>9} {row['precision']:>5} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['fps']:>7.1f} {row.get('recall_vs_torch', float('nan')):>7.1%} "
+              f"{row.get('precision_vs_torch', float('nan')):>9.1%}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on our own footage")
+    parser.add_argument("--weights", default="yolov8m.pt")
+    parser.add_argument("--source", action="append", required=True, help="Video file or image directory")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--int8", action="store_true", help="Also build and compare INT8 exports")
+    parser.add_argument("--calibration", action="append",
+                        help="INT8 calibration footage (default: the first half of the --source files)")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cache-dir", default="model_cache")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = compare(args.weights, args.source, args.backends, args.int8, args.frames, args.imgsz,
+                     cache_dir=args.cache_dir, calibration=args.calibration)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"weights": args.weights, "weights_hash": weights_hash(args.weights),
+                       "imgsz": args.imgsz, "sources": args.source, "calibration": args.calibration,
+                       "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
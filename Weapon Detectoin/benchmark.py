@@ -0,0 +1,639 @@
+"""
+Micro-benchmarks for the detection hot paths.
+
+Uses a stub model that returns canned boxes, so it runs on a CPU-only machine
+without any weights:
+
+    python benchmark.py postprocess zones association privacy tracker motion tiling evidence
+
+`pipeline` replays a recorded (--video) or synthetic clip through the headless runner's
+real path: capture, batched inference, privacy, threat logic, pre-event buffer, evidence
+and alerting. Every benchmark returns its results; pass --json to save them for
+comparing releases.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from anonymizer import Anonymizer
+from detector import WeaponDetector
+
+# Only the classes the detector cares about need real names
+STUB_NAMES = {i: f"class_{i}" for i in range(80)}
+STUB_NAMES.update({0: 'person', 34: 'baseball bat', 43: 'knife', 67: 'cell phone', 76: 'scissors'})
+
+
+class StubTensor:
+    """Minimal stand-in for a torch tensor: supports .cpu().numpy() and indexing."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def __getitem__(self, idx):
+        return self.array[idx]
+
+
+class StubBox:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = StubTensor(xyxy[None])
+        self.cls = StubTensor(cls[None])
+        self.conf = StubTensor(conf[None])
+
+
+class StubBoxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = StubTensor(xyxy)
+        self.cls = StubTensor(cls)
+        self.conf = StubTensor(conf)
+
+    def __len__(self):
+        return len(self.cls.array)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield StubBox(self.xyxy.array[i], self.cls.array[i], self.conf.array[i])
+
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubModel:
+    """Callable like an ultralytics YOLO model; returns the same canned boxes for every frame."""
+
+    names = STUB_NAMES
+
+    def __init__(self, boxes_per_frame=20, weapon_ratio=0.2, frame_shape=(720, 1280), seed=0, latency_ms=0.0):
+        self.boxes = make_boxes(boxes_per_frame, weapon_ratio, frame_shape, seed)
+        self.latency_ms = latency_ms  # Simulated inference cost per call
+
+    def __call__(self, source, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [StubResult(self.boxes) for _ in frames]
+
+
+def make_boxes(n, weapon_ratio=0.2, frame_shape=(720, 1280), seed=0):
+    """Random persons / weapons / background classes, as float32 arrays like YOLO emits."""
+    rng = np.random.default_rng(seed)
+    h, w = frame_shape
+    x1 = rng.uniform(0, w * 0.9, n)
+    y1 = rng.uniform(0, h * 0.7, n)
+    x2 = np.minimum(w - 1, x1 + rng.uniform(20, w * 0.1, n))
+    y2 = np.minimum(h - 1, y1 + rng.uniform(40, h * 0.3, n))
+    xyxy = np.stack([x1, y1, x2, y2], axis=1).astype(np.float32)
+
+    n_weapons = int(n * weapon_ratio)
+    cls = np.zeros(n, dtype=np.float32)  # persons
+    cls[:n_weapons] = rng.choice([34, 43, 67, 76], n_weapons)
+    cls[n_weapons:n_weapons + n // 10] = 56  # a few chairs
+    conf = rng.uniform(0.5, 1.0, n).astype(np.float32)
+    return StubBoxes(xyxy, cls, conf)
+
+
+def legacy_check_zone(polygons, box):
+    """The original per-box Shapely zone test."""
+    from shapely.geometry import Point
+    x1, y1, x2, y2 = box
+    center = Point((x1 + x2) / 2, (y1 + y2) / 2)
+    for poly in polygons:
+        if poly.contains(center):
+            return True
+    return False
+
+
+def legacy_first_pass(detector, results, zones=None):
+    """The original per-box loop, kept only as the benchmark baseline."""
+    persons = []
+    raw_weapons = []
+    for result in results:
+        for box in result.boxes:
+            cls_id = int(box.cls[0])
+            conf = float(box.conf[0])
+            label = detector.model.names[cls_id]
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            if cls_id == detector.person_class:
+                persons.append((x1, y1, x2, y2))
+                continue
+            is_weapon = cls_id in detector.weapon_classes or label == 'cell phone'
+            if is_weapon:
+                if label == 'cell phone':
+                    label = 'Gun (Simulated)'
+                if zones and legacy_check_zone(zones, (x1, y1, x2, y2)):
+                    continue
+                raw_weapons.append({'label': label, 'confidence': conf, 'box': (x1, y1, x2, y2)})
+    return raw_weapons, persons
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_postprocess(counts=(10, 50, 200), repeat=2000):
+    """Legacy per-box loop vs vectorized classify/split/filter."""
+    detector = WeaponDetector(model=StubModel())
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    print(f"{'boxes':>6} {'legacy us':>10} {'vector us':>10} {'speedup':>8}")
+    rows = {}
+    for n in counts:
+        results = [StubResult(make_boxes(n))]
+        legacy_us = _time(lambda: legacy_first_pass(detector, results), repeat)
+        vector_us = _time(lambda: detector._classify(frame, *detector._result_arrays(results)), repeat)
+        print(f"{n:>6} {legacy_us:>10.1f} {vector_us:>10.1f} {legacy_us / vector_us:>7.1f}x")
+        rows[n] = {"legacy_us": legacy_us, "vector_us": vector_us}
+    return rows
+
+
+def make_zones(n, frame_shape=(720, 1280), seed=1):
+    """n random convex-ish polygons scattered over the frame."""
+    rng = np.random.default_rng(seed)
+    h, w = frame_shape
+    zones = []
+    for _ in range(n):
+        cx, cy = rng.uniform(0, w), rng.uniform(0, h)
+        radius = rng.uniform(20, 80)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 6))
+        zones.append([(int(cx + radius * np.cos(a)), int(cy + radius * np.sin(a))) for a in angles])
+    return zones
+
+
+def bench_zones(zone_counts=(1, 10, 50), candidates=50, repeat=500):
+    """Per-box Shapely containment vs one raster lookup, as the number of zones grows."""
+    try:
+        from shapely.geometry import Polygon
+    except ImportError:
+        print("shapely not installed; skipping legacy baseline")
+        Polygon = None
+
+    detector = WeaponDetector(model=StubModel())
+    shape = (720, 1280, 3)
+    boxes = make_boxes(candidates, weapon_ratio=1.0).xyxy.array.astype(np.int32)
+    box_tuples = [tuple(b) for b in boxes.tolist()]
+
+    print(f"{'zones':>6} {'shapely us':>11} {'raster us':>10} {'build ms':>9}")
+    rows = {}
+    for n in zone_counts:
+        zones = make_zones(n)
+        detector.set_zones(zones)
+        start = time.perf_counter()
+        detector._zone_map(shape)  # First frame at a new resolution pays for the rasterisation
+        build_ms = (time.perf_counter() - start) * 1000
+        raster_us = _time(lambda: detector._in_zone_mask(boxes, shape), repeat)
+
+        legacy_us = float('nan')
+        if Polygon is not None:
+            polygons = [Polygon(z) for z in zones]
+            legacy_us = _time(lambda: [legacy_check_zone(polygons, b) for b in box_tuples], repeat)
+        print(f"{n:>6} {legacy_us:>11.1f} {raster_us:>10.1f} {build_ms:>9.2f}")
+        rows[n] = {"shapely_us": None if Polygon is None else legacy_us, "raster_us": raster_us,
+                   "build_ms": build_ms}
+    return rows
+
+
+def bench_association(sizes=((10, 2), (50, 5), (200, 10)), repeat=500):
+    """Nested _boxes_intersect loops vs the person x weapon matrix."""
+    detector = WeaponDetector(model=StubModel())
+    print(f"{'P x W':>9} {'loops us':>9} {'matrix us':>10} {'speedup':>8}")
+    rows = {}
+    for n_persons, n_weapons in sizes:
+        persons = [tuple(b) for b in make_boxes(n_persons, seed=2).xyxy.array.astype(int).tolist()]
+        weapons = [tuple(b) for b in make_boxes(n_weapons, seed=3).xyxy.array.astype(int).tolist()]
+
+        def loops():
+            return [any(detector._boxes_intersect(p, w) for w in weapons) for p in persons]
+
+        loop_us = _time(loops, repeat)
+        matrix_us = _time(lambda: detector.associate(persons, weapons), repeat)
+        label = f"{n_persons}x{n_weapons}"
+        print(f"{label:>9} {loop_us:>9.1f} {matrix_us:>10.1f} {loop_us / matrix_us:>7.1f}x")
+        rows[label] = {"loops_us": loop_us, "matrix_us": matrix_us}
+    return rows
+
+
+def bench_privacy(resolutions=((720, 1280), (1080, 1920), (2160, 3840)), persons=10, repeat=20):
+    """Each anonymizer mode vs the legacy per-person Gaussian, for a crowd of `persons`."""
+    anonymizer = Anonymizer()
+    rng = np.random.default_rng(4)
+    print(f"{'resolution':>11} " + " ".join(f"{mode + ' ms':>13}" for mode in Anonymizer.MODES))
+    rows = {}
+    for h, w in resolutions:
+        frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+        boxes = make_boxes(persons, weapon_ratio=0.0, frame_shape=(h, w), seed=5).xyxy.array.astype(int).tolist()
+        row = []
+        for mode in Anonymizer.MODES:
+            anonymizer.set_mode(mode)
+            work = frame.copy()
+            row.append(_time(lambda: anonymizer.apply(work, boxes), repeat) / 1000)
+        print(f"{f'{w}x{h}':>11} " + " ".join(f"{ms:>13.2f}" for ms in row))
+        rows[f"{w}x{h}"] = {f"{mode}_ms": ms for mode, ms in zip(Anonymizer.MODES, row)}
+    return rows
+
+
+def bench_display(resolutions=((720, 1280), (1080, 1920), (2160, 3840)), widget=(900, 700), persons=10,
+                  repeat=30):
+    """
+    GUI live-view frame prep, old path (full-res copy, blur, annotate, cvtColor, PIL
+    thumbnail) vs DisplayRenderer (resize first into reused buffers). The Tk blit itself
+    needs a display and is not included.
+    """
+    from PIL import Image
+    from display import DisplayRenderer, scale_boxes, scale_detections
+    from incident import annotate
+    anonymizer = Anonymizer()
+    rng = np.random.default_rng(6)
+    print(f"{'resolution':>11} {'old ms':>8} {'new ms':>8} {'speedup':>8}")
+    results = {}
+    for h, w in resolutions:
+        frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+        boxes = make_boxes(persons, weapon_ratio=0.0, frame_shape=(h, w), seed=7).xyxy.array.astype(int).tolist()
+        detections = [{'box': tuple(box), 'label': 'knife', 'confidence': 0.9} for box in boxes[:3]]
+
+        def old():
+            work = frame.copy()
+            anonymizer.apply(work, boxes)
+            annotate(work, detections)
+            img = Image.fromarray(cv2.cvtColor(work, cv2.COLOR_BGR2RGB))
+            img.thumbnail(widget)
+
+        renderer = DisplayRenderer()
+        renderer.fit(frame, *widget)  # Allocate the buffers once, as the GUI does
+
+        def new():
+            work, scale = renderer.fit(frame, *widget)
+            anonymizer.apply(work, scale_boxes(boxes, scale))
+            annotate(work, scale_detections(detections, scale))
+            cv2.cvtColor(work, cv2.COLOR_BGR2RGB, dst=renderer._rgb)
+            Image.frombuffer("RGB", renderer._size, renderer._rgb, "raw", "RGB", 0, 1)
+
+        old_ms, new_ms = _time(old, repeat) / 1000, _time(new, repeat) / 1000
+        print(f"{f'{w}x{h}':>11} {old_ms:>8.2f} {new_ms:>8.2f} {old_ms / new_ms:>7.1f}x")
+        results[f"{w}x{h}"] = {"old_ms": old_ms, "new_ms": new_ms}
+    return results
+
+
+def bench_tracker(counts=(1, 5, 20), frames=200):
+    """Tracker update + skipped-frame predict cost per frame, for N moving weapons."""
+    from tracker import Tracker
+    print(f"{'weapons':>8} {'update us':>10} {'predict us':>11}")
+    rows = {}
+    for n in counts:
+        tracker = Tracker()
+        base = make_boxes(n, weapon_ratio=1.0, seed=6).xyxy.array.astype(int)
+        update_total = predict_total = 0.0
+        for i in range(frames):
+            moved = base + np.array([i, 0, i, 0])
+            dets = [{'label': 'knife', 'confidence': 0.9, 'box': tuple(b)} for b in moved.tolist()]
+            start = time.perf_counter()
+            tracker.update(dets)
+            update_total += time.perf_counter() - start
+            start = time.perf_counter()
+            tracker.predict()
+            predict_total += time.perf_counter() - start
+        print(f"{n:>8} {update_total / frames * 1e6:>10.1f} {predict_total / frames * 1e6:>11.1f}")
+        rows[n] = {"update_us": update_total / frames * 1e6, "predict_us": predict_total / frames * 1e6}
+    return rows
+
+
+def bench_motion(frames=300, moving_every=50, moving_for=10):
+    """Motion-gate cost and hit rate on a synthetic mostly-static corridor."""
+    from motion import MotionGate
+    gate = MotionGate(force_interval=1e9)  # Measure pure gating, no periodic fallback
+    rng = np.random.default_rng(7)
+    background = rng.integers(0, 60, (720, 1280, 3), dtype=np.uint8)
+    moving = 0
+    for i in range(frames):
+        frame = background.copy()
+        # Sensor noise everywhere, an intruder walking through now and then
+        frame += rng.integers(0, 4, frame.shape, dtype=np.uint8)
+        if i % moving_every < moving_for:
+            x = 100 + (i % moving_every) * 40
+            frame[300:500, x:x + 80] = 200
+            moving += 1
+        gate.check(frame)
+    stats = gate.stats()
+    print(f"frames {frames}, with motion {moving}")
+    print(f"inferred {stats['motion'] + stats['forced']} ({stats['hit_rate']:.0%}), "
+          f"skipped {stats['skipped']}, check {stats['check_ms']:.2f} ms/frame")
+    return dict(stats, frames=frames, with_motion=moving)
+
+
+def legacy_append_to_log(chain_file, entry):
+    """The original append: parse the whole JSON array twice, rewrite it with indent=4."""
+    with open(chain_file, 'r') as f:
+        len(json.load(f))  # _get_next_index
+    with open(chain_file, 'r') as f:
+        chain = json.load(f)
+    chain.append(entry)
+    with open(chain_file, 'w') as f:
+        json.dump(chain, f, indent=4)
+
+
+def bench_evidence(sizes=(100, 1000, 10000), appends=20):
+    """Cost of one chain append as the chain grows: legacy JSON rewrite vs fsync'd line append."""
+    from evidence import EvidenceLocker
+    meta = [{'label': 'knife', 'confidence': 0.9, 'box': (10, 10, 50, 50)}]
+
+    def entry(i):
+        data = {"timestamp": "2026-01-01T00:00:00", "filename": f"inc/evidence_{i}.jpg",
+                "incident_id": "inc", "meta": meta, "previous_hash": "0" * 64}
+        return {"index": i, "timestamp": data["timestamp"], "data": data, "current_hash": "f" * 64}
+
+    print(f"{'entries':>8} {'legacy ms':>10} {'append ms':>10} {'startup ms':>11}")
+    rows = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_file = os.path.join(tmp, "legacy.json")
+            with open(legacy_file, 'w') as f:
+                json.dump([entry(i) for i in range(size)], f, indent=4)
+            legacy_ms = _time(lambda: legacy_append_to_log(legacy_file, entry(size)), appends) / 1000
+
+            locker = EvidenceLocker(os.path.join(tmp, "locker"))
+            with open(locker.chain_file, 'wb') as f:
+                f.writelines(locker._encode(entry(i)) for i in range(size))
+            locker._load_chain()
+            append_ms = _time(lambda: locker._append_to_log(entry(locker.next_index)), appends) / 1000
+            locker.close()
+
+            start = time.perf_counter()
+            EvidenceLocker(os.path.join(tmp, "locker"))
+            startup_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>8} {legacy_ms:>10.2f} {append_ms:>10.2f} {startup_ms:>11.2f}")
+        rows[size] = {"legacy_ms": legacy_ms, "append_ms": append_ms, "startup_ms": startup_ms}
+    print("(append includes fsync; startup reads the checkpoint plus the log tail)")
+    return rows
+
+
+def bench_tiling(resolutions=((720, 1280), (1080, 1920), (2160, 3840)), roi_fraction=0.35):
+    """
+    Model input pixels (a proxy for CPU inference cost) for 640, 1280 and tiled modes,
+    plus the cross-tile merge cost. Tiled pixels are at native resolution, so small
+    objects are never downscaled the way they are in the 1280 mode. `grid` is the
+    uncapped full grid; every other tiled figure is under the default tile_budget.
+    """
+    detector = WeaponDetector(model=StubModel())
+    detector.set_tiled_mode(True, focus='all')
+    pixels = lambda crops: sum(detector._model_pixels(c.shape, 640) for c, _ in crops)
+    base = 640 * 640
+    print(f"{'resolution':>11} {'640':>6} {'1280':>6} {'grid':>6} {'tiled':>6} {'tiles':>6} {'@roi':>6} "
+          f"{'@2 people':>10} {'@zone':>6} {'merge us':>9}")
+    rows = {}
+    for h, w in resolutions:
+        frame = np.zeros((h, w, 3), dtype=np.uint8)
+        px_640 = detector._model_pixels(frame.shape, 640)
+        px_1280 = detector._model_pixels(frame.shape, 1280)
+        detector.tile_budget = None
+        grid = detector._crops(frame)
+        detector.tile_budget = 1.0
+        crops = detector._crops(frame)
+
+        rw, rh = int(w * roi_fraction), int(h * roi_fraction)
+        px_roi = pixels(detector._crops(frame, (0, 0, max(rw, 1), max(rh, 1))))
+
+        # Person-focused mode: full frame at 640 plus the tiles around two distant people
+        people = np.array([[w * 0.2, h * 0.3, w * 0.2 + 60, h * 0.3 + 160],
+                           [w * 0.7, h * 0.4, w * 0.7 + 60, h * 0.4 + 160]])
+        px_people = px_640 + pixels(detector._crops(frame, focus=people, full_frame=False, spent=px_640))
+
+        # Full grid limited to one watched zone (a doorway around the first person)
+        detector.set_tiled_mode(True, zones=[[(w * 0.15, h * 0.2), (w * 0.3, h * 0.2), (w * 0.3, h * 0.6)]])
+        px_zone = pixels(detector._crops(frame))
+        detector.set_tiled_mode(True, zones=[])
+
+        boxes = make_boxes(len(crops) * 10, frame_shape=(h, w))
+        merge_us = _time(lambda: detector._merge_tiles(boxes.xyxy.array, boxes.cls.array.astype(np.int32),
+                                                       boxes.conf.array), 200)
+        print(f"{f'{w}x{h}':>11} {px_640 / base:>6.2f} {px_1280 / base:>6.2f} {pixels(grid) / base:>6.2f} "
+              f"{pixels(crops) / base:>6.2f} {len(crops):>6} {px_roi / base:>6.2f} {px_people / base:>10.2f} "
+              f"{px_zone / base:>6.2f} {merge_us:>9.1f}")
+        rows[f"{w}x{h}"] = {"px_640": px_640 / base, "px_1280": px_1280 / base, "px_grid": pixels(grid) / base,
+                            "px_tiled": pixels(crops) / base, "tiles": len(crops), "px_roi": px_roi / base,
+                            "px_people": px_people / base, "px_zone": px_zone / base, "merge_us": merge_us}
+    print("(pixels relative to one 640x640 image; @roi = tiles over a motion region covering "
+          f"{roi_fraction:.0%} of each side, @2 people = default person-focused tiling, "
+          "@zone = grid limited to one zone)")
+    return rows
+
+
+def synthetic_frames(frames, frame_shape=(720, 1280), seed=3):
+    """Noisy static background with a few bright shapes walking across it."""
+    rng = np.random.default_rng(seed)
+    h, w = frame_shape
+    background = rng.integers(0, 80, (h, w, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = background.copy()
+        for k in range(3):
+            x = (i * (8 + 4 * k) + 200 * k) % (w - 120)
+            frame[h // 4 + 100 * k:h // 4 + 100 * k + 200, x:x + 80] = 180 + 25 * k
+        yield frame
+
+
+def video_frames(path, frames):
+    cap = cv2.VideoCapture(path)
+    try:
+        for _ in range(frames):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": float(values.mean()), "p50": float(p50),
+            "p95": float(p95), "p99": float(p99), "max": float(values.max())}
+
+
+def _timed(samples, fn):
+    """Wrap `fn` so every call's duration (ms) is appended to `samples`."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append((time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def write_replay(path, frames, fps=30.0):
+    """Write synthetic frames to a video file for the pipeline to capture from."""
+    writer = None
+    written = 0
+    for frame in synthetic_frames(frames):
+        if writer is None:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (frame.shape[1], frame.shape[0]))
+        writer.write(frame)
+        written += 1
+    writer.release()
+    return written
+
+
+def bench_pipeline(video=None, frames=300, streams=1, evidence_mode="both", infer_latency_ms=0.0):
+    """
+    End-to-end replay through the production path: CaptureStage reading the file ->
+    BatchInferenceStage -> detector post-processing, tracking and privacy ->
+    HeadlessRunner.process_result (threat logic, annotation, pre-event buffer, alerts,
+    evidence and clips). Stages are timed by wrapping the real methods, not by calling
+    them directly. Returns per-stage latency percentiles, FPS, frame counts, the
+    process-wide peak RSS and the files written.
+    """
+    from headless import HeadlessRunner, load_config
+    from metrics import registry
+
+    stages = {name: [] for name in ("inference", "postprocess", "privacy", "handling", "evidence",
+                                    "alert", "latency", "end_to_end")}
+    detector = WeaponDetector(model=StubModel(latency_ms=infer_latency_ms))
+    detector.set_privacy(True)
+    detector._run = _timed(stages["inference"], detector._run)
+    detector._postprocess = _timed(stages["postprocess"], detector._postprocess)
+    detector.anonymizer.apply = _timed(stages["privacy"], detector.anonymizer.apply)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # AlertManager writes to ./snapshots
+        try:
+            if video is None:
+                video = os.path.join(tmp, "replay.avi")
+                frames = write_replay(video, frames)
+                source = f"synthetic 1280x720, {frames} frames"
+            else:
+                source = video
+            config = load_config(None)
+            config.update(sources=[video] * streams, evidence_dir="snapshots", evidence_mode=evidence_mode,
+                          target_fps=0, batch_size=max(1, streams), alert_coalesce_s=0.0,
+                          alert_transports=[{"type": "file", "path": "snapshots/alerts.jsonl"}])
+            runner = HeadlessRunner(config, detector=detector)
+            runner.evidence_locker.secure_evidence_async = _timed(stages["evidence"],
+                                                                  runner.evidence_locker.secure_evidence_async)
+            runner.alerter.trigger_alert = _timed(stages["alert"], runner.alerter.trigger_alert)
+            process = _timed(stages["handling"], runner.process_result)
+
+            def process_result(result):
+                stages["latency"].append(result.latency_ms)  # Capture until the result was ready
+                process(result)
+                stages["end_to_end"].append((time.time() - result.captured_at) * 1000)
+            runner.process_result = process_result
+
+            def count(stage):
+                return sum(registry.counter("frames_total", stage=stage, stream=sid).value
+                           for sid in range(streams))
+            captured, inferred, skipped = count("captured"), count("inferred"), count("skipped")
+            wall_start = time.perf_counter()
+            runner.run()
+            wall = time.perf_counter() - wall_start
+            captured, inferred, skipped = (count("captured") - captured, count("inferred") - inferred,
+                                           count("skipped") - skipped)
+
+            files = [os.path.join(root, name) for root, _, names in os.walk("snapshots") for name in names]
+            written = {"files": len(files), "bytes": sum(os.path.getsize(f) for f in files)}
+        finally:
+            os.chdir(cwd)
+
+    processed = len(stages["handling"])
+    result = {
+        "source": source,
+        "streams": streams,
+        "evidence_mode": evidence_mode,
+        "frames": {"captured": captured, "inferred": inferred, "skipped": skipped, "processed": processed,
+                   "dropped": captured - inferred - skipped},
+        "fps": processed / wall if wall else 0.0,
+        "stages_ms": {name: _percentiles(samples) for name, samples in stages.items()},
+        # ru_maxrss is the high-water mark of the whole process (KiB on Linux), not of this run alone
+        "process_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "written": written,
+    }
+    print(f"{processed} results from {captured} captured frames ({result['frames']['dropped']} dropped), "
+          f"{result['fps']:.1f} FPS end-to-end, process peak RSS {result['process_peak_rss_mb']:.0f} MB, "
+          f"{written['files']} files / {written['bytes'] / 1e6:.1f} MB written")
+    print(f"{'stage':>12} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for name, p in result["stages_ms"].items():
+        if p["count"]:
+            print(f"{name:>12} {p['count']:>5} {p['p50']:>8.2f} {p['p95']:>8.2f} {p['p99']:>8.2f} {p['max']:>8.2f}")
+    print("(postprocess includes privacy; handling is HeadlessRunner.process_result, including evidence and alert)")
+    return result
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+BENCHMARKS = {
+    "postprocess": bench_postprocess,
+    "zones": bench_zones,
+    "association": bench_association,
+    "privacy": bench_privacy,
+    "display": bench_display,
+    "tracker": bench_tracker,
+    "motion": bench_motion,
+    "tiling": bench_tiling,
+    "evidence": bench_evidence,
+    "pipeline": bench_pipeline,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentinel Eye micro-benchmarks")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--video", help="Replay this file in the pipeline benchmark instead of synthetic frames")
+    parser.add_argument("--frames", type=int, default=300, help="Synthetic frames for the pipeline benchmark")
+    parser.add_argument("--streams", type=int, default=1, help="Cameras replaying the video in the pipeline benchmark")
+    parser.add_argument("--evidence-mode", default="both", choices=("burst", "clip", "both"),
+                        help="Headless evidence_mode for the pipeline benchmark")
+    parser.add_argument("--json", help="Write results (with environment info) to this file")
+    args = parser.parse_args()
+
+    options = {"pipeline": {"video": args.video, "frames": args.frames, "streams": args.streams,
+                            "evidence_mode": args.evidence_mode}}
+    results = {}
+    for name in args.names:
+        print(f"== {name} ==")
+        results[name] = BENCHMARKS[name](**options.get(name, {}))
+
+    if args.json:
+        report = {"environment": _environment(),
+                  "results": results}
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
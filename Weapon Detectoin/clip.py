@@ -0,0 +1,223 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import registry
+
+
+def _encoder_main(commands, done, pending):
+    """Encoder process: owns every cv2.VideoWriter, so encoding never touches the detection loop."""
+    writers = {}  # clip_id -> (writer, path, frame count, encode seconds)
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        kind, clip_id = command[0], command[1]
+        try:
+            if kind == 'open':
+                _, _, path, fourcc, fps, size = command
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+                if not writer.isOpened():
+                    raise IOError(f"Could not open video writer for {path}")
+                writers[clip_id] = [writer, path, 0, 0.0]
+            elif kind == 'frame':
+                with pending.get_lock():
+                    pending.value -= 1
+                state = writers.get(clip_id)
+                if state is None:
+                    continue
+                start = time.perf_counter()
+                frame = command[2]
+                if isinstance(frame, bytes):  # Pre-event frames arrive already JPEG-encoded
+                    frame = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+                w, h = command[3]
+                if frame.shape[1] != w or frame.shape[0] != h:
+                    frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+                state[0].write(frame)
+                state[2] += 1
+                state[3] += time.perf_counter() - start
+            elif kind == 'close' and clip_id in writers:
+                writer, path, frames, seconds = writers.pop(clip_id)
+                writer.release()
+                done.put((clip_id, path, frames, seconds * 1000, None))
+        except Exception as e:
+            state = writers.pop(clip_id, None)
+            if state:
+                state[0].release()
+            done.put((clip_id, command[2] if kind == 'open' else None, 0, 0.0, str(e)))
+    for writer, *_ in writers.values():
+        writer.release()
+
+
+class ClipEncoder:
+    """
+    Background video-clip writer for incident evidence.
+
+    Frames are handed to a separate encoder process over a bounded queue; the
+    caller never waits on encoding or disk, and frames are dropped (and counted)
+    if the encoder falls behind. A clip starts with the pre-event frames, then takes
+    post-event frames at `fps` for `duration` seconds and closes itself.
+    `on_done(clip_id, path, frame_meta)` is called from a listener thread once the
+    file is complete, which is where it gets chained into the EvidenceLocker.
+    """
+
+    def __init__(self, on_done, fps=5.0, duration=5.0, fourcc="MJPG", extension=".avi",
+                 max_queue=256, max_width=1280):
+        self.on_done = on_done
+        self.fps = fps
+        self.duration = duration
+        self.fourcc = fourcc
+        self.extension = extension
+        self.max_queue = max_queue   # Frames in flight to the encoder process
+        self.max_width = max_width
+
+        self.clips = {}   # clip_id -> {'size', 'ends_at', 'last_frame', 'meta', 'closing'}
+        self._commands = None
+        self._done = None
+        self._process = None
+        self._listener = None
+        self._pending = None   # Shared counter of frames queued but not yet encoded
+        self._lock = threading.Lock()
+
+        # Stats
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.clips_done = 0
+        self.clips_failed = 0
+        self.encode_ms_total = 0.0
+        self.frames_encoded = 0
+        registry.gauge("clip_queue_depth", self.queue_depth, "Frames handed to the clip encoder and not yet encoded")
+        registry.gauge("clips_recording", lambda: len(self.clips), "Evidence clips still taking frames")
+
+    def _start(self):
+        if self._process is not None:
+            return
+        ctx = mp.get_context("spawn")  # No forking a process that runs capture threads
+        self._commands = ctx.Queue()
+        self._done = ctx.Queue()
+        self._pending = ctx.Value('i', 0)
+        self._process = ctx.Process(target=_encoder_main, args=(self._commands, self._done, self._pending),
+                                    daemon=True)
+        self._process.start()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _send(self, command, is_frame=False):
+        if is_frame:
+            with self._pending.get_lock():
+                if self._pending.value >= self.max_queue:
+                    self.frames_dropped += 1
+                    registry.counter("clip_frames_dropped_total", "Clip frames dropped with the encoder queue full").inc()
+                    return False
+                self._pending.value += 1
+            self.frames_sent += 1
+        self._commands.put(command)  # The queue's feeder thread pickles and writes the pipe
+        return True
+
+    def _clip_size(self, shape):
+        h, w = shape[:2]
+        if self.max_width and w > self.max_width:
+            return self.max_width, int(h * self.max_width / w)
+        return w, h
+
+    def start_clip(self, clip_id, directory, frame_shape, pre_frames=(), name="clip"):
+        """Open a clip, seeded with (captured_at, jpeg bytes) pre-event frames. Returns its path."""
+        self._start()
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name + self.extension)
+        size = self._clip_size(frame_shape)
+        meta = []
+        self.clips[clip_id] = {'size': size, 'ends_at': None, 'last_frame': 0.0, 'meta': meta, 'closing': False}
+        self._send(('open', clip_id, path, self.fourcc, self.fps, size))
+        for captured_at, data in pre_frames:
+            if self._send(('frame', clip_id, data, size), is_frame=True):
+                meta.append({"frame": len(meta), "captured_at": captured_at, "pre_event": True,
+                             "detections": []})
+        return path
+
+    def offer(self, clip_id, frame, captured_at, detections=()):
+        """
+        Offer a post-event frame; sampled down to `fps`. Closes the clip once `duration`
+        has passed. Returns False once the clip is no longer recording.
+        """
+        clip = self.clips.get(clip_id)
+        if clip is None or clip['closing']:
+            return False
+        if clip['ends_at'] is None:
+            clip['ends_at'] = captured_at + self.duration
+        if captured_at > clip['ends_at']:
+            self.finish_clip(clip_id)
+            return False
+        if captured_at - clip['last_frame'] >= 1.0 / self.fps:
+            clip['last_frame'] = captured_at
+            # Copy: the caller keeps drawing on its frame after we return
+            if self._send(('frame', clip_id, frame.copy(), clip['size']), is_frame=True):
+                clip['meta'].append({"frame": len(clip['meta']), "captured_at": captured_at,
+                                     "detections": [dict(det) for det in detections]})
+        return True
+
+    def finish_clip(self, clip_id):
+        clip = self.clips.get(clip_id)
+        if clip and not clip['closing']:
+            clip['closing'] = True
+            self._send(('close', clip_id))
+
+    def _listen(self):
+        while True:
+            try:
+                clip_id, path, frames, encode_ms, error = self._done.get()
+            except (EOFError, OSError):
+                return
+            if clip_id is None:
+                return
+            clip = self.clips.pop(clip_id, None)
+            with self._lock:
+                if error:
+                    self.clips_failed += 1
+                else:
+                    self.clips_done += 1
+                    self.frames_encoded += frames
+                    self.encode_ms_total += encode_ms
+            if error:
+                print(f"Clip {clip_id} failed: {error}")
+            elif clip:
+                self.on_done(clip_id, path, clip['meta'])
+
+    def queue_depth(self):
+        """Frames handed to the encoder process and not yet encoded."""
+        return self._pending.value if self._pending else 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth(),
+                "recording": len(self.clips),
+                "frames_sent": self.frames_sent,
+                "frames_dropped": self.frames_dropped,
+                "clips_done": self.clips_done,
+                "clips_failed": self.clips_failed,
+                "encode_ms": self.encode_ms_total / self.frames_encoded if self.frames_encoded else 0.0,
+            }
+
+    def close(self, timeout=10.0):
+        """Finish every open clip, wait for the encoder and stop it."""
+        if self._process is None:
+            return
+        for clip_id in list(self.clips):
+            self.finish_clip(clip_id)
+        deadline = time.time() + timeout
+        while self.clips and time.time() < deadline:
+            time.sleep(0.05)
+        self._commands.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._commands.cancel_join_thread()  # Don't hang on exit if the encoder died
+        self._done.put((None, None, 0, 0.0, None))
+        self._listener.join(timeout)
+        self._process = None
@@ -1,13 +1,48 @@
-from ultralytics import YOLO
+import threading
+import time
+from collections import OrderedDict
 import cv2
 import numpy as np
-from shapely.geometry import Polygon, Point
+from anonymizer import Anonymizer
+from tracker import Tracker
+from metrics import registry
+from backends import make_model
 
 class WeaponDetector:
-    def __init__(self, model_path='yolov8m.pt', confidence_threshold=0.5):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov8m.pt', confidence_threshold=0.5, model=None,
+                 backend='torch', int8=False, calibration=(), model_cache='model_cache', load_async=False):
+        # Inference backend (see backends.py): 'torch', 'onnx' or 'openvino'
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8                  # INT8 exports, calibrated on `calibration` footage
+        self.calibration = list(calibration)
+        self.model_cache = model_cache    # Where exported artifacts are cached
+        # `model` lets callers inject an already-built (or stub) model object
+        self.model = model
+        self.model_ready = threading.Event()  # Set once a model is loaded and warmed up
+        self.load_error = None
+
+        # Hot-swap: detect() holds _model_lock for one frame, load_model() only for the swap itself
+        self._model_lock = threading.Lock()
+        self._load_lock = threading.Lock()   # One load at a time
+        self.max_loaded_models = 2           # LRU of loaded models, so switching back is instant
+        self._loaded_models = OrderedDict()  # (path, backend, int8) -> model
+        self._warm_sizes = {}                # Same keys -> imgsz values each model was warmed up at
+        self.swap_stats = {}                 # Timings of the last load_model()
+        self._first_frame_pending = False
+        self._pending_switch = None          # Latest high-res/tiled switch waiting for its imgsz
         self.confidence_threshold = confidence_threshold
         self.imgsz = 640 # Default inference size
+
+        # Tiled (sliced) inference for small objects
+        self.tiled_mode = False
+        self.tile_size = 640
+        self.tile_overlap = 0.1       # Fraction of a tile shared with its neighbour
+        self.tile_full_frame = True   # Also run a downscaled full-frame pass for large objects
+        self.tile_focus = 'persons'   # 'persons' = tile only around people found by the full-frame pass, 'all' = every tile
+        self.tile_merge_threshold = 0.5 # Intersection-over-smaller above which tile boxes merge
+        self.tile_zones = []          # (x1, y1, x2, y2) areas worth tiling; empty = anywhere
+        self.tile_budget = 1.0        # Max model input pixels per frame, as a fraction of the 1280 mode's (None = no cap)
         
         # COCO IDs: 
         # 0=Person
@@ -19,51 +54,273 @@ class WeaponDetector:
         self.person_class = 0
         
         # Temporal Consistency
-        self.persistence_threshold = 5  # Frames
-        self.active_detections = {}     # ID -> frames_seen
+        self.persistence_threshold = 5  # Track hits before a detection is 'confirmed'
+        self.active_detections = {}     # stream_id -> {track_id: hits}
         self.frame_counter = 0
+        self.trackers = {}              # stream_id -> Tracker
         
         # Zone Defense (List of Polygons)
-        self.exclusion_zones = [] # List of [(x,y), ...]
+        self.exclusion_zones = [] # List of int32 (N, 2) point arrays
+        self.zone_min_coverage = None # None = center-point test, else min fraction of box inside zones
+        self._zone_maps = {}      # (h, w) -> zone-id raster, rebuilt when zones change
+        self._zone_integrals = {} # (h, w) -> summed-area table of the zone raster
         
         # Privacy Shield
         self.privacy_mode = True
+        self.anonymizer = Anonymizer()
+        self.last_safe_persons = [] # Unarmed persons from the last detect() call
+        self.stream_safe_persons = {} # stream_id -> unarmed persons from the last detect_batch()
+
+        if model is not None:
+            self._build_class_tables()
+            self.model_ready.set()
+        elif load_async:
+            # Weights load and warm up in the background while capture and UI come up;
+            # callers check model_ready before detecting
+            threading.Thread(target=self.load_model, args=(model_path,), daemon=True).start()
+        elif not self.load_model(model_path):
+            raise RuntimeError(f"Could not load model {model_path}: {self.load_error}")
+
+    def _make_model(self, path):
+        return make_model(path, self.backend, self.int8, self.calibration, self.model_cache)
+
+    def _model_key(self, path):
+        return (path, self.backend, self.int8)
+
+    def _input_size(self):
+        """imgsz the model is called with in the current mode."""
+        return self.tile_size if self.tiled_mode else self.imgsz
+
+    def _warm_up(self, model, imgsz=None):
+        """One dummy inference at `imgsz` (default: the current input size), so the first real frame isn't cold."""
+        imgsz = imgsz or self._input_size()
+        if hasattr(model, 'prepare'):
+            model.prepare(imgsz)  # Exported backends also build their artifact for this size
+            return
+        model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False, conf=self.confidence_threshold,
+              imgsz=imgsz)
 
     def load_model(self, path):
-        try:
-            self.model = YOLO(path)
-            print(f"Loaded model from {path}")
+        """
+        Load (or take from the LRU cache) and warm up a model off the detection path, then
+        swap it in between frames. Safe to call from a background thread while detecting.
+        """
+        with self._load_lock:
+            try:
+                start = time.perf_counter()
+                key = self._model_key(path)
+                model = self._loaded_models.get(key)
+                cached = model is not None
+                if not cached:
+                    model = self._make_model(path)
+                    self._warm_sizes[key] = set()
+                loaded = time.perf_counter()
+                while True:
+                    # Warm up at the size the current mode runs (high-res/tiled included), so the
+                    # first frame after the swap never exports or compiles under _model_lock
+                    imgsz = self._input_size()
+                    warm_sizes = self._warm_sizes.setdefault(key, set())
+                    if imgsz not in warm_sizes:
+                        self._warm_up(model, imgsz)
+                        warm_sizes.add(imgsz)
+                    warmed = time.perf_counter()
+                    with self._model_lock:
+                        if self._input_size() != imgsz:
+                            continue  # Mode switched during warm-up; warm the new size too
+                        self.model = model
+                        self.model_path = path
+                        self._build_class_tables()
+                        self._first_frame_pending = True
+                    break
+                swapped = time.perf_counter()
+                self.model_ready.set()
+
+                self._loaded_models[key] = model
+                self._loaded_models.move_to_end(key)
+                while len(self._loaded_models) > self.max_loaded_models:
+                    evicted, _ = self._loaded_models.popitem(last=False)
+                    self._warm_sizes.pop(evicted, None)
+
+                self.swap_stats = {
+                    "model": path,
+                    "cached": cached,
+                    "load_ms": (loaded - start) * 1000,
+                    "warmup_ms": (warmed - loaded) * 1000,
+                    "swap_ms": (swapped - warmed) * 1000,  # Waiting for the in-flight frame + swap
+                    "total_ms": (swapped - start) * 1000,
+                    "first_frame_ms": None,
+                }
+                registry.observe("model_swap_ms", self.swap_stats["swap_ms"], help_text="Model hot-swap pause")
+                print(f"Loaded model from {path} ({self.backend}{', int8' if self.int8 else ''}"
+                      f"{', cached' if cached else ''}) in {self.swap_stats['total_ms']:.0f}ms")
+                return True
+            except Exception as e:
+                self.load_error = e
+                print(f"Failed to load model: {e}")
+                return False
+
+    def set_backend(self, backend, int8=False, calibration=None):
+        """Switch inference backend, re-exporting the current weights if needed."""
+        previous = (self.backend, self.int8, self.calibration)
+        self.backend, self.int8 = backend, int8
+        if calibration is not None:
+            self.calibration = list(calibration)
+        if self.load_model(self.model_path):
             return True
-        except Exception as e:
-            print(f"Failed to load model: {e}")
-            return False
+        self.backend, self.int8, self.calibration = previous
+        return False
 
-    def set_high_res_mode(self, enabled):
+    def _build_class_tables(self):
+        """Precompute per-class lookup tables so post-processing never touches model.names per box."""
+        names = self.model.names
+        if not isinstance(names, dict):
+            names = dict(enumerate(names))
+        size = max(len(names), max(names.keys()) + 1) if names else 1
+        self._label_lut = [''] * size
+        self._weapon_lut = np.zeros(size, dtype=bool)
+        for cls_id, label in names.items():
+            if label == 'cell phone':
+                label = 'Gun (Simulated)'
+                self._weapon_lut[cls_id] = True
+            self._label_lut[cls_id] = label
+        for cls_id in self.weapon_classes:
+            if cls_id < size:
+                self._weapon_lut[cls_id] = True
+
+    def set_high_res_mode(self, enabled, wait=False):
         # 1280 is significantly better for small objects at distance
-        self.imgsz = 1280 if enabled else 640
+        imgsz = 1280 if enabled else 640
+
+        def apply():
+            self.imgsz = imgsz
+        self._switch_input_size(imgsz if not self.tiled_mode else self.tile_size, apply, wait)
+
+    def set_tiled_mode(self, enabled, tile_size=None, overlap=None, focus=None, wait=False,
+                       zones=None, budget=None):
+        """
+        Slice frames into overlapping tiles at native resolution instead of upscaling imgsz.
+        `zones` (polygons, as set_zones) limits tiles to their bounding boxes; `budget`
+        caps a frame's tiles at that fraction of the 1280 mode's cost (see tile_budget).
+        """
+        tile_size = self.tile_size if tile_size is None else tile_size
+
+        def apply():
+            self.tiled_mode = enabled
+            self.tile_size = tile_size
+            if overlap is not None:
+                self.tile_overlap = overlap
+            if focus is not None:
+                self.tile_focus = focus
+            if zones is not None:
+                self.tile_zones = [tuple(pts.min(axis=0).tolist() + pts.max(axis=0).tolist())
+                                   for pts in (np.asarray(z, dtype=np.int32).reshape(-1, 2) for z in zones if len(z))]
+            if budget is not None:
+                self.tile_budget = budget
+        self._switch_input_size(tile_size if enabled else self.imgsz, apply, wait)
+
+    def _switch_input_size(self, imgsz, apply, wait=False):
+        """
+        Run `apply` (a mode change that makes the model run at `imgsz`) once the model is
+        ready for that size. Exported backends build one artifact per imgsz; that export
+        and its warm-up happen on a background thread (or inline with `wait`), and frames
+        keep running at the old size until the switch, which happens between frames.
+        """
+        self._pending_switch = token = object()  # A later switch supersedes this one
+        model = self.model
+        if model is None or not hasattr(model, 'prepare') or model.is_prepared(imgsz):
+            apply()  # Nothing to build; a model still loading warms up for the new mode itself
+            return
+
+        def prepare():
+            try:
+                while self._pending_switch is token:
+                    model = self.model
+                    model.prepare(imgsz)
+                    with self._model_lock:
+                        if self.model is model and self._pending_switch is token:  # Not swapped meanwhile
+                            apply()
+                            return
+            except Exception as e:
+                print(f"Could not prepare the model for imgsz {imgsz}: {e}")
+
+        if wait:
+            prepare()
+        else:
+            print(f"Preparing the model for imgsz {imgsz} in the background")
+            threading.Thread(target=prepare, daemon=True).start()
 
     def set_confidence(self, conf):
         self.confidence_threshold = conf
 
-    def set_zones(self, zones):
-        """Set exclusion zones (list of list of points)."""
-        self.exclusion_zones = [Polygon(z) for z in zones if len(z) >= 3]
+    def set_zones(self, zones, min_coverage=None):
+        """
+        Set exclusion zones (list of list of points).
+        With min_coverage, a weapon is excluded when at least that fraction of its box
+        lies inside a zone instead of testing only the box center.
+        """
+        self.exclusion_zones = [np.asarray(z, dtype=np.int32).reshape(-1, 2) for z in zones if len(z) >= 3]
+        self.zone_min_coverage = min_coverage
+        self._zone_maps = {}
+        self._zone_integrals = {}
 
     def set_privacy(self, enabled):
         self.privacy_mode = enabled
 
-    def _check_zone(self, box):
-        """Returns True if box center is INSIDE an exclusion zone."""
-        if not self.exclusion_zones:
-            return False
-            
-        x1, y1, x2, y2 = box
-        center = Point((x1 + x2) / 2, (y1 + y2) / 2)
-        
-        for poly in self.exclusion_zones:
-            if poly.contains(center):
-                return True
-        return False
+    def set_privacy_filter(self, mode):
+        """Select the anonymizer mode (see Anonymizer.MODES)."""
+        self.anonymizer.set_mode(mode)
+
+    def _zone_map(self, shape):
+        """Raster of zone IDs (0 = outside, k = k-th zone) at the given frame resolution."""
+        h, w = shape[:2]
+        zone_map = self._zone_maps.get((h, w))
+        if zone_map is None:
+            dtype = np.uint8 if len(self.exclusion_zones) < 256 else np.uint16
+            zone_map = np.zeros((h, w), dtype=dtype)
+            for zone_id, points in enumerate(self.exclusion_zones, start=1):
+                cv2.fillPoly(zone_map, [points], zone_id)
+            self._zone_maps[(h, w)] = zone_map
+        return zone_map
+
+    def _zone_integral(self, shape):
+        h, w = shape[:2]
+        integral = self._zone_integrals.get((h, w))
+        if integral is None:
+            inside = (self._zone_map(shape) > 0).astype(np.uint8)
+            integral = cv2.integral(inside)
+            self._zone_integrals[(h, w)] = integral
+        return integral
+
+    def zone_ids(self, boxes, shape):
+        """Zone ID under each box center (0 = not in any zone). boxes is an (N, 4) array."""
+        boxes = np.asarray(boxes)
+        if not self.exclusion_zones or len(boxes) == 0:
+            return np.zeros(len(boxes), dtype=np.int32)
+        h, w = shape[:2]
+        cx = np.clip((boxes[:, 0] + boxes[:, 2]) // 2, 0, w - 1)
+        cy = np.clip((boxes[:, 1] + boxes[:, 3]) // 2, 0, h - 1)
+        return self._zone_map(shape)[cy, cx].astype(np.int32)
+
+    def zone_coverage(self, boxes, shape):
+        """Fraction of each box's area that lies inside any exclusion zone."""
+        boxes = np.asarray(boxes)
+        if not self.exclusion_zones or len(boxes) == 0:
+            return np.zeros(len(boxes), dtype=np.float32)
+        h, w = shape[:2]
+        x1 = np.clip(boxes[:, 0], 0, w)
+        y1 = np.clip(boxes[:, 1], 0, h)
+        x2 = np.clip(boxes[:, 2], 0, w)
+        y2 = np.clip(boxes[:, 3], 0, h)
+        integral = self._zone_integral(shape)
+        inside = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        area = np.maximum((x2 - x1) * (y2 - y1), 1)
+        return (inside / area).astype(np.float32)
+
+    def _in_zone_mask(self, boxes, shape):
+        """True for every box that should be suppressed by an exclusion zone."""
+        if self.zone_min_coverage is not None:
+            return self.zone_coverage(boxes, shape) >= self.zone_min_coverage
+        return self.zone_ids(boxes, shape) > 0
 
     def _boxes_intersect(self, box1, box2):
         """Check if two boxes intersect."""
@@ -81,98 +338,388 @@ class WeaponDetector:
             
         return True
 
-    def detect(self, frame):
+    def associate(self, persons, weapon_boxes):
+        """
+        Person x weapon association in one NumPy pass.
+        Returns (intersects [P, W] bool, iou [P, W] float, owner [W] int).
+        owner[j] is the index of the person covering most of weapon j, or -1 if none.
+        """
+        p = np.asarray(persons, dtype=np.float32).reshape(-1, 4)
+        w = np.asarray(weapon_boxes, dtype=np.float32).reshape(-1, 4)
+
+        # Same inclusive test as _boxes_intersect, broadcast to [P, W]
+        inter_w = np.minimum(p[:, None, 2], w[None, :, 2]) - np.maximum(p[:, None, 0], w[None, :, 0])
+        inter_h = np.minimum(p[:, None, 3], w[None, :, 3]) - np.maximum(p[:, None, 1], w[None, :, 1])
+        intersects = (inter_w >= 0) & (inter_h >= 0)
+
+        inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        area_p = (p[:, 2] - p[:, 0]) * (p[:, 3] - p[:, 1])
+        area_w = (w[:, 2] - w[:, 0]) * (w[:, 3] - w[:, 1])
+        union = area_p[:, None] + area_w[None, :] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+        # A weapon belongs to the person whose box covers the largest share of it
+        cover = np.where(intersects, inter / np.maximum(area_w[None, :], 1), -1)
+        owner = np.where(intersects.any(axis=0), cover.argmax(axis=0) if len(p) else -1, -1)
+        return intersects, iou, owner
+
+    def detect(self, frame, roi=None):
+        """
+        Run the model on a frame. With roi=(x1, y1, x2, y2) only that region is inferred
+        (boxes are still returned in full-frame coordinates); persons outside it are not
+        re-detected, so pass the previous safe persons to apply_privacy_blur as well.
+        """
         self.frame_counter += 1
-        # Run inference with specified image size
-        results = self.model(frame, verbose=False, conf=self.confidence_threshold, imgsz=self.imgsz)
-        
-        persons = []
-        raw_weapons = []
+        with self._model_lock:
+            arrays = self._run([frame], [roi])[0]
+            raw_weapons, persons, safe_persons = self._postprocess(frame, arrays, stream_id=0)
+        self.last_safe_persons = safe_persons
+        return raw_weapons, persons
+
+    def detect_batch(self, frames, stream_ids=None, rois=None):
+        """
+        Run one batched model call over frames from several streams.
+        Returns {stream_id: {'detections', 'persons', 'safe_persons'}}.
+        Each frame is privacy-blurred in place, exactly like detect(); `rois` gives
+        each frame's motion region (None = whole frame), as detect()'s roi.
+        """
+        if not frames:
+            return {}
+        if stream_ids is None:
+            stream_ids = list(range(len(frames)))
+
+        self.frame_counter += len(frames)
+        batch = {}
+        with self._model_lock:
+            per_frame = self._run(frames, rois or [None] * len(frames))
+            for stream_id, frame, arrays in zip(stream_ids, frames, per_frame):
+                raw_weapons, persons, safe_persons = self._postprocess(frame, arrays, stream_id=stream_id)
+                self.stream_safe_persons[stream_id] = safe_persons
+                batch[stream_id] = {
+                    'detections': raw_weapons,
+                    'persons': persons,
+                    'safe_persons': safe_persons
+                }
+        return batch
 
-        # 1. First Pass: Gather all raw detections
-        for result in results:
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                label = self.model.names[cls_id]
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                
-                # Person Detection (for Privacy Shield)
-                if cls_id == self.person_class:
-                    persons.append((x1, y1, x2, y2))
+    def detect_sequence(self, frames, stream_id=0):
+        """
+        Consecutive frames of one stream (e.g. recorded video) in one batched model call.
+        Tracking and persistence run over the frames in order, as if they had arrived one
+        by one. Returns a (detections, persons, safe_persons) tuple per frame; each frame
+        is privacy-blurred in place.
+        """
+        if not frames:
+            return []
+        self.frame_counter += len(frames)
+        with self._model_lock:
+            per_frame = self._run(frames, [None] * len(frames))
+            outputs = [self._postprocess(frame, arrays, stream_id=stream_id)
+                       for frame, arrays in zip(frames, per_frame)]
+        self.stream_safe_persons[stream_id] = outputs[-1][2]
+        return outputs
+
+    def _tile_starts(self, length):
+        """Start offsets of overlapping tiles covering [0, length)."""
+        size = self.tile_size
+        if length <= size:
+            return [0]
+        # Fewest tiles that keep at least tile_overlap between neighbours, spread evenly
+        stride = max(1, int(size * (1 - self.tile_overlap)))
+        count = int(np.ceil((length - size) / stride)) + 1
+        return np.linspace(0, length - size, count).astype(int).tolist()
+
+    @staticmethod
+    def _region(frame, roi=None):
+        """The part of the frame to infer on (all of it without a roi) and its (x, y) offset."""
+        if roi is None:
+            return frame, (0, 0)
+        x0, y0, x1, y1 = roi
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+    @staticmethod
+    def _model_pixels(shape, imgsz):
+        """Pixels the model sees for one image (rect letterbox, stride 32): a proxy for its cost."""
+        h, w = shape[:2]
+        scale = imgsz / max(h, w)
+        pad = lambda v: int(np.ceil(v * scale / 32) * 32)
+        return pad(w) * pad(h)
+
+    def _crops(self, frame, roi=None, focus=None, full_frame=None, spent=0):
+        """
+        Images to feed the model for one frame, each with its (x, y) offset in the frame.
+        With `focus` (an (N, 4) array of boxes) tiles are centred on those boxes instead of a grid.
+        Only tiles touching tile_zones are kept, and only as many as tile_budget allows
+        (`spent` = pixels of this frame already planned elsewhere, e.g. the coarse pass).
+        """
+        region, (x0, y0) = self._region(frame, roi)
+        rh, rw = region.shape[:2]
+
+        if not self.tiled_mode or (rw <= self.tile_size and rh <= self.tile_size):
+            return [(region, (x0, y0))]
+
+        full_frame = self.tile_full_frame if full_frame is None else full_frame
+        crops = [(region, (x0, y0))] if full_frame else []
+        if focus is not None:
+            focus = focus[[self._in_tile_zones(box) for box in focus.tolist()]] if len(focus) else focus
+            # Smallest (most distant) people first: the coarse pass sees big ones well enough
+            focus = focus[np.argsort((focus[:, 2] - focus[:, 0]) * (focus[:, 3] - focus[:, 1]))]
+            tiles = self._focus_crops(region, (x0, y0), focus)
+        else:
+            # A grid over each zone's bounding box, or over the whole region without zones
+            areas = [(0, 0, rw, rh)]
+            if self.tile_zones:
+                areas = [(max(0, zx1 - x0), max(0, zy1 - y0), min(rw, zx2 - x0), min(rh, zy2 - y0))
+                         for zx1, zy1, zx2, zy2 in self.tile_zones]
+            tiles, seen = [], set()
+            for ax1, ay1, ax2, ay2 in areas:
+                if ax1 >= ax2 or ay1 >= ay2:
                     continue
+                for ty in self._area_starts(ay1, ay2, rh):
+                    for tx in self._area_starts(ax1, ax2, rw):
+                        if (tx, ty) not in seen:
+                            seen.add((tx, ty))
+                            tiles.append((region[ty:ty + self.tile_size, tx:tx + self.tile_size], (x0 + tx, y0 + ty)))
+
+        if self.tile_budget is not None:
+            # Never more than the 1280 mode would feed the model for the same region
+            left = self.tile_budget * self._model_pixels(region.shape, 1280) - spent
+            left -= sum(self._model_pixels(crop.shape, self.tile_size) for crop, _ in crops)
+            kept = []
+            for tile, offset in tiles:
+                left -= self._model_pixels(tile.shape, self.tile_size)
+                if left < 0:
+                    break
+                kept.append((tile, offset))
+            tiles = kept
+        return crops + tiles
+
+    def _area_starts(self, start, end, length):
+        """Tile offsets covering [start, end), kept inside [0, length)."""
+        size = self.tile_size
+        if end - start < size:
+            # Centre one tile on a small area
+            return [int(min(max(0, (start + end) / 2 - size / 2), max(0, length - size)))]
+        return [start + offset for offset in self._tile_starts(end - start)]
+
+    def _in_tile_zones(self, box):
+        x1, y1, x2, y2 = box
+        return not self.tile_zones or any(x1 < zx2 and zx1 < x2 and y1 < zy2 and zy1 < y2
+                                          for zx1, zy1, zx2, zy2 in self.tile_zones)
+
+    def _focus_crops(self, region, offset, focus):
+        """One tile_size window centred on each focus box, skipping boxes an earlier window already covers."""
+        size = self.tile_size
+        rh, rw = region.shape[:2]
+        ox, oy = offset
+        windows = []
+        for fx1, fy1, fx2, fy2 in (focus - np.array([ox, oy, ox, oy])).tolist():
+            if fx2 - fx1 > size or fy2 - fy1 > size:
+                continue # Big enough that the full-frame pass already sees it in detail
+            if any(wx <= fx1 and wy <= fy1 and fx2 <= wx + size and fy2 <= wy + size for wx, wy in windows):
+                continue
+            wx = int(min(max(0, (fx1 + fx2) / 2 - size / 2), max(0, rw - size)))
+            wy = int(min(max(0, (fy1 + fy2) / 2 - size / 2), max(0, rh - size)))
+            windows.append((wx, wy))
+        return [(region[wy:wy + size, wx:wx + size], (ox + wx, oy + wy)) for wx, wy in windows]
+
+    def _run(self, frames, rois):
+        """Plan crops for every frame (tiling if enabled) and return per-frame output arrays."""
+        if not (self.tiled_mode and self.tile_focus == 'persons'):
+            return self._infer([self._crops(frame, roi) for frame, roi in zip(frames, rois)])
+
+        # Stage 1: the whole frame (or roi) at tile_size finds people and large objects
+        # (built explicitly: without tile_full_frame, _crops() starts with the top-left tile)
+        coarse = self._infer([[self._region(frame, roi)] for frame, roi in zip(frames, rois)])
+
+        # Stage 2: native-resolution tiles only where people are (that's where weapons are held)
+        fine_crops = []
+        for frame, roi, (xyxy, cls_ids, _) in zip(frames, rois, coarse):
+            persons = xyxy[cls_ids == self.person_class]
+            if len(persons) == 0:
+                fine_crops.append([])
+                continue
+            # Widen each person box so a weapon at arm's length is still covered
+            pad = np.stack([persons[:, 2] - persons[:, 0], persons[:, 3] - persons[:, 1]] * 2, axis=1) * 0.25
+            focus = persons + pad * np.array([-1, -1, 1, 1])
+            spent = self._model_pixels(self._region(frame, roi)[0].shape, self.tile_size)
+            fine_crops.append(self._crops(frame, roi, focus=focus, full_frame=False, spent=spent))
+        if not any(fine_crops):
+            return coarse
+
+        fine = self._infer(fine_crops)
+        merged = []
+        for (cx, cc, cf), (fx, fc, ff) in zip(coarse, fine):
+            merged.append(self._merge_tiles(np.concatenate([cx, fx]), np.concatenate([cc, fc]),
+                                            np.concatenate([cf, ff])))
+        return merged
+
+    def _infer(self, crops_per_frame):
+        """
+        One model call over every crop of every frame.
+        Returns (xyxy, cls_ids, confs) arrays per frame, in frame coordinates.
+        """
+        images = [crop for crops in crops_per_frame for crop, _ in crops]
+        if not images:
+            return [self._result_arrays([]) for _ in crops_per_frame]
+        imgsz = self.tile_size if self.tiled_mode else self.imgsz
+        source = images[0] if len(images) == 1 else images
+        # Ultralytics returns one Results object per input image, in order
+        start = time.perf_counter()
+        results = self.model(source, verbose=False, conf=self.confidence_threshold, imgsz=imgsz)
+        model_ms = (time.perf_counter() - start) * 1000
+        registry.observe("model_ms", model_ms, help_text="Model forward pass per call (all crops of all frames)")
+        if self._first_frame_pending:
+            self._first_frame_pending = False
+            self.swap_stats["first_frame_ms"] = model_ms
+            registry.observe("first_frame_ms", model_ms, help_text="First inference after a model swap")
+
+        per_frame = []
+        pos = 0
+        for crops in crops_per_frame:
+            frame_results = results[pos:pos + len(crops)]
+            pos += len(crops)
+            arrays = self._result_arrays(frame_results, [offset for _, offset in crops])
+            if len(crops) > 1:
+                arrays = self._merge_tiles(*arrays)
+            per_frame.append(arrays)
+        return per_frame
+
+    def _result_arrays(self, results, offsets=None):
+        """Concatenate xyxy/cls/conf of several results, shifting each by its crop offset."""
+        offsets = offsets or [(0, 0)] * len(results)
+        xyxy, cls_ids, confs = [], [], []
+        for result, (ox, oy) in zip(results, offsets):
+            boxes = result.boxes
+            if len(boxes) == 0:
+                continue
+            boxes_xyxy = boxes.xyxy.cpu().numpy()
+            if ox or oy:
+                boxes_xyxy = boxes_xyxy + np.array([ox, oy, ox, oy], dtype=boxes_xyxy.dtype)
+            xyxy.append(boxes_xyxy)
+            cls_ids.append(boxes.cls.cpu().numpy())
+            confs.append(boxes.conf.cpu().numpy())
+        if not xyxy:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.int32), np.zeros(0, np.float32)
+        return np.concatenate(xyxy), np.concatenate(cls_ids).astype(np.int32), np.concatenate(confs)
 
-                # Weapon Detection
-                is_weapon = cls_id in self.weapon_classes or label == 'cell phone'
-                if is_weapon:
-                    if label == 'cell phone':
-                        label = 'Gun (Simulated)'
-                    
-                    # Zone Check
-                    if self._check_zone((x1, y1, x2, y2)):
-                        continue
-                        
-                    raw_weapons.append({
-                        'label': label,
-                        'confidence': conf,
-                        'box': (x1, y1, x2, y2)
-                    })
-
-        # 2. Smart Privacy Shield (Blur ONLY Unarmed Persons)
+    def _merge_tiles(self, xyxy, cls_ids, confs):
+        """
+        Cross-tile NMS. Uses intersection-over-smaller so an object cut in half by a tile edge
+        is merged into the complete box from the neighbouring tile or the full-frame pass.
+        """
+        if len(xyxy) < 2:
+            return xyxy, cls_ids, confs
+        areas = np.maximum((xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1]), 1e-6)
+        order = np.argsort(-confs)
+        keep = []
+        while order.size:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            inter_w = np.clip(np.minimum(xyxy[i, 2], xyxy[rest, 2]) - np.maximum(xyxy[i, 0], xyxy[rest, 0]), 0, None)
+            inter_h = np.clip(np.minimum(xyxy[i, 3], xyxy[rest, 3]) - np.maximum(xyxy[i, 1], xyxy[rest, 1]), 0, None)
+            ios = inter_w * inter_h / np.minimum(areas[i], areas[rest])
+            duplicate = (ios > self.tile_merge_threshold) & (cls_ids[rest] == cls_ids[i])
+            order = rest[~duplicate]
+        keep = np.array(keep)
+        return xyxy[keep], cls_ids[keep], confs[keep]
+
+    def _tracker(self, stream_id):
+        tracker = self.trackers.get(stream_id)
+        if tracker is None:
+            tracker = self.trackers[stream_id] = Tracker()
+        return tracker
+
+    def predict_tracks(self, stream_id=0):
+        """Predicted weapon boxes for a frame that was skipped (no inference)."""
+        tracker = self._tracker(stream_id)
+        predicted = tracker.predict()
+        for det in predicted:
+            det['confirmed'] = det['hits'] >= self.persistence_threshold
+        self.active_detections[stream_id] = tracker.active()
+        return predicted
+
+    def reset_tracks(self):
+        self.trackers = {}
+        self.active_detections = {}
+
+    def _postprocess(self, frame, arrays, stream_id=0):
+        """Split raw model output into weapons/persons, track weapons and apply the privacy shield."""
+        with registry.timer("postprocess_ms", help_text="Classify, associate, blur and track one frame"):
+            return self._postprocess_frame(frame, arrays, stream_id)
+
+    def _postprocess_frame(self, frame, arrays, stream_id):
+        # 1. First Pass: Classify whole result arrays at once
+        raw_weapons, persons = self._classify(frame, *arrays)
+
+        # 2. Person-Weapon Association (who is holding what)
+        armed = [False] * len(persons)
+        if persons and raw_weapons:
+            intersects, iou, owner = self.associate(persons, [w['box'] for w in raw_weapons])
+            armed = intersects.any(axis=1).tolist()
+            for weapon, person_idx in zip(raw_weapons, owner.tolist()):
+                weapon['person'] = person_idx if person_idx >= 0 else None # Index into persons
+        else:
+            for weapon in raw_weapons:
+                weapon['person'] = None
+
+        # 3. Smart Privacy Shield (Blur ONLY Unarmed Persons)
+        safe_persons = []
         if self.privacy_mode:
-            for px1, py1, px2, py2 in persons:
-                person_box = (px1, py1, px2, py2)
-                is_armed = False
-                
-                # Check if this person is holding a weapon (intersection)
-                for weapon in raw_weapons:
-                    if self._boxes_intersect(person_box, weapon['box']):
-                        is_armed = True
-                        break
-                
-                # Only blur if NOT armed
-                if not is_armed:
-                    # Extract ROI
-                    roi = frame[py1:py2, px1:px2]
-                    if roi.size > 0:
-                        # Apply Gaussian Blur
-                        roi = cv2.GaussianBlur(roi, (51, 51), 30)
-                        # Put back
-                        frame[py1:py2, px1:px2] = roi
-
-        # 3. Temporal Consistency
+            # Only blur if NOT armed
+            safe_persons = [person_box for person_box, is_armed in zip(persons, armed) if not is_armed]
+            with registry.timer("blur_ms", help_text="Privacy anonymizer per frame"):
+                self.anonymizer.apply(frame, safe_persons)
+
+        # 4. Temporal Consistency (stable track IDs and per-track hit counts)
+        tracker = self._tracker(stream_id)
+        tracker.update(raw_weapons)
+        for weapon in raw_weapons:
+            weapon['confirmed'] = weapon['hits'] >= self.persistence_threshold
+        self.active_detections[stream_id] = tracker.active()
         
+        return raw_weapons, persons, safe_persons
+
+    def _classify(self, frame, xyxy, cls_ids, confs):
+        """Split model output arrays into weapon dicts (outside exclusion zones) and person boxes."""
+        if len(cls_ids) == 0:
+            return [], []
+        xyxy = xyxy.astype(np.int32)
+
+        # Person Detection (for Privacy Shield)
+        person_mask = cls_ids == self.person_class
+        persons = list(map(tuple, xyxy[person_mask].tolist()))
+
+        # Weapon Detection
+        # Ids the tables don't cover (a model with more classes than its names) are never weapons
+        lut = self._weapon_lut
+        weapon_mask = np.zeros(len(cls_ids), dtype=bool)
+        known = cls_ids < len(lut)
+        weapon_mask[known] = lut[cls_ids[known]]
+        if not weapon_mask.any():
+            return [], persons
+
+        # Zone Check (one raster lookup for all candidates)
+        if self.exclusion_zones:
+            weapon_idx = np.flatnonzero(weapon_mask)
+            weapon_mask[weapon_idx[self._in_zone_mask(xyxy[weapon_idx], frame.shape)]] = False
+
+        # Only weapons that survive the zone check become dicts
+        raw_weapons = []
+        for box, conf, cls_id in zip(xyxy[weapon_mask].tolist(),
+                                     confs[weapon_mask].tolist(),
+                                     cls_ids[weapon_mask].tolist()):
+            raw_weapons.append({
+                'label': self._label_lut[cls_id],
+                'confidence': conf,
+                'box': tuple(box)
+            })
         return raw_weapons, persons
 
     def apply_privacy_blur(self, frame, persons):
-        """Apply blur to cached person boxes (Naive implementation for skipped frames)."""
-        # NOTE: For skipped frames, we don't have fresh weapon locations to do the 'Smart' check.
-        # Ideally, we should cache 'safe_persons' separately.
-        # For now, we will just skip blurring on skipped frames if we want to be safe, 
-        # OR we can accept that skipped frames might be fully blurred.
-        # BETTER: Let's blur everyone on skipped frames to be safe (Privacy First), 
-        # but since skipped frames are milliseconds, it might flicker.
-        
-        # IMPROVEMENT: The app.py should pass 'last_safe_persons' or similar.
-        # But to keep API simple, let's just blur everyone. 
-        # Wait, if we blur everyone, the weapon will disappear on skipped frames!
-        # So we should probably NOT blur on skipped frames if we want to see the weapon.
-        # OR, better yet, just don't use this method if you care about smart privacy on skipped frames.
-        
+        """Blur cached person boxes on frames that were not run through detect()."""
+        # Pass the 'safe_persons' from the last detect() so armed persons stay visible
         if not self.privacy_mode:
             return
-            
-        for px1, py1, px2, py2 in persons:
-            # Ensure coordinates are within frame
-            h, w = frame.shape[:2]
-            px1, py1 = max(0, px1), max(0, py1)
-            px2, py2 = min(w, px2), min(h, py2)
-            
-            if px1 >= px2 or py1 >= py2:
-                continue
-                
-            roi = frame[py1:py2, px1:px2]
-            if roi.size > 0:
-                roi = cv2.GaussianBlur(roi, (51, 51), 30)
-                frame[py1:py2, px1:px2] = roi
-
+        self.anonymizer.apply(frame, persons)
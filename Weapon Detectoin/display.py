@@ -0,0 +1,84 @@
+"""
+Live-view rendering for the GUI.
+
+Frames are shrunk to the video widget's size first, so privacy blur, annotation and
+BGR->RGB all run on display-sized pixels instead of the full 1080p/4K capture.
+"""
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+def scale_boxes(boxes, scale):
+    """(x1, y1, x2, y2) boxes in capture coordinates -> display coordinates."""
+    if scale == 1.0:
+        return boxes
+    return [tuple(int(v * scale) for v in box) for box in boxes]
+
+
+def scale_detections(detections, scale):
+    """Copies of detection dicts with their 'box' in display coordinates."""
+    if scale == 1.0:
+        return detections
+    return [dict(det, box=tuple(int(v * scale) for v in det['box'])) for det in detections]
+
+
+class DisplayRenderer:
+    """
+    Fits frames to a Tk label and blits them, at most `max_fps` times per second.
+
+    The resize and colour-conversion buffers and the PhotoImage are allocated once
+    per display size and reused; a new frame is pasted into the existing PhotoImage
+    rather than building a new one, so steady-state rendering allocates nothing.
+    """
+
+    def __init__(self, max_fps=30):
+        self.max_fps = max_fps
+        self._last_render = 0.0
+        self._size = None    # (w, h) of the buffers and PhotoImage
+        self._small = None   # Display-size BGR frame, drawn on by the caller
+        self._rgb = None
+        self._photo = None
+
+    def due(self):
+        """True once a frame may be rendered again under the FPS cap."""
+        return not self.max_fps or time.perf_counter() - self._last_render >= 1.0 / self.max_fps
+
+    def fit(self, frame, max_w, max_h):
+        """
+        Copy of `frame` scaled to fit (max_w, max_h), never upscaled, in a reused buffer.
+        Returns (buffer, scale). The buffer is overwritten by the next fit().
+        """
+        h, w = frame.shape[:2]
+        scale = min(max_w / w, max_h / h, 1.0) if max_w > 10 and max_h > 10 else 1.0
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if size != self._size:
+            self._size = size
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._rgb = np.empty_like(self._small)
+            self._photo = None
+        if size == (w, h):
+            np.copyto(self._small, frame)
+        else:
+            # INTER_LINEAR: INTER_AREA is ~25x slower at non-integer 4K factors
+            cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_LINEAR)
+        return self._small, size[0] / w
+
+    def show(self, label, frame):
+        """Blit a frame returned by fit() into the label."""
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        image = Image.frombuffer("RGB", self._size, self._rgb, "raw", "RGB", 0, 1)  # No copy
+        if self._photo is None:
+            self._photo = ImageTk.PhotoImage(image=image)
+            label.imgtk = self._photo  # Keep a reference so Tk doesn't lose the image
+            label.configure(image=self._photo)
+        else:
+            self._photo.paste(image)
+        self._last_render = time.perf_counter()
+
+    def reset(self):
+        """Forget the PhotoImage (e.g. after the label's image was cleared)."""
+        self._size = None
+        self._photo = None
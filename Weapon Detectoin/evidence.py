@@ -1,30 +1,124 @@
+import argparse
 import hashlib
+import hmac
 import json
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
 import cv2
+from metrics import registry
 
 class EvidenceLocker:
-    def __init__(self, evidence_dir="snapshots"):
+    """
+    Hash-chained evidence store.
+
+    The chain lives in `chain_log.jsonl`, one compact JSON entry per line. Appends are
+    written and fsync'd on their own, so their cost does not depend on the length of
+    the chain, and a crash mid-write can at worst leave one partial last line, which
+    is dropped on the next start. `chain_log.checkpoint.json` records the entry count,
+    last hash and byte offset every `checkpoint_interval` appends so startup only has
+    to read the tail of the log. A legacy `chain_log.json` array is migrated once.
+    """
+
+    def __init__(self, evidence_dir="snapshots", checkpoint_interval=100, writer_threads=4):
         self.evidence_dir = evidence_dir
-        self.chain_file = os.path.join(evidence_dir, "chain_log.json")
+        self.chain_file = os.path.join(evidence_dir, "chain_log.jsonl")
+        self.checkpoint_file = os.path.join(evidence_dir, "chain_log.checkpoint.json")
+        self.legacy_chain_file = os.path.join(evidence_dir, "chain_log.json")
+        self.verified_file = os.path.join(evidence_dir, "chain_log.verified.json")
+        self.checkpoint_interval = checkpoint_interval
+        self.last_verify_stats = {}
         self.last_hash = "0" * 64
-        
+        self.next_index = 0
+        self._log = None
+        self._lock = threading.Lock()
+
+        # Background writer (started on the first secure_evidence_async call)
+        self.writer_threads = writer_threads
+        self._pool = None
+        self._committer = None
+        self._pending = queue.Queue()
+        self._crop_writes = []
+        self._crop_errors = []  # Failed crop writes, raised by the next flush()
+        registry.gauge("evidence_pending", self.pending, "Evidence shots queued for the background writer")
+        self._submit_lock = threading.Lock()
+
         if not os.path.exists(evidence_dir):
             os.makedirs(evidence_dir)
-            
+
+        self._migrate_legacy()
         self._load_chain()
 
+    def _migrate_legacy(self):
+        """Convert the old pretty-printed JSON array into the line-delimited log."""
+        if os.path.exists(self.chain_file) or not os.path.exists(self.legacy_chain_file):
+            return
+        try:
+            with open(self.legacy_chain_file, 'r') as f:
+                chain = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Could not migrate {self.legacy_chain_file}: {e}")
+            return
+
+        # Hashes cover the data block, not the file layout, so entries carry over unchanged
+        tmp = self.chain_file + ".tmp"
+        with open(tmp, 'wb') as f:
+            for entry in chain:
+                f.write(self._encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.chain_file)
+        os.replace(self.legacy_chain_file, self.legacy_chain_file + ".migrated")
+        print(f"Migrated {len(chain)} chain entries to {self.chain_file}")
+
     def _load_chain(self):
-        """Load the last hash from the chain log if it exists."""
-        if os.path.exists(self.chain_file):
-            try:
-                with open(self.chain_file, 'r') as f:
-                    chain = json.load(f)
-                    if chain:
-                        self.last_hash = chain[-1]['current_hash']
-            except (json.JSONDecodeError, IndexError):
-                pass
+        """Restore the entry count and last hash from the checkpoint plus the log tail."""
+        if not os.path.exists(self.chain_file):
+            return
+        size = os.path.getsize(self.chain_file)
+
+        offset = 0
+        checkpoint = self._read_checkpoint()
+        if checkpoint and checkpoint['offset'] <= size:
+            offset = checkpoint['offset']
+            self.next_index = checkpoint['count']
+            self.last_hash = checkpoint['last_hash']
+
+        good_end = offset
+        with open(self.chain_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial write from a crash; never acknowledged
+                if line.strip():
+                    entry = json.loads(line)
+                    self.next_index = entry['index'] + 1
+                    self.last_hash = entry['current_hash']
+                good_end += len(line)
+
+        if good_end < size:
+            print(f"Dropping {size - good_end} bytes of incomplete chain entry")
+            with open(self.chain_file, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return None
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                checkpoint = json.load(f)
+            return checkpoint if {'offset', 'count', 'last_hash'} <= checkpoint.keys() else None
+        except (json.JSONDecodeError, OSError, AttributeError):
+            return None
+
+    def _write_checkpoint(self, offset):
+        tmp = self.checkpoint_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"offset": offset, "count": self.next_index, "last_hash": self.last_hash}, f)
+        os.replace(tmp, self.checkpoint_file)
 
     def create_incident_id(self, label):
         """Generates a unique folder name for the incident."""
@@ -39,129 +133,419 @@ class EvidenceLocker:
         Also saves zoomed crops of threats.
         """
         timestamp = datetime.now().isoformat()
-        
-        # Determine folder
-        if incident_id:
-            save_dir = os.path.join(self.evidence_dir, incident_id)
-        else:
-            # Fallback if no incident ID provided (single shot)
-            save_dir = self.evidence_dir
-            
+        save_dir, filename = self._shot_path(incident_id, shot_index)
+        for crop_name, crop in self._crops(frame, detection_meta, shot_index):
+            self._write_jpeg(os.path.join(save_dir, crop_name), crop)
+        image_hasher = self._write_jpeg(os.path.join(save_dir, filename), frame)
+        # Through the committer so it lands after any async shots submitted before it
+        done = Future()
+        done.set_result(image_hasher)
+        with self._submit_lock:
+            self._start_writer()
+            entry = self._queue_commit(done, timestamp, save_dir, filename, detection_meta, incident_id)
+        return entry.result()
+
+    def secure_evidence_async(self, frame, detection_meta, incident_id=None, shot_index=0):
+        """
+        Same as secure_evidence, but encoding, hashing and disk writes happen on the
+        writer pool so the caller never waits on I/O. Chain entries are still appended
+        strictly in submission order. Returns a Future resolving to the chain entry.
+        """
+        timestamp = datetime.now().isoformat()
+        frame = frame.copy()  # The caller keeps drawing on its frame
+        detection_meta = [dict(det) for det in detection_meta]
+        save_dir, filename = self._shot_path(incident_id, shot_index)
+
+        with self._submit_lock:
+            self._start_writer()
+            # Crops are not part of the hash, so they are written independently
+            self._reap_crop_writes()
+            for crop_name, crop in self._crops(frame, detection_meta, shot_index):
+                self._crop_writes.append(self._pool.submit(self._write_jpeg, os.path.join(save_dir, crop_name), crop))
+            encoded = self._pool.submit(self._write_jpeg, os.path.join(save_dir, filename), frame)
+            return self._queue_commit(encoded, timestamp, save_dir, filename, detection_meta, incident_id)
+
+    def secure_pre_event(self, frames, incident_id):
+        """
+        Chain already-encoded pre-event frames ((captured_at, jpeg bytes), oldest first,
+        from a PreEventBuffer) into the incident as pre_event_N.jpg. Written by the
+        background writer; call before the first post-event shot so the chain stays in
+        time order. Returns the list of Futures.
+        """
+        save_dir, _ = self._shot_path(incident_id, 0)
+        entries = []
+        with self._submit_lock:
+            self._start_writer()
+            for k, (captured_at, data) in enumerate(frames):
+                filename = f"pre_event_{k}.jpg"
+                timestamp = datetime.fromtimestamp(captured_at).isoformat()
+                encoded = self._pool.submit(self._write_bytes, os.path.join(save_dir, filename), data)
+                entries.append(self._queue_commit(encoded, timestamp, save_dir, filename, [], incident_id))
+        return entries
+
+    def secure_clip(self, path, frame_meta, incident_id):
+        """
+        Chain a finished video clip (written by ClipEncoder) as one entry whose meta is
+        the per-frame detection list. The file is hashed on the writer pool.
+        """
+        timestamp = datetime.now().isoformat()
+        save_dir, filename = os.path.dirname(path), os.path.basename(path)
+        with self._submit_lock:
+            self._start_writer()
+            hashed = self._pool.submit(self._hash_file, path)
+            return self._queue_commit(hashed, timestamp, save_dir, filename, frame_meta, incident_id)
+
+    def _start_writer(self):
+        """Start the writer pool and committer on first use. Caller holds _submit_lock."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.writer_threads,
+                                            thread_name_prefix="evidence-writer")
+            self._committer = threading.Thread(target=self._commit_loop, daemon=True)
+            self._committer.start()
+
+    def _queue_commit(self, encoded, *args):
+        entry = Future()
+        self._pending.put((encoded, entry, args))
+        return entry
+
+    def _commit_loop(self):
+        """Appends finished shots to the chain in the order they were submitted."""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                self._pending.task_done()
+                return
+            encoded, entry, args = item
+            try:
+                entry.set_result(self._commit(encoded.result(), *args))
+            except Exception as e:
+                print(f"Error securing evidence {args[2]}: {e}")
+                entry.set_exception(e)
+            finally:
+                self._pending.task_done()
+
+    def pending(self):
+        """Shots submitted but not yet in the chain."""
+        return self._pending.unfinished_tasks
+
+    def _reap_crop_writes(self):
+        """Drop finished crop writes, keeping their errors for flush(). Caller holds _submit_lock."""
+        running = []
+        for f in self._crop_writes:
+            if not f.done():
+                running.append(f)
+            elif f.exception() is not None:
+                self._crop_errors.append(f.exception())
+        self._crop_writes = running
+
+    def flush(self, timeout=None):
+        """
+        Block until every submitted shot and crop is on disk and chained. Crops are not
+        chained, so a failed crop write is reported here: logged, then re-raised.
+        """
+        with self._submit_lock:
+            crops, self._crop_writes = self._crop_writes, []
+        self._pending.join()
+        wait(crops, timeout=timeout)
+        with self._submit_lock:
+            self._crop_writes.extend(crops)
+            self._reap_crop_writes()
+            errors, self._crop_errors = self._crop_errors, []
+        for e in errors:
+            print(f"Error writing evidence crop: {e}")
+        if errors:
+            raise errors[0]
+
+    def _shot_path(self, incident_id, shot_index):
+        # Fallback if no incident ID provided (single shot)
+        save_dir = os.path.join(self.evidence_dir, incident_id) if incident_id else self.evidence_dir
         if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-
-        # Filename logic
-        base_name = f"evidence_{shot_index}"
-        filename = f"{base_name}.jpg"
-        filepath = os.path.join(save_dir, filename)
-        
-        # Save Full Frame
-        cv2.imwrite(filepath, frame)
-        
-        # Save Zoomed Crops
+            os.makedirs(save_dir, exist_ok=True)
+        return save_dir, f"evidence_{shot_index}.jpg"
+
+    def _crops(self, frame, detection_meta, shot_index):
+        """Zoomed crops (50% padding for context) around each detection."""
+        h, w = frame.shape[:2]
         for i, det in enumerate(detection_meta):
             x1, y1, x2, y2 = det['box']
-            h, w = frame.shape[:2]
-            
-            # Add padding (zoom context)
             pad_x = int((x2 - x1) * 0.5)
             pad_y = int((y2 - y1) * 0.5)
-            
-            crop_x1 = max(0, x1 - pad_x)
-            crop_y1 = max(0, y1 - pad_y)
-            crop_x2 = min(w, x2 + pad_x)
-            crop_y2 = min(h, y2 + pad_y)
-            
-            crop = frame[crop_y1:crop_y2, crop_x1:crop_x2]
-            crop_filename = f"{base_name}_zoom_{i}_{det['label']}.jpg"
-            cv2.imwrite(os.path.join(save_dir, crop_filename), crop)
-        
-        # Read back bytes for hashing (ensure identical bytes)
-        with open(filepath, 'rb') as f:
-            image_bytes = f.read()
-            
-        # Create Data Block
-        data_block = {
-            "timestamp": timestamp,
-            "filename": os.path.join(os.path.basename(save_dir), filename) if incident_id else filename,
-            "incident_id": incident_id,
-            "meta": detection_meta,
-            "previous_hash": self.last_hash
-        }
-        
-        # Calculate Hash
+            crop = frame[max(0, y1 - pad_y):min(h, y2 + pad_y), max(0, x1 - pad_x):min(w, x2 + pad_x)]
+            yield f"evidence_{shot_index}_zoom_{i}_{det['label']}.jpg", crop
+
+    @classmethod
+    def _write_jpeg(cls, path, image):
+        """Encode once, write those exact bytes and return a sha256 already fed with them."""
+        ok, buffer = cv2.imencode(".jpg", image)
+        if not ok:
+            raise ValueError(f"Could not encode {path}")
+        return cls._write_bytes(path, buffer.tobytes())
+
+    @staticmethod
+    def _hash_file(path, chunk_size=1 << 20):
         hasher = hashlib.sha256()
-        hasher.update(image_bytes)
-        hasher.update(json.dumps(data_block, sort_keys=True).encode('utf-8'))
-        current_hash = hasher.hexdigest()
-        
-        # Update Chain
-        entry = {
-            "index": self._get_next_index(),
-            "timestamp": timestamp,
-            "data": data_block,
-            "current_hash": current_hash
-        }
-        
-        self._append_to_log(entry)
-        self.last_hash = current_hash
-        
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+        return hasher
+
+    @staticmethod
+    def _write_bytes(path, data):
+        with registry.timer("evidence_write_ms", help_text="Writing one evidence file"):
+            with open(path, 'wb') as f:
+                f.write(data)
+            return hashlib.sha256(data)
+
+    def _commit(self, image_hasher, timestamp, save_dir, filename, detection_meta, incident_id):
+        # Chain state must not move between reading last_hash and appending
+        with self._lock:
+            # Create Data Block
+            data_block = {
+                "timestamp": timestamp,
+                "filename": os.path.join(os.path.basename(save_dir), filename) if incident_id else filename,
+                "incident_id": incident_id,
+                "meta": detection_meta,
+                "previous_hash": self.last_hash
+            }
+
+            # Calculate Hash (image bytes were already fed in by _write_jpeg)
+            hasher = image_hasher.copy()
+            hasher.update(json.dumps(data_block, sort_keys=True).encode('utf-8'))
+            current_hash = hasher.hexdigest()
+
+            # Update Chain
+            entry = {
+                "index": self.next_index,
+                "timestamp": timestamp,
+                "data": data_block,
+                "current_hash": current_hash
+            }
+            self._append_to_log(entry)
+
         return entry
 
-    def _get_next_index(self):
-        if os.path.exists(self.chain_file):
-            try:
-                with open(self.chain_file, 'r') as f:
-                    chain = json.load(f)
-                    return len(chain)
-            except:
-                return 0
-        return 0
+    @staticmethod
+    def _encode(entry):
+        return (json.dumps(entry, separators=(',', ':')) + "\n").encode('utf-8')
 
     def _append_to_log(self, entry):
-        chain = []
-        if os.path.exists(self.chain_file):
-            try:
-                with open(self.chain_file, 'r') as f:
-                    chain = json.load(f)
-            except:
-                pass
-        
-        chain.append(entry)
-        
-        with open(self.chain_file, 'w') as f:
-            json.dump(chain, f, indent=4)
-            
-    def verify_integrity(self):
-        """Re-calculates all hashes to verify chain integrity."""
+        """Write one line and fsync it. Caller holds the lock."""
+        if self._log is None:
+            self._log = open(self.chain_file, 'ab')
+        with registry.timer("chain_append_ms", help_text="Appending and fsyncing one chain entry"):
+            self._log.write(self._encode(entry))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        registry.counter("evidence_entries_total", "Chain entries written").inc()
+
+        self.last_hash = entry['current_hash']
+        self.next_index = entry['index'] + 1
+        if self.next_index % self.checkpoint_interval == 0:
+            self._write_checkpoint(self._log.tell())
+
+    def iter_chain(self):
+        """Yield chain entries in order without loading the whole log."""
+        for entry, _ in self._iter_log():
+            yield entry
+
+    def _iter_log(self, offset=0):
+        """Yield (entry, byte offset just past it), starting at `offset`."""
+        if not os.path.exists(self.chain_file):
+            return
+        with open(self.chain_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    yield json.loads(line), offset
+
+    def close(self):
+        """Drain the writer, stop it and write a final checkpoint."""
+        try:
+            self.flush()
+        except Exception:
+            pass  # Failed crop writes were logged by flush(); still shut down cleanly
+        with self._submit_lock:
+            if self._pool is not None:
+                self._pending.put(None)
+                self._committer.join()
+                self._pool.shutdown(wait=True)
+                self._pool = self._committer = None
+        with self._lock:
+            if self._log is not None:
+                self._write_checkpoint(self._log.tell())
+                self._log.close()
+                self._log = None
+
+    def verify_integrity(self, incident_id=None, full=False, workers=None, batch_size=256, progress=None):
+        """
+        Re-calculates hashes to verify chain integrity.
+
+        Linkage is checked sequentially; image hashing (streamed in chunks) is spread
+        over a process pool. Unless `full` is set, verification resumes after the last
+        HMAC-signed checkpoint written by a previous successful run. Checkpoints are
+        signed with $EVIDENCE_VERIFY_KEY; without it none are read or written, and every
+        run verifies the full chain. With `incident_id`, linkage is still checked for
+        the whole chain but only that incident's images are re-hashed. `progress` is
+        called with a stats dict after every batch; the final stats are kept in
+        `last_verify_stats`.
+        """
         if not os.path.exists(self.chain_file):
             return True, "No chain file found."
-            
-        with open(self.chain_file, 'r') as f:
-            chain = json.load(f)
-            
-        prev_hash = "0" * 64
-        for i, entry in enumerate(chain):
-            # Verify Linkage
-            if entry['data']['previous_hash'] != prev_hash:
-                return False, f"Broken chain at index {i}: Previous hash mismatch."
-            
-            # Verify Content
-            filepath = os.path.join(self.evidence_dir, entry['data']['filename'])
-            if not os.path.exists(filepath):
-                return False, f"Missing evidence file at index {i}: {filepath}"
-                
-            with open(filepath, 'rb') as img_f:
-                image_bytes = img_f.read()
-                
-            hasher = hashlib.sha256()
-            hasher.update(image_bytes)
-            hasher.update(json.dumps(entry['data'], sort_keys=True).encode('utf-8'))
-            calculated_hash = hasher.hexdigest()
-            
-            if calculated_hash != entry['current_hash']:
-                return False, f"Data corruption at index {i}: Hash mismatch."
-                
-            prev_hash = entry['current_hash']
-            
+
+        prev_hash, index, offset = "0" * 64, 0, 0
+        checkpoint = None if (full or incident_id) else self._read_verified_checkpoint()
+        if checkpoint:
+            prev_hash, index, offset = checkpoint['last_hash'], checkpoint['count'], checkpoint['offset']
+
+        stats = {"entries": 0, "hashed": 0, "bytes": 0, "seconds": 0.0, "resumed_at": index}
+        self.last_verify_stats = stats
+        start = time.perf_counter()
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        def check(batch):
+            jobs = [(path, data) for _, _, path, data in batch]
+            if pool:
+                results = pool.map(_hash_evidence, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4)))
+            else:
+                results = (_hash_evidence(path, data) for path, data in jobs)
+            for (i, expected, path, _), (calculated, size) in zip(batch, results):
+                if calculated is None:
+                    return False, f"Missing evidence file at index {i}: {path}"
+                if calculated != expected:
+                    return False, f"Data corruption at index {i}: Hash mismatch."
+                stats["hashed"] += 1
+                stats["bytes"] += size
+            return True, None
+
+        try:
+            batch = []
+            for entry, end in self._iter_log(offset):
+                i = entry['index']
+                # Verify Linkage
+                if i != index:
+                    return False, f"Broken chain at index {index}: Entry has index {i}."
+                if entry['data']['previous_hash'] != prev_hash:
+                    return False, f"Broken chain at index {i}: Previous hash mismatch."
+                prev_hash = entry['current_hash']
+                index += 1
+                stats["entries"] += 1
+
+                # Verify Content (batched)
+                if incident_id is None or entry['data'].get('incident_id') == incident_id:
+                    filepath = os.path.join(self.evidence_dir, entry['data']['filename'])
+                    data = json.dumps(entry['data'], sort_keys=True).encode('utf-8')
+                    batch.append((i, entry['current_hash'], filepath, data))
+                if len(batch) >= batch_size:
+                    ok, message = check(batch)
+                    if not ok:
+                        return ok, message
+                    batch = []
+                    if incident_id is None:
+                        self._write_verified_checkpoint(index, end, prev_hash)
+                    self._report(stats, start, progress)
+
+            if batch or not stats["hashed"]:
+                ok, message = check(batch)
+                if not ok:
+                    return ok, message
+                if incident_id is None and stats["entries"]:
+                    self._write_verified_checkpoint(index, end, prev_hash)
+                self._report(stats, start, progress)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if incident_id is not None and not stats["hashed"]:
+            return False, f"No evidence found for incident {incident_id}."
         return True, "Chain integrity verified."
+
+    @staticmethod
+    def _report(stats, start, progress):
+        stats["seconds"] = time.perf_counter() - start
+        elapsed = max(stats["seconds"], 1e-9)
+        stats["entries_per_s"] = stats["entries"] / elapsed
+        stats["mb_per_s"] = stats["bytes"] / elapsed / 1e6
+        if progress:
+            progress(stats)
+
+    def _verify_key(self):
+        """
+        HMAC key for verified checkpoints, from $EVIDENCE_VERIFY_KEY, or None if unset.
+        The key must live outside the locker: anyone who can write the evidence could
+        otherwise forge a checkpoint and skip verification of what they changed.
+        """
+        key = os.environ.get("EVIDENCE_VERIFY_KEY")
+        return key.encode('utf-8') if key else None
+
+    def _sign(self, body):
+        message = json.dumps(body, sort_keys=True).encode('utf-8')
+        return hmac.new(self._verify_key(), message, hashlib.sha256).hexdigest()
+
+    def _write_verified_checkpoint(self, count, offset, last_hash):
+        if self._verify_key() is None:
+            return  # No key, no checkpoint: every run verifies the full chain
+        body = {"count": count, "offset": offset, "last_hash": last_hash}
+        tmp = self.verified_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(dict(body, signature=self._sign(body)), f)
+        os.replace(tmp, self.verified_file)
+
+    def _read_verified_checkpoint(self):
+        if self._verify_key() is None:
+            print("EVIDENCE_VERIFY_KEY is not set; verifying the full chain.")
+            return None
+        if not os.path.exists(self.verified_file):
+            return None
+        try:
+            with open(self.verified_file, 'r') as f:
+                checkpoint = json.load(f)
+            body = {k: checkpoint[k] for k in ("count", "offset", "last_hash")}
+        except (json.JSONDecodeError, OSError, KeyError, TypeError):
+            return None
+        if not hmac.compare_digest(self._sign(body), str(checkpoint.get("signature", ""))):
+            print("Verified checkpoint signature mismatch, verifying the full chain.")
+            return None
+        if body["offset"] > os.path.getsize(self.chain_file):
+            return None
+        return body
+
+
+def _hash_evidence(path, data, chunk_size=1 << 20):
+    """sha256(image bytes + data block), reading the image in chunks. Runs in a pool worker."""
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+                size += len(chunk)
+    except FileNotFoundError:
+        return None, 0
+    hasher.update(data)
+    return hasher.hexdigest(), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the evidence hash chain")
+    parser.add_argument("--dir", default="snapshots", help="Evidence directory")
+    parser.add_argument("--incident", help="Only re-hash this incident's images")
+    parser.add_argument("--full", action="store_true", help="Ignore the verified checkpoint")
+    parser.add_argument("--workers", type=int, help="Hashing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    def progress(stats):
+        print(f"{stats['entries']} entries, {stats['entries_per_s']:.0f} entries/s, "
+              f"{stats['mb_per_s']:.1f} MB/s")
+
+    locker = EvidenceLocker(args.dir)
+    ok, message = locker.verify_integrity(args.incident, args.full, args.workers, progress=progress)
+    print(message)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
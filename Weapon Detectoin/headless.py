@@ -0,0 +1,302 @@
+"""
+Headless runner for servers without a display.
+
+Drives WeaponDetector, AlertManager and EvidenceLocker over one or more video sources
+from a JSON config file. Never imports Tk or PIL, so it runs without an X server.
+
+    python headless.py --config headless_config.json
+"""
+from startup import startup  # First: starts the startup clock
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+
+with startup.importing("app modules"):  # Includes cv2 and numpy; no Tk, torch or twilio
+    from detector import WeaponDetector
+    from notifier import AlertManager, make_transport
+    from evidence import EvidenceLocker
+    from pipeline import MultiSourceManager
+    from motion import MotionGate
+    from scheduler import InferenceScheduler
+    from prebuffer import PreEventBuffer
+    from clip import ClipEncoder
+    from workers import CameraSupervisor
+    import metrics
+    from incident import ThreatState, annotate, describe
+startup.mark("imports")
+
+DEFAULT_CONFIG = {
+    "sources": [0],             # Device index, file path or RTSP URL
+    "model_path": "yolov8m.pt",
+    "backend": "torch",         # "torch", "onnx" (ONNX Runtime) or "openvino"
+    "int8": False,              # INT8 export for onnx/openvino, calibrated on "calibration"
+    "calibration": [],          # Our own footage for INT8: video files or image directories
+    "model_cache": "model_cache",  # Exported models, keyed by weights hash, imgsz and precision
+    "confidence": 0.5,
+    "high_res": False,
+    "tiled": False,             # Sliced inference for small, distant weapons (experimental)
+    "tile_size": 640,
+    "tile_overlap": 0.1,
+    "tile_focus": "persons",    # "persons" = tiles around people only, "all" = full grid
+    "tile_zones": [],           # Only tile inside these [[x, y], ...] polygons (empty = anywhere)
+    "tile_budget": 1.0,         # Max tiling cost per frame, as a fraction of the 1280 mode's
+    "privacy": True,
+    "zones": [],                # Exclusion zones: list of [[x, y], ...] polygons
+    "target_fps": 10,           # Inference batches per second (0 = unlimited)
+    "batch_size": 4,
+    "max_wait_ms": 20,
+    "camera_workers": 0,        # Run the cameras in this many worker processes (0 = in this process)
+    "worker_ring_slots": 4,     # Shared-memory frame slots per camera between a worker and the runner
+    "motion_gating": False,     # Skip inference on streams whose scene hasn't changed
+    "motion_force_interval": 2.0,  # Seconds between forced full inferences when gated
+    "adaptive": False,          # Latency/threat-driven cadence with a shared compute budget
+    "compute_budget": 0.8,      # Seconds of inference per second, summed over all streams
+    "evidence_dir": "snapshots",
+    "pre_event_seconds": 5.0,   # Seconds before escalation saved with each incident (0 = off)
+    "pre_event_fps": 5.0,
+    "pre_event_max_mb": 16,     # Memory cap per camera; a list sets one cap per source
+    "evidence_mode": "burst",   # "burst" (JPEG shots), "clip" (one video per incident) or "both"
+    "clip_seconds": 5.0,        # Post-event length of incident clips
+    "clip_fps": 5.0,
+    "cpu_affinity": [],         # Pin the process to these cores (Linux only)
+    "twilio": {},               # {"sid": ..., "token": ..., "from": ..., "to": ...}
+    "alert_transports": [],     # Extra channels: {"type": "file", "path": ...} or {"type": "http", "url": ...}
+    "alert_coalesce_s": 2.0,    # Alerts raised within this window go out as one message
+    "metrics_port": 0,          # Serve Prometheus-style metrics on 127.0.0.1:<port>/metrics (0 = off)
+    "metrics_dump": "",         # Also rewrite this file with the metrics every metrics_dump_interval s
+    "metrics_dump_interval": 60,
+    "profile_seconds": 0,       # Sample every thread's stack for this long after start (0 = off)
+    "profile_path": "profile.txt"
+}
+
+
+def load_config(path):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def parse_source(source):
+    """Device indices may be written as strings ("0") in the config."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def build_detector(config, load_async=True):
+    detector = WeaponDetector(model_path=config["model_path"],
+                              confidence_threshold=config["confidence"],
+                              backend=config["backend"], int8=config["int8"],
+                              calibration=config["calibration"],
+                              model_cache=config["model_cache"],
+                              load_async=load_async)  # Sources open while the model loads
+    # A model loaded up front prepares the configured input size before the first frame;
+    # one still loading warms up for it itself
+    detector.set_high_res_mode(config["high_res"], wait=not load_async)
+    detector.set_tiled_mode(config["tiled"], config["tile_size"],
+                            config["tile_overlap"], config["tile_focus"], wait=not load_async,
+                            zones=config["tile_zones"], budget=config["tile_budget"])
+    detector.set_privacy(config["privacy"])
+    detector.set_zones(config["zones"])
+    return detector
+
+
+def build_manager(config, detector):
+    """In-process capture + batched inference for the configured pipeline options."""
+    gate_factory = None
+    if config["motion_gating"]:
+        gate_factory = lambda: MotionGate(force_interval=config["motion_force_interval"])
+    scheduler = None
+    if config["adaptive"]:
+        scheduler = InferenceScheduler(compute_budget=config["compute_budget"])
+    return MultiSourceManager(detector,
+                              batch_size=config["batch_size"],
+                              max_wait_ms=config["max_wait_ms"],
+                              target_fps=config["target_fps"] or None,
+                              display=False,
+                              motion_gate_factory=gate_factory,
+                              scheduler=scheduler)
+
+
+class HeadlessRunner:
+    def __init__(self, config, detector=None):
+        self.config = config
+        self._stop_event = threading.Event()
+
+        if config["camera_workers"]:
+            # Capture, inference and blur run in worker processes; this one does the rest
+            self.detector = None
+            self.manager = CameraSupervisor(config, workers=config["camera_workers"])
+        else:
+            # `detector` lets callers (e.g. the benchmark) supply an already-built one
+            self.detector = detector if detector is not None else build_detector(config)
+            self.manager = build_manager(config, self.detector)
+
+        twilio = config.get("twilio") or {}
+        self.alerter = AlertManager(twilio.get("sid"), twilio.get("token"),
+                                    twilio.get("from"), twilio.get("to"),
+                                    transports=[make_transport(t) for t in config["alert_transports"]],
+                                    coalesce_window=config["alert_coalesce_s"],
+                                    image_dir=config["evidence_dir"])
+        self.evidence_locker = EvidenceLocker(config["evidence_dir"])
+        self.clip_encoder = None
+        if config["evidence_mode"] in ("clip", "both"):
+            self.clip_encoder = ClipEncoder(
+                lambda incident_id, path, meta: self.evidence_locker.secure_clip(path, meta, incident_id),
+                fps=config["clip_fps"], duration=config["clip_seconds"])
+        self.recording = {}  # stream_id -> incident_id of the clip being recorded
+
+        self.threats = {}  # stream_id -> ThreatState
+        self.pre_events = {}  # stream_id -> PreEventBuffer
+        for source in config["sources"]:
+            stream_id = self.manager.add_source(parse_source(source))
+            self.threats[stream_id] = ThreatState()
+            pre_event = self._make_pre_event(stream_id)
+            if pre_event:
+                self.pre_events[stream_id] = pre_event
+
+    def _make_pre_event(self, stream_id):
+        if not self.config["pre_event_seconds"]:
+            return None
+        max_mb = self.config["pre_event_max_mb"]
+        if isinstance(max_mb, list):
+            max_mb = max_mb[stream_id]
+        return PreEventBuffer(seconds=self.config["pre_event_seconds"], fps=self.config["pre_event_fps"],
+                              max_bytes=int(max_mb * 1024 * 1024))
+
+    def stop(self, *_):
+        self._stop_event.set()
+
+    def process_result(self, result):
+        if result.inferred:
+            startup.mark("first_inference")
+        state = self.threats[result.stream_id]
+        frame = result.frame
+        detections = result.detections
+
+        detected_threats = state.update(detections)
+        if self.config["adaptive"]:
+            self.manager.update_threat(result.stream_id, state.current_threat_level)
+        annotate(frame, detections)
+
+        if state.should_escalate(detected_threats):
+            label = detected_threats[0]['label']
+            state.start_incident(self.evidence_locker.create_incident_id(f"cam{result.stream_id}_{label}"))
+            # Real inference on every burst frame, so the shots carry real boxes, not predictions
+            self.manager.set_force_infer(result.stream_id, True)
+            pre_event = self.pre_events.get(result.stream_id)
+            pre_frames = pre_event.snapshot() if pre_event else []
+            if self.clip_encoder:
+                if result.stream_id in self.recording:
+                    self.clip_encoder.finish_clip(self.recording[result.stream_id])
+                incident_dir = os.path.join(self.config["evidence_dir"], state.current_incident_id)
+                self.clip_encoder.start_clip(state.current_incident_id, incident_dir, frame.shape, pre_frames)
+                self.recording[result.stream_id] = state.current_incident_id
+            if pre_frames and self.config["evidence_mode"] != "clip":
+                self.evidence_locker.secure_pre_event(pre_frames, state.current_incident_id)
+            self.alerter.trigger_alert(frame, label, detected_threats, stream_id=result.stream_id)
+            print(f"[stream {result.stream_id}] THREAT DETECTED: {describe(detected_threats[0])}")
+
+        clip_id = self.recording.get(result.stream_id)
+        if clip_id and not self.clip_encoder.offer(clip_id, frame, result.captured_at, detections):
+            del self.recording[result.stream_id]
+
+        # Burst shots only from real inferences: results already queued when forcing started may be predictions
+        shot_idx = state.next_shot() if result.inferred else None
+        if shot_idx is not None:
+            if self.config["evidence_mode"] != "clip":
+                self.evidence_locker.secure_evidence_async(frame, detections,
+                                                           incident_id=state.current_incident_id,
+                                                           shot_index=shot_idx)
+            if not state.incident_capture_active:
+                self.manager.set_force_infer(result.stream_id, False)
+                print(f"[stream {result.stream_id}] Evidence secured: {state.current_incident_id}")
+
+        # No operator to acknowledge headless alerts; re-arm once the scene has cleared
+        if state.escalated and not state.incident_capture_active and not state.threat_persistence:
+            state.acknowledge()
+
+        if result.stream_id in self.pre_events:
+            self.pre_events[result.stream_id].add(frame, result.captured_at)
+
+    def run(self):
+        if self.config.get("cpu_affinity") and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.config["cpu_affinity"])
+
+        try:
+            return self._monitor()
+        finally:
+            # Always runs, so a crash can't leave worker processes or shared-memory rings behind
+            self.manager.stop()
+            for pre_event in self.pre_events.values():
+                pre_event.close()
+            if self.clip_encoder:
+                self.clip_encoder.close()
+            self.alerter.close()
+            self.evidence_locker.close()
+            if self.config["metrics_dump"]:
+                metrics.registry.dump(self.config["metrics_dump"])
+            metrics.registry.stop()
+            print("Stopped.")
+
+    def _monitor(self):
+        failed = self.manager.start()
+        if len(failed) == len(self.threats):
+            print("No video sources could be opened.")
+            return 1
+        startup.mark("first_frame")
+
+        print(f"Monitoring {len(self.threats) - len(failed)} stream(s). Send SIGTERM to stop.")
+        if self.config["metrics_port"]:
+            metrics.registry.serve(self.config["metrics_port"])
+        if self.config["metrics_dump"]:
+            metrics.registry.start_dump(self.config["metrics_dump"], self.config["metrics_dump_interval"])
+        if self.config["profile_seconds"]:
+            metrics.profile(self.config["profile_seconds"], self.config["profile_path"])
+        last_report = time.time()
+        while not self._stop_event.is_set() and self.manager.is_running:
+            if self.detector is None or self.detector.model_ready.is_set():
+                startup.mark("model_ready")  # Workers load their model before start() returns
+            elif self.detector.load_error is not None:
+                print("Model failed to load; stopping.")
+                break
+            for result in self.manager.poll_results():
+                self.process_result(result)
+
+            if time.time() - last_report >= 60:
+                last_report = time.time()
+                pre_event_mb = sum(b.bytes for b in self.pre_events.values()) / 1e6
+                clips = self.clip_encoder.stats() if self.clip_encoder else None
+                print(f"Stats: {self.manager.stats()}, pre-event buffers {pre_event_mb:.1f} MB, clips {clips}, alerts {self.alerter.stats()}")
+            self._stop_event.wait(0.01)
+
+        # Process whatever finished before shutdown
+        for result in self.manager.poll_results():
+            self.process_result(result)
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentinel Eye headless detector")
+    parser.add_argument("--config", help="Path to a JSON config file")
+    parser.add_argument("--source", action="append", help="Override config sources (repeatable)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.source:
+        config["sources"] = args.source
+
+    runner = HeadlessRunner(config)
+    startup.mark("window")
+    signal.signal(signal.SIGTERM, runner.stop)
+    signal.signal(signal.SIGINT, runner.stop)
+    return runner.run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+import cv2
+
+
+def annotate(frame, detections):
+    """Draw weapon boxes and labels onto the frame (in place)."""
+    for det in detections:
+        x1, y1, x2, y2 = det['box']
+        label = f"{det['label']} {det['confidence']:.2f}"
+        if 'track_id' in det:
+            label = f"#{det['track_id']} {label}"
+        color = (0, 0, 255) # Red for weapon
+
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+
+def describe(det):
+    """Human-readable threat, e.g. "Person 2 holding knife"."""
+    if det.get('person') is not None:
+        return f"Person {det['person'] + 1} holding {det['label']}"
+    return det['label']
+
+
+class ThreatState:
+    """
+    Threat level, persistence and incident-capture bookkeeping for one stream.
+    Shared by the GUI and the headless runner so both escalate identically.
+    """
+
+    def __init__(self, escalation_frames=5, burst_size=5):
+        self.escalation_frames = escalation_frames # Alert if seen for > N frames
+        self.burst_size = burst_size               # Evidence shots per incident
+
+        self.current_threat_level = 0.0
+        self.threat_persistence = {} # Track ID (or label when untracked) -> frames
+        self.escalated = False
+
+        # Incident Capture State
+        self.incident_capture_active = False
+        self.incident_frames_left = 0
+        self.current_incident_id = None
+
+    def update(self, detections):
+        """Feed one inference result. Returns the detections that are persistent enough to alert on."""
+        # Tracker predictions on skipped frames keep a track's count but never add to it
+        observed = [det for det in detections if not det.get('predicted')]
+        seen = {self._key(det) for det in detections}
+        if observed:
+            self.current_threat_level = min(1.0, self.current_threat_level + 0.1)
+            for key in {self._key(det) for det in observed}:
+                self.threat_persistence[key] = self.threat_persistence.get(key, 0) + 1
+        elif not detections:
+            self.current_threat_level = max(0.0, self.current_threat_level - 0.05)
+        # Only predictions: the level holds, like the persistence of those tracks
+
+        # Decay persistence of anything not seen this frame
+        for k in list(self.threat_persistence.keys()):
+            if k in seen:
+                continue
+            self.threat_persistence[k] = max(0, self.threat_persistence[k] - 1)
+            if self.threat_persistence[k] == 0:
+                del self.threat_persistence[k]
+
+        # Tracked detections must also be confirmed by the tracker (enough real hits)
+        return [det for det in observed
+                if det.get('confirmed', True)
+                and self.threat_persistence.get(self._key(det), 0) > self.escalation_frames]
+
+    @staticmethod
+    def _key(det):
+        # Two different knives are two tracks; a flickering label keeps its track
+        return det.get('track_id', det['label'])
+
+    def should_escalate(self, detected_threats):
+        return bool(detected_threats) and not self.escalated
+
+    def start_incident(self, incident_id):
+        self.escalated = True
+        self.incident_capture_active = True
+        self.incident_frames_left = self.burst_size
+        self.current_incident_id = incident_id
+
+    def next_shot(self):
+        """Shot index for the next burst frame, or None if no capture is in progress."""
+        if not self.incident_capture_active or self.incident_frames_left <= 0:
+            return None
+        shot_idx = self.burst_size - self.incident_frames_left
+        self.incident_frames_left -= 1
+        if self.incident_frames_left == 0:
+            self.incident_capture_active = False
+        return shot_idx
+
+    def acknowledge(self):
+        self.escalated = False
+        self.threat_persistence.clear()
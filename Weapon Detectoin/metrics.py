@@ -0,0 +1,259 @@
+"""
+Process-wide runtime metrics: latency histograms, counters and gauges.
+
+Components record into the shared `registry`:
+
+    from metrics import registry
+    with registry.timer("inference_ms"):
+        ...
+    registry.counter("frames_total", stage="capture").inc()
+
+`render()` produces Prometheus text exposition, served by `serve(port)` on
+localhost and/or written periodically by `start_dump(path)`. `profile()` is an
+opt-in sampling profiler over every thread.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as Tally
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "sentinel_"
+
+# Millisecond buckets, from sub-ms post-processing up to multi-second stalls
+DEFAULT_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Either set() explicitly or backed by a function polled at render time."""
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        if self.fn is None:
+            return self._value
+        try:
+            return self.fn()
+        except Exception:
+            return float("nan")
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Bucket upper bound containing quantile q (coarse, but cheap)."""
+        with self._lock:
+            target, seen = q * self.count, 0
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                seen += n
+                if seen >= target and self.count:
+                    return bound
+        return 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}  # (name, labels) -> metric
+        self._help = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._dumper = None
+        self._dump_stop = threading.Event()
+
+    def _get(self, cls, name, labels, help_text, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(**kwargs)
+                    if help_text:
+                        self._help[name] = help_text
+        return metric
+
+    def counter(self, name, help_text="", **labels):
+        return self._get(Counter, name, labels, help_text)
+
+    def gauge(self, name, fn=None, help_text="", **labels):
+        gauge = self._get(Gauge, name, labels, help_text)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS_MS, **labels):
+        return self._get(Histogram, name, labels, help_text, buckets=buckets)
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    @contextmanager
+    def timer(self, name, help_text="", **labels):
+        """Record the block's wall time in milliseconds."""
+        histogram = self.histogram(name, help_text, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe((time.perf_counter() - start) * 1000)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: (item[0][0], str(item[0][1])))
+        lines, typed = [], set()
+        for (name, labels), metric in items:
+            full = PREFIX + name
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(metric)]
+                lines.append(f"# TYPE {full} {kind}")
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, n in zip(metric.buckets + ("+Inf",), metric.counts):
+                    cumulative += n
+                    lines.append(f"{full}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{full}_sum{_label_text(labels)} {metric.sum}")
+                lines.append(f"{full}_count{_label_text(labels)} {metric.count}")
+            else:
+                lines.append(f"{full}{_label_text(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Serve render() at http://host:port/metrics from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # No per-scrape console noise
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics at http://{host}:{self._server.server_port}/metrics")
+        return self._server.server_port
+
+    def dump(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def start_dump(self, path, interval=60.0):
+        """Rewrite `path` with the current metrics every `interval` seconds."""
+        def loop():
+            while not self._dump_stop.wait(interval):
+                self.dump(path)
+        self._dump_stop.clear()
+        self._dumper = threading.Thread(target=loop, daemon=True)
+        self._dumper.start()
+
+    def stop(self):
+        self._dump_stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+def profile(seconds, path, interval=0.005):
+    """
+    Sample every thread's stack each `interval` seconds for `seconds` seconds (runs in
+    the background). Writes collapsed stacks (one "frame;frame;frame count" line each,
+    flamegraph-ready) to `path` and the hottest functions to `path`.top.txt.
+    """
+    def run():
+        stacks, leaf = Tally(), Tally()
+        own = threading.get_ident()
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                summary = traceback.extract_stack(frame)
+                stack = ";".join(f"{os.path.basename(f.filename)}:{f.name}" for f in summary)
+                stacks[stack] += 1
+                if summary:
+                    leaf[f"{os.path.basename(summary[-1].filename)}:{summary[-1].name}"] += 1
+            time.sleep(interval)
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        total = sum(leaf.values()) or 1
+        with open(path + ".top.txt", 'w') as f:
+            for name, count in leaf.most_common(40):
+                f.write(f"{count / total:6.1%}  {name}\n")
+        print(f"Profile written to {path}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+@contextmanager
+def cprofile(path):
+    """Deterministic cProfile of the calling thread only; stats saved for pstats/snakeviz."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,104 @@
+import time
+
+import cv2
+
+
+class MotionGate:
+    """
+    Cheap change detector that decides whether a frame is worth running YOLO on.
+
+    Each frame is shrunk to `width` pixels, greyscaled and compared against the frame
+    that was last sent to inference. If less than `min_area` of the pixels changed by
+    more than `threshold`, the frame is skipped. A full inference is still forced every
+    `force_interval` seconds so a scene can never go unchecked for long.
+    """
+
+    def __init__(self, width=160, threshold=25, min_area=0.002, force_interval=2.0,
+                 use_roi=False, roi_padding=0.15):
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area           # Fraction of pixels that must change
+        self.force_interval = force_interval
+        self.use_roi = use_roi             # Restrict inference to the moving region
+        self.roi_padding = roi_padding     # Padding around the motion box (fraction of its size)
+
+        self.reference = None
+        self.last_infer_time = 0.0
+
+        # Stats
+        self.checked = 0
+        self.passed = 0    # Frames sent to inference because of motion
+        self.forced = 0    # Frames sent to inference by the periodic fallback
+        self.check_ms_total = 0.0
+        self.max_gap_s = 0.0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / w
+        small = cv2.resize(frame, (self.width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def check(self, frame, force=False):
+        """
+        Returns (should_infer, roi). roi is (x1, y1, x2, y2) in full-frame pixels when
+        use_roi is enabled and only part of the scene moved, otherwise None.
+        """
+        start = time.perf_counter()
+        self.checked += 1
+        now = time.time()
+        gray, scale = self._prepare(frame)
+
+        should_infer, roi = False, None
+        if force or self.reference is None or gray.shape != self.reference.shape:
+            should_infer = True
+            self.forced += 1
+        elif now - self.last_infer_time >= self.force_interval:
+            should_infer = True
+            self.forced += 1
+        else:
+            diff = cv2.absdiff(gray, self.reference)
+            _, changed = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+            if cv2.countNonZero(changed) >= self.min_area * changed.size:
+                should_infer = True
+                self.passed += 1
+                if self.use_roi:
+                    roi = self._roi(changed, scale, frame.shape)
+
+        if should_infer:
+            if self.last_infer_time:
+                self.max_gap_s = max(self.max_gap_s, now - self.last_infer_time)
+            self.reference = gray
+            self.last_infer_time = now
+
+        self.check_ms_total += (time.perf_counter() - start) * 1000
+        return should_infer, roi
+
+    def _roi(self, changed, scale, shape):
+        x, y, w, h = cv2.boundingRect(cv2.findNonZero(changed))
+        pad_x, pad_y = w * self.roi_padding, h * self.roi_padding
+        frame_h, frame_w = shape[:2]
+        x1 = max(0, int((x - pad_x) / scale))
+        y1 = max(0, int((y - pad_y) / scale))
+        x2 = min(frame_w, int((x + w + pad_x) / scale) + 1)
+        y2 = min(frame_h, int((y + h + pad_y) / scale) + 1)
+        # Not worth cropping if the motion covers most of the frame
+        if (x2 - x1) * (y2 - y1) > 0.6 * frame_w * frame_h:
+            return None
+        return (x1, y1, x2, y2)
+
+    def reset(self):
+        self.reference = None
+        self.last_infer_time = 0.0
+
+    def stats(self):
+        inferred = self.passed + self.forced
+        return {
+            "checked": self.checked,
+            "motion": self.passed,
+            "forced": self.forced,
+            "skipped": self.checked - inferred,
+            "hit_rate": inferred / self.checked if self.checked else 0.0,
+            "check_ms": self.check_ms_total / self.checked if self.checked else 0.0,
+            "max_gap_s": self.max_gap_s,
+        }
@@ -1,73 +1,313 @@
+import json
 import os
+import queue
+import threading
 import time
-from twilio.rest import Client
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import cv2
 from datetime import datetime
-from threading import Thread
+from incident import describe
+from metrics import registry
+
+
+# Transports: anything with a send(message) method that raises on failure
+
+class TwilioTransport:
+    name = "twilio"
+
+    def __init__(self, client, from_number, to_number):
+        self.client = client
+        self.from_number = from_number
+        self.to_number = to_number
+
+    def send(self, message):
+        sent = self.client.messages.create(body=message["text"], from_=self.from_number, to=self.to_number)
+        print(f"SMS sent: {sent.sid}")
+
+
+class FileTransport:
+    """Appends each message as a JSON line. Stand-in for SMS when testing."""
+    name = "file"
+
+    def __init__(self, path="snapshots/alerts.jsonl"):
+        self.path = path
+
+    def send(self, message):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(message) + "\n")
+
+
+class HttpTransport:
+    """POSTs each message as JSON (webhooks, or a local stub server in tests)."""
+    name = "http"
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message):
+        request = urllib.request.Request(self.url, data=json.dumps(message).encode('utf-8'),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise IOError(f"HTTP {response.status}")
+
+
+def twilio_client(sid, token):
+    """twilio is slow to import, so it is only loaded once SMS is actually configured."""
+    from twilio.rest import Client
+    return Client(sid, token)
+
+
+def make_transport(spec):
+    """Build a transport from a config dict like {"type": "file", "path": ...}."""
+    spec = dict(spec)
+    kind = spec.pop("type")
+    if kind == "file":
+        return FileTransport(**spec)
+    if kind == "http":
+        return HttpTransport(**spec)
+    raise ValueError(f"Unknown alert transport: {kind}")
+
+
+class AlertDispatcher:
+    """
+    Delivers alerts through a bounded queue and a fixed pool of sender threads.
+
+    A collector thread takes alerts off the queue, saves their images, and gathers
+    every alert that arrives within `coalesce_window` seconds of the first into one
+    message. Each message is sent to every transport on the worker pool, retrying
+    with exponential backoff. When the queue is full new alerts are dropped (and
+    counted), so an alert storm can never block frame processing or spawn threads.
+    """
+
+    def __init__(self, transports=(), workers=2, max_queue=64, coalesce_window=2.0,
+                 max_retries=4, backoff=1.0, max_backoff=30.0):
+        self.transports = {t.name: t for t in transports}
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alert-sender")
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()  # Cuts delivery retries short on close
+        self._closing = False
+        self._deliveries = []
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        registry.gauge("alert_queue_depth", self.queue.qsize, "Alerts waiting to be coalesced and sent")
+
+        # Stats
+        self.latencies_ms = deque(maxlen=500)  # Alert raised -> delivered
+        self.submitted = 0
+        self.dropped = 0
+        self.messages = 0
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+
+    def add_transport(self, transport):
+        self.transports[transport.name] = transport
+
+    def remove_transport(self, name):
+        self.transports.pop(name, None)
+
+    def submit(self, alert):
+        """Queue an alert dict (stream_id, label, detections, frame, image_path). Never blocks."""
+        alert.setdefault("raised_at", time.time())
+        with self._lock:
+            # Checked under the lock so nothing lands behind close()'s sentinel
+            accepted = not self._closing
+            if accepted:
+                try:
+                    self.queue.put_nowait(alert)
+                except queue.Full:
+                    accepted = False
+            if not accepted:
+                self.dropped += 1
+                registry.counter("alerts_total", "Alerts by outcome", outcome="dropped").inc()
+                return False
+            self.submitted += 1
+        registry.counter("alerts_total", outcome="queued").inc()
+        return True
+
+    def _collect(self):
+        """Coalesce and hand off alerts until close() queues the None sentinel."""
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.time() + self.coalesce_window
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    alert = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if alert is None:
+                    stopping = True  # Send what was collected, then exit
+                    break
+                batch.append(alert)
+            for alert in batch:
+                self._save_image(alert)
+            message = self._format(batch)
+            with self._lock:
+                self.messages += 1
+                self._deliveries = [f for f in self._deliveries if not f.done()]
+                for transport in list(self.transports.values()):
+                    self._deliveries.append(self.pool.submit(self._deliver, transport, message))
+
+    @staticmethod
+    def _save_image(alert):
+        frame = alert.pop("frame", None)
+        if frame is None or not alert.get("image_path"):
+            return
+        # Draw boxes on the frame for the alert image
+        for det in alert["detections"]:
+            x1, y1, x2, y2 = det['box']
+            label = f"{det['label']} {det['confidence']:.2f}"
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        cv2.imwrite(alert["image_path"], frame)
+        print(f"Alert saved: {alert['image_path']}")
+
+    @staticmethod
+    def _format(batch):
+        parts = []
+        for alert in batch:
+            summary = ", ".join(describe(det) for det in alert["detections"]) or alert["label"]
+            if alert.get("stream_id") is not None:
+                summary = f"cam{alert['stream_id']}: {summary}"
+            parts.append(summary)
+        return {
+            "text": f"SECURITY ALERT: {'; '.join(parts)} detected!",
+            "alerts": len(batch),
+            "streams": sorted({a.get("stream_id") for a in batch if a.get("stream_id") is not None}),
+            "labels": sorted({a["label"] for a in batch}),
+            "images": [a["image_path"] for a in batch if a.get("image_path")],
+            "raised_at": min(a["raised_at"] for a in batch),
+        }
+
+    def _deliver(self, transport, message):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                transport.send(message)
+                latency_ms = (time.time() - message["raised_at"]) * 1000
+                with self._lock:
+                    self.delivered += 1
+                    self.latencies_ms.append(latency_ms)
+                registry.observe("alert_delivery_ms", latency_ms, transport=transport.name)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries or self._stop_event.is_set():
+                    print(f"Failed to send alert via {transport.name}: {e}")
+                    break
+                with self._lock:
+                    self.retries += 1
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+        with self._lock:
+            self.failed += 1
+        registry.counter("alerts_total", outcome="failed").inc()
+        return False
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+            return {
+                "queued": self.queue.qsize(),
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "messages": self.messages,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "retries": self.retries,
+                "latency_p50_ms": pick(0.5),
+                "latency_p95_ms": pick(0.95),
+                "latency_max_ms": latencies[-1] if latencies else 0.0,
+            }
+
+    def close(self, timeout=5.0):
+        """
+        Stop taking alerts, let the collector send everything already queued, then give
+        deliveries up to `timeout` before retries are cut short and the workers stop.
+        """
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        self.queue.put(None)  # Behind every accepted alert; the collector drains and exits
+        self._collector.join()
+        with self._lock:
+            deliveries = list(self._deliveries)
+        wait(deliveries, timeout=timeout)
+        self._stop_event.set()
+        self.pool.shutdown(wait=True)
+
 
 class AlertManager:
-    def __init__(self, sms_sid=None, sms_auth=None, sms_from=None, sms_to=None):
-        self.last_alert_time = 0
-        self.alert_cooldown = 10  # seconds
+    def __init__(self, sms_sid=None, sms_auth=None, sms_from=None, sms_to=None, transports=(),
+                 coalesce_window=2.0, image_dir="snapshots"):
+        self.last_alert_times = {}  # (stream_id, label) -> time of the last alert
+        self.alert_cooldown = 10  # seconds, per camera and label
         self.sms_enabled = False
         self.whatsapp_enabled = False
         self.save_enabled = True
-        
+        self.image_dir = image_dir  # Where alert images go (headless: evidence_dir)
+        os.makedirs(image_dir, exist_ok=True)
+        self.dispatcher = AlertDispatcher(transports, coalesce_window=coalesce_window)
+
         # Twilio Config (Placeholders)
         self.account_sid = sms_sid or "AC_YOUR_ACCOUNT_SID"
         self.auth_token = sms_auth or "YOUR_AUTH_TOKEN"
         self.from_number = sms_from or "+1234567890"
         self.to_number = sms_to or "+0987654321"
-        
+
         try:
             if self.account_sid != "AC_YOUR_ACCOUNT_SID":
-                self.client = Client(self.account_sid, self.auth_token)
-                self.sms_enabled = True
+                self.client = twilio_client(self.account_sid, self.auth_token)
+                self.toggle_sms(True)
         except:
             print("Twilio client init failed. SMS disabled.")
             self.sms_enabled = False
 
-    def trigger_alert(self, frame, detection_label, detections):
+    def trigger_alert(self, frame, detection_label, detections, stream_id=None):
         current_time = time.time()
-        if current_time - self.last_alert_time < self.alert_cooldown:
+        key = (stream_id, detection_label)
+        if current_time - self.last_alert_times.get(key, 0) < self.alert_cooldown:
+            registry.counter("alerts_total", outcome="cooldown").inc()
             return False
 
-        self.last_alert_time = current_time
+        self.last_alert_times[key] = current_time
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"snapshots/alert_{timestamp}_{detection_label.replace(' ', '_')}.jpg"
-        
-        # Draw boxes on the frame for the alert image
-        alert_frame = frame.copy()
-        for det in detections:
-            x1, y1, x2, y2 = det['box']
-            label = f"{det['label']} {det['confidence']:.2f}"
-            cv2.rectangle(alert_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(alert_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-        
-        # Save image
-        if self.save_enabled:
-            cv2.imwrite(filename, alert_frame)
-            print(f"Alert saved: {filename}")
-
-        # Send SMS/WhatsApp (Threaded to not block UI)
-        if self.sms_enabled:
-            Thread(target=self._send_twilio, args=(detection_label,)).start()
-            
-        return True
+        camera = "" if stream_id is None else f"cam{stream_id}_"
+        filename = os.path.join(self.image_dir, f"alert_{timestamp}_{camera}{detection_label.replace(' ', '_')}.jpg")
 
-    def _send_twilio(self, label):
-        try:
-            message = self.client.messages.create(
-                body=f"SECURITY ALERT: {label} detected!",
-                from_=self.from_number,
-                to=self.to_number
-            )
-            print(f"SMS sent: {message.sid}")
-        except Exception as e:
-            print(f"Failed to send SMS: {e}")
+        # Drawing, saving and sending all happen on the dispatcher's threads
+        return self.dispatcher.submit({
+            "stream_id": stream_id,
+            "label": detection_label,
+            "detections": [dict(det) for det in detections],
+            "frame": frame.copy(),
+            "image_path": filename if self.save_enabled else None,
+        })
 
     def toggle_sms(self, state):
-        self.sms_enabled = state
+        self.sms_enabled = bool(state)
+        if self.sms_enabled and getattr(self, "client", None):
+            self.dispatcher.add_transport(TwilioTransport(self.client, self.from_number, self.to_number))
+        else:
+            self.dispatcher.remove_transport(TwilioTransport.name)
 
     def set_twilio_config(self, sid, token, from_num, to_num):
         self.account_sid = sid
@@ -75,9 +315,15 @@ class AlertManager:
         self.from_number = from_num
         self.to_number = to_num
         try:
-            self.client = Client(sid, token)
-            self.sms_enabled = True
+            self.client = twilio_client(sid, token)
+            self.toggle_sms(True)
             return True
         except:
-            self.sms_enabled = False
+            self.toggle_sms(False)
             return False
+
+    def stats(self):
+        return self.dispatcher.stats()
+
+    def close(self):
+        self.dispatcher.close()
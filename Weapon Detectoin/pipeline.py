@@ -0,0 +1,582 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import registry
+
+
+class DropOldestQueue:
+    """Bounded FIFO that evicts the oldest item instead of blocking the producer."""
+
+    def __init__(self, maxsize=1, name=None, **labels):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        # Named queues publish their depth and drops to the metrics registry
+        self._dropped_metric = None
+        if name:
+            self._dropped_metric = registry.counter("frames_dropped_total", "Frames evicted from a full queue",
+                                                    queue=name, **labels)
+            registry.gauge("queue_depth", self.qsize, "Items waiting in a pipeline queue", queue=name, **labels)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                if self._dropped_metric:
+                    self._dropped_metric.inc()
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Pop the oldest item, waiting up to `timeout` seconds. Returns None if empty."""
+        with self._cond:
+            if not self._items and timeout != 0:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def drain(self):
+        """Pop everything currently queued (oldest first) without waiting."""
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class FramePacket:
+    """A captured frame plus the bookkeeping needed to measure latency."""
+
+    def __init__(self, frame_id, frame, captured_at, stream_id=0):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.captured_at = captured_at
+        self.stream_id = stream_id
+
+
+class InferenceResult:
+    """Output of the inference stage for one frame."""
+
+    def __init__(self, packet, frame, detections, persons, safe_persons, infer_ms, inferred=True):
+        self.frame_id = packet.frame_id
+        self.stream_id = packet.stream_id
+        self.captured_at = packet.captured_at
+        self.frame = frame  # Privacy-blurred copy of the captured frame
+        self.detections = detections
+        self.persons = persons
+        self.safe_persons = safe_persons  # Unarmed persons (the ones to blur)
+        self.infer_ms = infer_ms
+        self.inferred = inferred  # False when boxes are tracker predictions for a skipped frame
+        self.completed_at = time.time()
+
+    @property
+    def latency_ms(self):
+        return (self.completed_at - self.captured_at) * 1000
+
+
+def skipped_result(detector, packet, safe_persons):
+    """Result for a frame that was not inferred: tracker predictions and the last privacy state."""
+    frame = packet.frame.copy()
+    detector.apply_privacy_blur(frame, safe_persons)
+    return InferenceResult(packet, frame, detector.predict_tracks(packet.stream_id), [],
+                           safe_persons, 0.0, inferred=False)
+
+
+def _outside(box, roi):
+    x1, y1, x2, y2 = box
+    rx1, ry1, rx2, ry2 = roi
+    return x2 <= rx1 or x1 >= rx2 or y2 <= ry1 or y1 >= ry2
+
+
+class CaptureStage(threading.Thread):
+    """Reads a video source as fast as it delivers and publishes every frame to its outputs.
+
+    The outputs are DropOldestQueues, so slow consumers only ever see the latest frames
+    and the camera's own buffer never fills with stale images.
+    """
+
+    def __init__(self, source, outputs, stream_id=0):
+        super().__init__(daemon=True)
+        self.source = source
+        self.outputs = outputs
+        self.stream_id = stream_id
+        self.cap = None
+        self.frame_id = 0
+        self.failed_reads = 0
+        self.finished = False
+        self._stop_event = threading.Event()
+        self._read_ms = registry.histogram("capture_ms", "Time blocked in VideoCapture.read", stream=stream_id)
+        self._captured = registry.counter("frames_total", "Frames by pipeline stage", stage="captured",
+                                          stream=stream_id)
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        # Keep the driver-side buffer as small as possible (not every backend honours this)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def _is_file(self):
+        return isinstance(self.source, str) and os.path.isfile(self.source)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            self._read_ms.observe((time.perf_counter() - start) * 1000)
+            if not ret:
+                self.failed_reads += 1
+                if self._is_file():
+                    # End of a recorded file, not a camera hiccup
+                    break
+                time.sleep(0.01)
+                continue
+
+            self.frame_id += 1
+            self._captured.inc()
+            packet = FramePacket(self.frame_id, frame, time.time(), self.stream_id)
+            for queue in self.outputs:
+                queue.put(packet)
+
+        self.finished = True
+        self.cap.release()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class InferenceStage(threading.Thread):
+    """Runs the detector on the newest captured frame it can get."""
+
+    def __init__(self, detector, inputs, outputs, skip_frames=0, motion_gate=None, scheduler=None):
+        super().__init__(daemon=True)
+        self.detector = detector
+        self.inputs = inputs
+        self.outputs = outputs
+        self.skip_frames = skip_frames
+        self.motion_gate = motion_gate  # Optional MotionGate; None = always infer
+        self.scheduler = scheduler      # Optional InferenceScheduler; replaces skip_frames when set
+        self.force_infer = False  # Set during incident capture to infer every frame
+        self.frames_seen = 0
+        self.frames_inferred = 0
+        self.last_infer_ms = 0.0
+        self.last_safe_persons = []
+        self._stop_event = threading.Event()
+        self._inferred = registry.counter("frames_total", stage="inferred", stream=0)
+        self._skipped = registry.counter("frames_total", stage="skipped", stream=0)
+        self._detections = registry.counter("detections_total", "Weapon detections after filtering", stream=0)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            packet = self.inputs.get(timeout=0.1)
+            if packet is None:
+                continue
+
+            self.frames_seen += 1
+            if not self.detector.model_ready.is_set():
+                continue  # Still loading in the background; display keeps running
+            scheduler = self.scheduler
+            if scheduler is not None:
+                should_infer = self.force_infer or scheduler.should_infer(packet.stream_id)
+            else:
+                should_infer = (self.skip_frames == 0) or \
+                               (self.frames_seen % (self.skip_frames + 1) == 0) or \
+                               self.force_infer
+            roi = None
+            gate = self.motion_gate
+            if should_infer and gate is not None:
+                should_infer, roi = gate.check(packet.frame, force=self.force_infer)
+
+            if not should_infer:
+                # Skipped frame: carry confirmed tracks forward with their predicted boxes
+                self._skipped.inc()
+                self.outputs.put(skipped_result(self.detector, packet, self.last_safe_persons))
+                continue
+
+            # detect() blurs in place; the capture frame is shared with the display queue
+            frame = packet.frame.copy()
+            start = time.perf_counter()
+            try:
+                detections, persons = self.detector.detect(frame, roi=roi)
+            except Exception as e:
+                print(f"Inference error: {e}")
+                continue
+            self.last_infer_ms = (time.perf_counter() - start) * 1000
+            self.frames_inferred += 1
+            self._inferred.inc()
+            self._detections.inc(len(detections))
+            if scheduler is not None:
+                tracks = self.detector.active_detections.get(packet.stream_id, {})
+                scheduler.record(packet.stream_id, self.last_infer_ms, active_tracks=len(tracks))
+            safe_persons = list(self.detector.last_safe_persons)
+            if roi is not None:
+                # People outside the inferred region keep their previous blur
+                carried = [p for p in self.last_safe_persons if _outside(p, roi)]
+                self.detector.apply_privacy_blur(frame, carried)
+                safe_persons += carried
+            self.last_safe_persons = safe_persons
+
+            self.outputs.put(InferenceResult(
+                packet, frame, detections, persons,
+                self.last_safe_persons, self.last_infer_ms
+            ))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FramePipeline:
+    """Capture -> inference -> render pipeline joined by drop-oldest queues.
+
+    The capture thread fans each frame out to a display queue and an inference queue
+    (both hold only the latest frame). The inference thread pushes results into a
+    small result queue. The UI polls `poll_frame()` / `poll_results()` from its own
+    loop, so display rate no longer depends on how long the model takes.
+    """
+
+    def __init__(self, detector, skip_frames=0, result_queue_size=4, motion_gate=None, scheduler=None):
+        self.detector = detector
+        self.motion_gate = motion_gate
+        self.scheduler = scheduler
+        self.display_queue = DropOldestQueue(maxsize=1, name="display", stream=0)
+        self.infer_queue = DropOldestQueue(maxsize=1, name="inference", stream=0)
+        self.result_queue = DropOldestQueue(maxsize=result_queue_size, name="results", stream=0)
+        self.capture = None
+        self.inference = None
+        self._skip_frames = skip_frames
+        self.last_result_latency_ms = 0.0
+
+    def start(self, source=0):
+        self.capture = CaptureStage(source, [self.display_queue, self.infer_queue])
+        if not self.capture.open():
+            self.capture = None
+            return False
+        if self.motion_gate:
+            self.motion_gate.reset()
+        self.inference = InferenceStage(self.detector, self.infer_queue, self.result_queue,
+                                        skip_frames=self._skip_frames, motion_gate=self.motion_gate,
+                                        scheduler=self.scheduler)
+        self.capture.start()
+        self.inference.start()
+        return True
+
+    def stop(self, timeout=2.0):
+        if self.capture:
+            self.capture.stop()
+        if self.inference:
+            self.inference.stop()
+        for stage in (self.capture, self.inference):
+            if stage and stage.is_alive():
+                stage.join(timeout)
+        self.capture = None
+        self.inference = None
+        self.display_queue.drain()
+        self.infer_queue.drain()
+        self.result_queue.drain()
+
+    @property
+    def is_running(self):
+        return self.capture is not None and not self.capture.finished
+
+    def set_skip_frames(self, skip_frames):
+        self._skip_frames = skip_frames
+        if self.inference:
+            self.inference.skip_frames = skip_frames
+
+    def set_motion_gate(self, gate):
+        """Enable (MotionGate) or disable (None) motion-gated inference."""
+        self.motion_gate = gate
+        if self.inference:
+            self.inference.motion_gate = gate
+
+    def set_scheduler(self, scheduler):
+        """Enable (InferenceScheduler) or disable (None, back to skip_frames) adaptive cadence."""
+        self.scheduler = scheduler
+        if self.inference:
+            self.inference.scheduler = scheduler
+
+    def set_force_infer(self, enabled):
+        if self.inference:
+            self.inference.force_infer = enabled
+
+    def poll_frame(self):
+        """Latest captured frame not yet displayed, or None."""
+        return self.display_queue.get(timeout=0)
+
+    def poll_results(self):
+        """All inference results produced since the last poll (oldest first)."""
+        results = self.result_queue.drain()
+        if results:
+            self.last_result_latency_ms = results[-1].latency_ms
+        return results
+
+    def stats(self):
+        capture, inference = self.capture, self.inference
+        return {
+            "captured": capture.frame_id if capture else 0,
+            "inferred": inference.frames_inferred if inference else 0,
+            "dropped_display": self.display_queue.dropped,
+            "dropped_inference": self.infer_queue.dropped,
+            "dropped_results": self.result_queue.dropped,
+            "infer_ms": inference.last_infer_ms if inference else 0.0,
+            "latency_ms": self.last_result_latency_ms,
+            "motion": self.motion_gate.stats() if self.motion_gate else None,
+            "schedule": self.scheduler.stats() if self.scheduler else None,
+        }
+
+
+class BatchInferenceStage(threading.Thread):
+    """Gathers the latest frame from several streams and runs them as one model batch.
+
+    A batch is dispatched as soon as `batch_size` streams have a fresh frame, or when
+    `max_wait_ms` has passed since the first frame of the batch arrived.
+    """
+
+    def __init__(self, detector, inputs, outputs, batch_size=4, max_wait_ms=20, target_fps=None,
+                 motion_gates=None, scheduler=None, forced=None):
+        super().__init__(daemon=True)
+        self.motion_gates = motion_gates or {}  # stream_id -> MotionGate
+        self.scheduler = scheduler
+        self.forced = forced if forced is not None else set()  # Streams to infer every frame (incident capture)
+        self.detector = detector
+        self.inputs = inputs  # stream_id -> DropOldestQueue
+        self.outputs = outputs
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.target_fps = target_fps  # Upper bound on batches per second (None = as fast as possible)
+        self.batches = 0
+        self.frames_inferred = 0
+        self.last_batch_size = 0
+        self.last_infer_ms = 0.0
+        self._offset = 0  # Round-robin start so no stream is always last in line
+        self._stop_event = threading.Event()
+
+    def _gather(self):
+        batch = {}
+        deadline = None
+        stream_ids = list(self.inputs.keys())
+        limit = min(self.batch_size, len(stream_ids))
+
+        while not self._stop_event.is_set():
+            n = len(stream_ids)
+            for k in range(n):
+                stream_id = stream_ids[(self._offset + k) % n]
+                if stream_id in batch:
+                    continue
+                packet = self.inputs[stream_id].get(timeout=0)
+                if packet is not None:
+                    batch[stream_id] = packet
+                    if len(batch) >= limit:
+                        break
+
+            if batch and deadline is None:
+                deadline = time.perf_counter() + self.max_wait_ms / 1000
+            if len(batch) >= limit or (deadline and time.perf_counter() >= deadline):
+                break
+            time.sleep(0.002)
+
+        self._offset = (self._offset + 1) % max(1, len(stream_ids))
+        return batch
+
+    def run(self):
+        while not self._stop_event.is_set():
+            cycle_start = time.perf_counter()
+            batch = self._gather()
+            if not batch or not self.detector.model_ready.is_set():
+                continue  # Frames gathered while the model is still loading are dropped
+
+            # Streams that aren't due, or whose scene hasn't changed, skip the model this round
+            rois = {}
+            for stream_id in list(batch.keys()):
+                gate = self.motion_gates.get(stream_id)
+                forced = stream_id in self.forced
+                due = forced or self.scheduler is None or self.scheduler.should_infer(stream_id)
+                if due and gate is not None:
+                    due, rois[stream_id] = gate.check(batch[stream_id].frame, force=forced)
+                if not due:
+                    registry.counter("frames_total", stage="skipped", stream=stream_id).inc()
+                    packet = batch.pop(stream_id)
+                    safe_persons = self.detector.stream_safe_persons.get(stream_id, [])
+                    self.outputs.put(skipped_result(self.detector, packet, safe_persons))
+            if not batch:
+                continue
+
+            stream_ids = list(batch.keys())
+            frames = [batch[sid].frame.copy() for sid in stream_ids]
+            previous = {sid: self.detector.stream_safe_persons.get(sid, []) for sid in stream_ids}
+            start = time.perf_counter()
+            try:
+                outputs = self.detector.detect_batch(frames, stream_ids, [rois.get(sid) for sid in stream_ids])
+            except Exception as e:
+                print(f"Batch inference error: {e}")
+                continue
+            self.last_infer_ms = (time.perf_counter() - start) * 1000
+            self.last_batch_size = len(frames)
+            self.batches += 1
+            self.frames_inferred += len(frames)
+            if self.scheduler is not None:
+                # Batched frames share the call's cost equally
+                per_frame_ms = self.last_infer_ms / len(frames)
+                for stream_id in stream_ids:
+                    tracks = self.detector.active_detections.get(stream_id, {})
+                    self.scheduler.record(stream_id, per_frame_ms, active_tracks=len(tracks))
+
+            registry.observe("batch_size", len(frames), buckets=(1, 2, 4, 8, 16, 32))
+            for stream_id, frame in zip(stream_ids, frames):
+                out = outputs[stream_id]
+                roi = rois.get(stream_id)
+                if roi is not None:
+                    # People outside the inferred region keep their previous blur
+                    carried = [p for p in previous[stream_id] if _outside(p, roi)]
+                    self.detector.apply_privacy_blur(frame, carried)
+                    out['safe_persons'] = out['safe_persons'] + carried
+                    self.detector.stream_safe_persons[stream_id] = out['safe_persons']
+                registry.counter("frames_total", stage="inferred", stream=stream_id).inc()
+                registry.counter("detections_total", stream=stream_id).inc(len(out['detections']))
+                self.outputs.put(InferenceResult(
+                    batch[stream_id], frame, out['detections'], out['persons'],
+                    out['safe_persons'], self.last_infer_ms
+                ))
+
+            if self.target_fps:
+                remaining = 1.0 / self.target_fps - (time.perf_counter() - cycle_start)
+                if remaining > 0:
+                    self._stop_event.wait(remaining)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class MultiSourceManager:
+    """Runs N capture stages feeding one batched inference stage.
+
+    Sources can be device indices, file paths or RTSP URLs. Results from every stream
+    come back through a single queue, tagged with their stream_id.
+    """
+
+    def __init__(self, detector, batch_size=4, max_wait_ms=20, result_queue_size=32,
+                 target_fps=None, display=True, motion_gate_factory=None, scheduler=None):
+        self.detector = detector
+        self.scheduler = scheduler  # Optional InferenceScheduler shared by every stream
+        self.motion_gate_factory = motion_gate_factory  # e.g. MotionGate; called once per stream
+        self.motion_gates = {}
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.target_fps = target_fps
+        self.display = display  # False when nothing will poll_frame() (headless)
+        self.sources = {}          # stream_id -> source
+        self.captures = {}         # stream_id -> CaptureStage
+        self.display_queues = {}   # stream_id -> DropOldestQueue
+        self.infer_queues = {}     # stream_id -> DropOldestQueue
+        self.result_queue = DropOldestQueue(maxsize=result_queue_size, name="results")
+        self.forced = set()        # stream_ids inferred on every frame, ignoring gate and cadence
+        self.inference = None
+
+    def add_source(self, source, stream_id=None):
+        if stream_id is None:
+            stream_id = len(self.sources)
+        self.sources[stream_id] = source
+        return stream_id
+
+    def start(self):
+        """Open every source and start the stages. Returns the stream_ids that failed to open."""
+        failed = []
+        for stream_id, source in self.sources.items():
+            self.infer_queues[stream_id] = DropOldestQueue(maxsize=1, name="inference", stream=stream_id)
+            outputs = [self.infer_queues[stream_id]]
+            if self.display:
+                self.display_queues[stream_id] = DropOldestQueue(maxsize=1, name="display", stream=stream_id)
+                outputs.append(self.display_queues[stream_id])
+            capture = CaptureStage(source, outputs, stream_id=stream_id)
+            if not capture.open():
+                print(f"Failed to open source {source!r} (stream {stream_id})")
+                failed.append(stream_id)
+                del self.infer_queues[stream_id]
+                continue
+            self.captures[stream_id] = capture
+            if self.motion_gate_factory:
+                self.motion_gates[stream_id] = self.motion_gate_factory()
+
+        if not self.captures:
+            return failed
+
+        self.inference = BatchInferenceStage(self.detector, self.infer_queues, self.result_queue,
+                                             batch_size=self.batch_size, max_wait_ms=self.max_wait_ms,
+                                             target_fps=self.target_fps, motion_gates=self.motion_gates,
+                                             scheduler=self.scheduler, forced=self.forced)
+        for capture in self.captures.values():
+            capture.start()
+        self.inference.start()
+        return failed
+
+    def stop(self, timeout=2.0):
+        stages = list(self.captures.values()) + ([self.inference] if self.inference else [])
+        for stage in stages:
+            stage.stop()
+        for stage in stages:
+            if stage.is_alive():
+                stage.join(timeout)
+        self.captures = {}
+        self.inference = None
+
+    @property
+    def is_running(self):
+        return any(not c.finished for c in self.captures.values())
+
+    def set_batching(self, batch_size=None, max_wait_ms=None):
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if max_wait_ms is not None:
+            self.max_wait_ms = max_wait_ms
+        if self.inference:
+            self.inference.batch_size = self.batch_size
+            self.inference.max_wait_ms = self.max_wait_ms
+
+    def update_threat(self, stream_id, level):
+        if self.scheduler:
+            self.scheduler.update_threat(stream_id, level)
+
+    def set_force_infer(self, stream_id, enabled):
+        """Infer every frame of one stream (e.g. during incident capture), bypassing gating and cadence."""
+        if enabled:
+            self.forced.add(stream_id)
+        else:
+            self.forced.discard(stream_id)
+
+    def poll_frame(self, stream_id):
+        queue = self.display_queues.get(stream_id)
+        return queue.get(timeout=0) if queue else None
+
+    def poll_results(self):
+        return self.result_queue.drain()
+
+    def stats(self):
+        inference = self.inference
+        return {
+            "streams": {
+                stream_id: {
+                    "captured": capture.frame_id,
+                    "dropped_display": self.display_queues[stream_id].dropped if self.display else 0,
+                    "dropped_inference": self.infer_queues[stream_id].dropped,
+                    "motion": self.motion_gates[stream_id].stats() if stream_id in self.motion_gates else None,
+                }
+                for stream_id, capture in self.captures.items()
+            },
+            "batches": inference.batches if inference else 0,
+            "inferred": inference.frames_inferred if inference else 0,
+            "last_batch_size": inference.last_batch_size if inference else 0,
+            "infer_ms": inference.last_infer_ms if inference else 0.0,
+            "dropped_results": self.result_queue.dropped,
+            "schedule": self.scheduler.stats() if self.scheduler else None,
+        }
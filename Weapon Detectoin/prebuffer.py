@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class PreEventBuffer:
+    """
+    Rolling buffer of the last `seconds` of one camera, kept as JPEG bytes.
+
+    Fed with processed frames (privacy filter already applied, annotated), the same
+    frames the post-event shots use. Every frame can be offered via add(), but only
+    `fps` frames per second are encoded, on a background thread so the caller (the Tk
+    main loop in the GUI) never waits on JPEG encoding. Frames older than `seconds` are
+    dropped, and so are the oldest frames whenever the buffer would exceed `max_bytes`,
+    which makes memory per camera a hard, configurable cap. snapshot() hands the frames
+    over and empties the buffer, so back-to-back incidents never store the same frames.
+    """
+
+    def __init__(self, seconds=5.0, fps=5.0, max_bytes=16 * 1024 * 1024, quality=80, max_width=1280):
+        self.seconds = seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.max_width = max_width  # Wider frames are shrunk before encoding (None keeps full size)
+
+        self.frames = deque()       # (captured_at, jpeg bytes), oldest first
+        self.bytes = 0
+        self._last_put = 0.0
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=2)  # Frames waiting for the encoder thread
+        self._encoder = None
+
+        # Stats
+        self.encoded = 0
+        self.dropped = 0            # Offered while the encoder was still busy
+        self.evicted_age = 0
+        self.evicted_memory = 0
+        self.encode_ms_total = 0.0
+
+    def add(self, frame, captured_at):
+        """Offer a processed frame. Returns at once; the encode runs on the buffer's own thread."""
+        if captured_at - self._last_put < 1.0 / self.fps:
+            return
+        self._last_put = captured_at
+        if self._encoder is None:
+            self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+            self._encoder.start()
+        try:
+            # Copy: the caller keeps using its frame after we return
+            self._pending.put_nowait((frame.copy(), captured_at))
+        except queue.Full:
+            self.dropped += 1
+
+    def _encode_loop(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                self._encode(*item)
+            finally:
+                self._pending.task_done()
+
+    def _encode(self, frame, captured_at):
+        start = time.perf_counter()
+        h, w = frame.shape[:2]
+        if self.max_width and w > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(h * self.max_width / w)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        data = buffer.tobytes()
+        self.encode_ms_total += (time.perf_counter() - start) * 1000
+        self.encoded += 1
+
+        with self._lock:
+            self.frames.append((captured_at, data))
+            self.bytes += len(data)
+            self._evict(captured_at)
+
+    def flush(self):
+        """Wait until every offered frame is encoded."""
+        if self._encoder is not None:
+            self._pending.join()
+
+    def close(self):
+        """Stop the encoder thread (frames still queued are encoded first)."""
+        if self._encoder is not None:
+            self._pending.put(None)
+            self._encoder.join()
+            self._encoder = None
+
+    def _evict(self, now):
+        while self.frames and now - self.frames[0][0] > self.seconds:
+            self.bytes -= len(self.frames.popleft()[1])
+            self.evicted_age += 1
+        while self.frames and self.bytes > self.max_bytes:
+            self.bytes -= len(self.frames.popleft()[1])
+            self.evicted_memory += 1
+
+    def snapshot(self):
+        """Buffered (captured_at, jpeg bytes) pairs, oldest first. Empties the buffer."""
+        with self._lock:
+            frames = list(self.frames)
+            self.frames.clear()
+            self.bytes = 0
+            return frames
+
+    def clear(self):
+        with self._lock:
+            self.frames.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            span = self.frames[-1][0] - self.frames[0][0] if len(self.frames) > 1 else 0.0
+            return {
+                "frames": len(self.frames),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "span_s": span,
+                "evicted_age": self.evicted_age,
+                "evicted_memory": self.evicted_memory,
+                "dropped": self.dropped,
+                "encode_ms": self.encode_ms_total / self.encoded if self.encoded else 0.0,
+            }
+
@@ -0,0 +1,135 @@
+import threading
+import time
+
+
+class StreamSchedule:
+    """Per-stream cadence state kept by the InferenceScheduler."""
+
+    def __init__(self):
+        self.latency_ms = None     # EMA of measured inference latency
+        self.threat_level = 0.0
+        self.active_tracks = 0
+        self.last_activity = 0.0   # Last time the stream had a threat or a track
+        self.last_infer = 0.0
+        self.rate = 0.0            # Granted inferences per second
+        self.state = 'normal'
+        self.inferred = 0
+        self.deferred = 0
+
+
+class InferenceScheduler:
+    """
+    Adaptive inference cadence driven by measured latency, threat level and a shared budget.
+
+    Each stream asks for `alert_fps` while its threat level is elevated or a track is
+    active, `quiet_fps` once it has been calm for `quiet_after` seconds, and
+    `normal_fps` otherwise. Demands are converted to compute time with the stream's
+    measured latency; when the total exceeds `compute_budget` (seconds of inference
+    per wall-clock second, summed over all streams), alert streams are served first
+    and the rest of the budget is water-filled fairly over the remaining streams.
+    Under load every stream slows down instead of latency piling up.
+    """
+
+    def __init__(self, compute_budget=0.8, quiet_fps=2.0, normal_fps=5.0, alert_fps=15.0,
+                 quiet_after=10.0, min_fps=0.5, smoothing=0.2):
+        self.compute_budget = compute_budget
+        self.quiet_fps = quiet_fps
+        self.normal_fps = normal_fps
+        self.alert_fps = alert_fps
+        self.quiet_after = quiet_after
+        self.min_fps = min_fps       # Floor so no stream is ever starved completely
+        self.smoothing = smoothing   # EMA factor for latency
+        self.streams = {}
+        self._lock = threading.Lock()
+
+    def _stream(self, stream_id):
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            stream = self.streams[stream_id] = StreamSchedule()
+            stream.last_activity = time.time()
+            self._rebalance()
+        return stream
+
+    def should_infer(self, stream_id, now=None):
+        """True if the stream is due for an inference. Call once per candidate frame."""
+        now = now or time.time()
+        with self._lock:
+            stream = self._stream(stream_id)
+            # Until we have a latency measurement, infer so we get one
+            if stream.latency_ms is None or now - stream.last_infer >= 1.0 / max(stream.rate, 1e-6):
+                stream.last_infer = now
+                stream.inferred += 1
+                return True
+            stream.deferred += 1
+            return False
+
+    def record(self, stream_id, infer_ms, active_tracks=None):
+        """Report the latency of an inference (per frame, for batched calls)."""
+        with self._lock:
+            stream = self._stream(stream_id)
+            if stream.latency_ms is None:
+                stream.latency_ms = infer_ms
+            else:
+                stream.latency_ms += self.smoothing * (infer_ms - stream.latency_ms)
+            if active_tracks is not None:
+                stream.active_tracks = active_tracks
+                if active_tracks:
+                    stream.last_activity = time.time()
+            self._rebalance()
+
+    def update_threat(self, stream_id, threat_level):
+        with self._lock:
+            stream = self._stream(stream_id)
+            stream.threat_level = threat_level
+            if threat_level > 0:
+                stream.last_activity = time.time()
+            self._rebalance()
+
+    def _demand_fps(self, stream, now):
+        if stream.threat_level > 0 or stream.active_tracks:
+            stream.state = 'alert'
+            return self.alert_fps
+        if now - stream.last_activity >= self.quiet_after:
+            stream.state = 'quiet'
+            return self.quiet_fps
+        stream.state = 'normal'
+        return self.normal_fps
+
+    def _rebalance(self):
+        now = time.time()
+        budget = self.compute_budget
+        demands = {}  # stream_id -> (fps wanted, seconds per inference)
+        for stream_id, stream in self.streams.items():
+            cost = (stream.latency_ms or 1.0) / 1000
+            demands[stream_id] = (self._demand_fps(stream, now), cost)
+
+        # Alert streams are served first
+        alert = [sid for sid, s in self.streams.items() if s.state == 'alert']
+        rest = [sid for sid in self.streams if sid not in alert]
+        for group in (alert, rest):
+            budget = self._water_fill(group, demands, budget)
+
+    def _water_fill(self, group, demands, budget):
+        """Max-min fair split of `budget` compute-seconds over the group. Returns what is left."""
+        pending = sorted(group, key=lambda sid: demands[sid][0] * demands[sid][1])
+        while pending:
+            share = max(budget, 0.0) / len(pending)
+            sid = pending.pop(0)
+            fps, cost = demands[sid]
+            granted = min(fps * cost, share)
+            self.streams[sid].rate = max(self.min_fps, granted / cost)
+            budget -= granted
+        return budget
+
+    def stats(self):
+        with self._lock:
+            return {
+                stream_id: {
+                    "state": s.state,
+                    "rate_fps": s.rate,
+                    "latency_ms": s.latency_ms or 0.0,
+                    "inferred": s.inferred,
+                    "deferred": s.deferred,
+                }
+                for stream_id, s in self.streams.items()
+            }
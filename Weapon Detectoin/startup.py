@@ -0,0 +1,120 @@
+"""
+Startup timing, so watchdog restarts stay short.
+
+Import this first; it starts the clock. Entry points wrap their heavy imports in
+`startup.importing(name)` and call `startup.mark(milestone)` as the app comes up.
+Once every expected milestone is in, the report (each time against its target) is
+printed and exported as startup_*_ms gauges.
+
+    python startup.py    # Cold import cost of each heavy dependency, in fresh interpreters
+"""
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+START = time.perf_counter()
+
+# Targets in ms since process start (milestones) or for the import alone
+IMPORT_TARGETS_MS = {
+    "customtkinter": 400,
+    "cv2": 400,
+    "PIL": 150,
+    "app modules": 300,   # Our own modules; nothing heavy at import time
+}
+MILESTONE_TARGETS_MS = {
+    "imports": 1200,          # All module-level imports done
+    "window": 2000,           # UI built (GUI) / runner constructed (headless)
+    "first_frame": 3000,      # First camera frame on screen (GUI) / all sources open (headless)
+    "model_ready": 10000,     # Weights loaded and warmed up (in the background)
+    "first_inference": 12000,
+}
+
+# Cold-import check for `python startup.py`: module -> whether it is on the startup path
+DEPENDENCIES = {
+    "customtkinter": True,
+    "PIL.ImageTk": True,
+    "cv2": True,
+    "numpy": True,
+    "ultralytics": False,   # Imported by backends.make_model on the model-loading thread
+    "twilio.rest": False,   # Only when SMS is configured
+    "onnxruntime": False,
+    "openvino": False,
+}
+
+
+class StartupReport:
+    def __init__(self, expected=tuple(MILESTONE_TARGETS_MS)):
+        self.expected = expected
+        self.imports = {}     # name -> ms
+        self.milestones = {}  # name -> ms since process start
+        self.reported = False
+
+    @contextmanager
+    def importing(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.imports[name] = (time.perf_counter() - start) * 1000
+
+    def mark(self, milestone):
+        """Record a milestone once; prints the report when the last expected one arrives."""
+        if milestone in self.milestones:
+            return
+        self.milestones[milestone] = (time.perf_counter() - START) * 1000
+        if not self.reported and all(m in self.milestones for m in self.expected):
+            self.reported = True
+            print(self.report())
+            self.export()
+
+    def export(self):
+        from metrics import registry
+        for name, ms in self.imports.items():
+            registry.gauge("startup_import_ms", help_text="Module import time at startup",
+                           module=name).set(ms)
+        for name, ms in self.milestones.items():
+            registry.gauge("startup_ms", help_text="Milestone time since process start",
+                           milestone=name).set(ms)
+
+    def report(self):
+        lines = ["Startup report (ms):"]
+        for name, ms in self.imports.items():
+            lines.append(_row(f"import {name}", ms, IMPORT_TARGETS_MS.get(name)))
+        for name, ms in sorted(self.milestones.items(), key=lambda item: item[1]):
+            lines.append(_row(name, ms, MILESTONE_TARGETS_MS.get(name)))
+        return "\n".join(lines)
+
+
+def _row(name, ms, target):
+    if target is None:
+        return f"  {name:<24} {ms:8.0f}"
+    return f"  {name:<24} {ms:8.0f}  target {target:>6}  {'ok' if ms <= target else 'OVER'}"
+
+
+def cold_import_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter (python -X importtime), or None."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+startup = StartupReport()
+
+
+def main():
+    print(f"{'module':<16} {'cold ms':>8}  on startup path")
+    for module, eager in DEPENDENCIES.items():
+        ms = cold_import_ms(module)
+        shown = "missing" if ms is None else f"{ms:.0f}"
+        print(f"{module:<16} {shown:>8}  {'yes' if eager else 'no (lazy)'}")
+
+
+if __name__ == "__main__":
+    main()
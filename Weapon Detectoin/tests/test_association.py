@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from benchmark import StubModel
+from detector import WeaponDetector
+
+
+@pytest.fixture
+def detector():
+    return WeaponDetector(model=StubModel())
+
+
+def random_boxes(rng, n, size):
+    # Coarse integer grid so shared and touching edges come up often
+    x1 = rng.integers(0, 20, n) * 10
+    y1 = rng.integers(0, 20, n) * 10
+    return np.stack([x1, y1, x1 + rng.integers(1, size, n) * 10, y1 + rng.integers(1, size, n) * 10], axis=1)
+
+
+def legacy_iou(a, b):
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    inter = max(0, iw) * max(0, ih)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def test_matrix_matches_pairwise_loop(detector):
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        persons = random_boxes(rng, rng.integers(0, 12), 8).tolist()
+        weapons = random_boxes(rng, rng.integers(0, 6), 3).tolist()
+        intersects, iou, owner = detector.associate(persons, weapons)
+
+        assert intersects.shape == iou.shape == (len(persons), len(weapons))
+        for i, p in enumerate(persons):
+            # The old per-person check: armed if touching any weapon, edges included
+            assert intersects[i].any() == any(detector._boxes_intersect(p, w) for w in weapons)
+            for j, w in enumerate(weapons):
+                assert intersects[i, j] == detector._boxes_intersect(p, w)
+                assert iou[i, j] == pytest.approx(legacy_iou(p, w), abs=1e-6)
+
+        for j, w in enumerate(weapons):
+            touching = [i for i, p in enumerate(persons) if detector._boxes_intersect(p, w)]
+            if not touching:
+                assert owner[j] == -1
+                continue
+            area = max((w[2] - w[0]) * (w[3] - w[1]), 1)
+            cover = lambda i: max(0, min(persons[i][2], w[2]) - max(persons[i][0], w[0])) * \
+                max(0, min(persons[i][3], w[3]) - max(persons[i][1], w[1])) / area
+            assert owner[j] in touching
+            assert cover(owner[j]) == pytest.approx(max(cover(i) for i in touching))
+
+
+def test_edge_contact_counts_as_intersecting(detector):
+    intersects, iou, owner = detector.associate([(0, 0, 100, 200)], [(100, 50, 130, 80)])
+    assert intersects[0, 0] and iou[0, 0] == 0 and owner[0] == 0
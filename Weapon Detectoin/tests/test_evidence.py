@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from evidence import EvidenceLocker
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def meta(k):
+    return [{'label': 'knife', 'confidence': 0.9, 'box': [10, 10, 20 + k, 30]}]
+
+
+def legacy_secure(evidence_dir, image, detection_meta, incident_id, shot_index):
+    """What the original locker did: imwrite, hash the file and rewrite the whole JSON array."""
+    chain_file = os.path.join(evidence_dir, "chain_log.json")
+    chain = []
+    if os.path.exists(chain_file):
+        with open(chain_file) as f:
+            chain = json.load(f)
+    save_dir = os.path.join(evidence_dir, incident_id)
+    os.makedirs(save_dir, exist_ok=True)
+    filename = f"evidence_{shot_index}.jpg"
+    cv2.imwrite(os.path.join(save_dir, filename), image)
+    with open(os.path.join(save_dir, filename), 'rb') as f:
+        image_bytes = f.read()
+
+    data_block = {
+        "timestamp": f"2025-01-01T00:00:0{shot_index}",
+        "filename": os.path.join(incident_id, filename),
+        "incident_id": incident_id,
+        "meta": detection_meta,
+        "previous_hash": chain[-1]['current_hash'] if chain else "0" * 64,
+    }
+    hasher = hashlib.sha256(image_bytes)
+    hasher.update(json.dumps(data_block, sort_keys=True).encode('utf-8'))
+    chain.append({"index": len(chain), "timestamp": data_block["timestamp"], "data": data_block,
+                  "current_hash": hasher.hexdigest()})
+    with open(chain_file, 'w') as f:
+        json.dump(chain, f, indent=4)
+    return chain
+
+
+@pytest.fixture
+def legacy_dir(tmp_path):
+    evidence_dir = str(tmp_path / "evidence")
+    os.makedirs(evidence_dir)
+    for k in range(3):
+        chain = legacy_secure(evidence_dir, frame(40 * k), meta(k), "incident_a", k)
+    return evidence_dir, chain
+
+
+def test_legacy_chain_migrates_unchanged_and_keeps_growing(legacy_dir):
+    evidence_dir, legacy_chain = legacy_dir
+    locker = EvidenceLocker(evidence_dir)
+
+    assert not os.path.exists(os.path.join(evidence_dir, "chain_log.json"))
+    assert os.path.exists(os.path.join(evidence_dir, "chain_log.json.migrated"))
+    assert list(locker.iter_chain()) == legacy_chain
+    assert (locker.next_index, locker.last_hash) == (3, legacy_chain[-1]['current_hash'])
+
+    entry = locker.secure_evidence(frame(200), meta(3), incident_id="incident_a", shot_index=3)
+    assert entry['index'] == 3 and entry['data']['previous_hash'] == legacy_chain[-1]['current_hash']
+    locker.close()
+    assert EvidenceLocker(evidence_dir).verify_integrity(full=True, workers=1)[0]
+
+
+def test_migration_runs_once(legacy_dir):
+    evidence_dir, _ = legacy_dir
+    EvidenceLocker(evidence_dir).close()
+    # A stray legacy file next to the new log is left alone
+    legacy_secure(evidence_dir, frame(9), meta(9), "incident_b", 9)
+    locker = EvidenceLocker(evidence_dir)
+    assert locker.next_index == 3
+    assert os.path.exists(os.path.join(evidence_dir, "chain_log.json"))
+
+
+def test_unreadable_legacy_chain_is_not_migrated(tmp_path, capsys):
+    evidence_dir = str(tmp_path)
+    with open(os.path.join(evidence_dir, "chain_log.json"), 'w') as f:
+        f.write('[{"index": 0, ')
+    locker = EvidenceLocker(evidence_dir)
+    assert "Could not migrate" in capsys.readouterr().out
+    assert not os.path.exists(locker.chain_file) and locker.next_index == 0
+
+
+@pytest.mark.parametrize("checkpoint_interval", [100, 2])
+def test_partial_last_line_is_truncated(tmp_path, checkpoint_interval):
+    evidence_dir = str(tmp_path)
+    locker = EvidenceLocker(evidence_dir, checkpoint_interval=checkpoint_interval)
+    entries = [locker.secure_evidence(frame(k), meta(k), incident_id="i", shot_index=k) for k in range(3)]
+    locker.close()
+    good_size = os.path.getsize(locker.chain_file)
+    with open(locker.chain_file, 'ab') as f:
+        f.write(b'{"index": 3, "timestamp": "2025')  # Crash mid-append
+
+    locker = EvidenceLocker(evidence_dir, checkpoint_interval=checkpoint_interval)
+    assert os.path.getsize(locker.chain_file) == good_size
+    assert (locker.next_index, locker.last_hash) == (3, entries[-1]['current_hash'])
+
+    entry = locker.secure_evidence(frame(3), meta(3), incident_id="i", shot_index=3)
+    assert entry['index'] == 3
+    locker.close()
+    assert [e['index'] for e in locker.iter_chain()] == [0, 1, 2, 3]
+    assert locker.verify_integrity(full=True, workers=1)[0]
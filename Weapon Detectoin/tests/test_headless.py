@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import headless
+from pipeline import FramePacket, InferenceResult
+
+
+def knife(hits):
+    return {'label': 'knife', 'confidence': 0.9, 'box': (40, 40, 80, 120), 'person': None,
+            'track_id': 1, 'hits': hits, 'confirmed': hits >= 5}
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(headless, "build_detector", lambda config, load_async=True: None)
+    config = headless.load_config(None)
+    config.update(sources=[0], evidence_dir=str(tmp_path / "evidence"), evidence_mode="both",
+                  clip_seconds=0.5, clip_fps=10.0, pre_event_seconds=1.0, pre_event_fps=10.0)
+    runner = headless.HeadlessRunner(config)
+    yield runner
+    runner.pre_events[0].close()
+    if runner.clip_encoder:
+        runner.clip_encoder.close()
+    runner.alerter.close()
+    runner.evidence_locker.close()
+
+
+def feed(runner, frames, start=1000.0, fps=10.0):
+    for i in range(frames):
+        packet = FramePacket(i + 1, np.full((240, 320, 3), i, dtype=np.uint8), start + i / fps, stream_id=0)
+        detections = [knife(hits=i + 1)] if i >= 3 else []
+        runner.process_result(InferenceResult(packet, packet.frame.copy(), detections, [], [], 5.0))
+        runner.pre_events[0].flush()  # Frames arrive far slower than this loop in real use
+
+
+def test_escalation_secures_pre_event_burst_and_clip(runner):
+    feed(runner, 20)
+    state = runner.threats[0]
+    assert state.escalated
+    incident_id = state.current_incident_id
+    assert incident_id
+
+    runner.clip_encoder.close()
+    runner.evidence_locker.close()
+    files = [entry["data"]["filename"] for entry in runner.evidence_locker.iter_chain()
+             if entry["data"]["incident_id"] == incident_id]
+    assert any(f.endswith("clip.avi") for f in files)
+    assert sum("pre_event_" in f for f in files) >= 3
+    assert sum("evidence_" in f for f in files) == state.burst_size
+    ok, message = runner.evidence_locker.verify_integrity(workers=1)
+    assert ok, message
+
+
+def test_incident_capture_forces_inference(runner):
+    feed(runner, 10)  # Escalates on frame 9; burst still running
+    assert runner.threats[0].incident_capture_active
+    assert runner.manager.forced == {0}
+    feed(runner, 10, start=1001.0)
+    assert not runner.threats[0].incident_capture_active
+    assert runner.manager.forced == set()
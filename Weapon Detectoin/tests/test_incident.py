@@ -0,0 +1,30 @@
+from incident import ThreatState
+
+
+def knife(hits, predicted=False):
+    det = {'label': 'knife', 'confidence': 0.9, 'box': (40, 40, 80, 120), 'person': None,
+           'track_id': 1, 'hits': hits, 'confirmed': hits >= 5}
+    if predicted:
+        det['predicted'] = True
+    return det
+
+
+def test_predicted_boxes_do_not_escalate():
+    state = ThreatState(escalation_frames=5)
+    assert not state.update([knife(1)]) and not state.update([knife(2)])
+    for _ in range(20):  # Gated/throttled frames carry the track forward
+        assert not state.update([knife(2, predicted=True)])
+    assert state.threat_persistence[1] == 2
+    assert abs(state.current_threat_level - 0.2) < 1e-9
+
+
+def test_unconfirmed_track_does_not_escalate():
+    state = ThreatState(escalation_frames=5)
+    threats = [state.update([dict(knife(4), confirmed=False)]) for _ in range(8)]
+    assert not any(threats)
+
+
+def test_confirmed_track_escalates_after_persistence():
+    state = ThreatState(escalation_frames=5)
+    threats = [state.update([knife(hits)]) for hits in range(1, 8)]
+    assert [bool(t) for t in threats] == [False] * 5 + [True, True]
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+
+from prebuffer import PreEventBuffer
+
+
+def test_snapshot_hands_over_frames_once():
+    buffer = PreEventBuffer(seconds=5.0, fps=4.0)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    for i in range(5):
+        buffer.add(frame, 100.0 + i * 0.25)
+        buffer.flush()
+    first = buffer.snapshot()
+    assert [t for t, _ in first] == [100.0 + i * 0.25 for i in range(5)]
+    assert buffer.snapshot() == [] and buffer.bytes == 0
+
+    buffer.add(frame, 102.0)
+    buffer.flush()
+    assert [t for t, _ in buffer.snapshot()] == [102.0]
+    buffer.close()
+
+
+def test_add_copies_the_frame():
+    buffer = PreEventBuffer(fps=10.0)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    buffer.add(frame, 100.0)
+    frame[:] = 255  # Caller keeps drawing on its frame
+    buffer.close()
+    (_, data), = buffer.snapshot()
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).max() < 16
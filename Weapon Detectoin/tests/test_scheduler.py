@@ -0,0 +1,68 @@
+import pytest
+
+from scheduler import InferenceScheduler
+
+
+def scheduler_with(latencies_ms, budget, alert=(), **kwargs):
+    scheduler = InferenceScheduler(compute_budget=budget, **kwargs)
+    for stream_id, ms in enumerate(latencies_ms):
+        scheduler.record(stream_id, ms, active_tracks=1 if stream_id in alert else 0)
+    return scheduler
+
+
+def rates(scheduler):
+    return [scheduler.streams[sid].rate for sid in sorted(scheduler.streams)]
+
+
+def compute(scheduler):
+    """Inference seconds per wall-clock second at the granted rates."""
+    return sum(s.rate * s.latency_ms / 1000 for s in scheduler.streams.values())
+
+
+def reference_fill(demands, budget):
+    """Max-min fair compute shares by bisecting on the water level."""
+    if sum(demands) <= budget:
+        return list(demands)
+    low, high = 0.0, max(demands)
+    for _ in range(100):
+        level = (low + high) / 2
+        low, high = (level, high) if sum(min(d, level) for d in demands) < budget else (low, level)
+    return [min(d, low) for d in demands]
+
+
+def test_everyone_gets_their_demand_under_budget():
+    scheduler = scheduler_with([20, 30, 40], budget=1.0)
+    assert rates(scheduler) == pytest.approx([5.0, 5.0, 5.0])  # normal_fps
+
+
+def test_overload_is_water_filled_fairly():
+    latencies = [10, 50, 100, 200]
+    scheduler = scheduler_with(latencies, budget=0.6, min_fps=0.0)
+    expected = reference_fill([5.0 * ms / 1000 for ms in latencies], 0.6)
+    granted = [rate * ms / 1000 for rate, ms in zip(rates(scheduler), latencies)]
+    assert granted == pytest.approx(expected, rel=1e-6)
+    assert compute(scheduler) == pytest.approx(0.6)
+    # The cheap stream keeps its full cadence; the expensive ones share the rest equally
+    assert rates(scheduler)[0] == pytest.approx(5.0)
+    assert granted[2] == pytest.approx(granted[3])
+
+
+def test_alert_streams_are_served_first():
+    scheduler = scheduler_with([100, 100, 100], budget=1.0, alert={2}, min_fps=0.0)
+    quiet, normal, alert = rates(scheduler)
+    assert alert == pytest.approx(10.0)  # Wants 15 fps but the whole budget is 10
+    assert quiet == normal == 0.0
+
+
+def test_min_fps_floor_can_exceed_the_budget():
+    # Starved streams still get min_fps, even though that costs more than the budget
+    scheduler = scheduler_with([100, 100, 100], budget=1.0, alert={2}, min_fps=0.5)
+    assert rates(scheduler) == pytest.approx([0.5, 0.5, 10.0])
+    assert compute(scheduler) == pytest.approx(1.1)
+
+
+def test_should_infer_follows_granted_rate():
+    scheduler = scheduler_with([100], budget=0.2)  # 2 fps
+    start = 1000.0
+    due = [scheduler.should_infer(0, now=start + k * 0.1) for k in range(20)]
+    assert sum(due) == 4  # Every 0.5 s over 2 s
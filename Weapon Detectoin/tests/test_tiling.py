@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+from benchmark import STUB_NAMES, StubBoxes, StubResult
+from detector import WeaponDetector
+
+PERSON, KNIFE = 0, 43
+
+
+class ResolutionModel:
+    """
+    Finds flat grey blobs (persons) and white squares (knives) in each image, but only
+    those at least `min_side` pixels across once the image is scaled to imgsz, the way
+    a real model loses small objects. Counts the pixels it was fed.
+    """
+
+    names = STUB_NAMES
+
+    def __init__(self, min_side=8):
+        self.min_side = min_side
+        self.pixels = 0
+
+    def __call__(self, source, imgsz=640, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        results = []
+        for image in images:
+            self.pixels += WeaponDetector._model_pixels(image.shape, imgsz)
+            scale = imgsz / max(image.shape[:2])
+            xyxy, cls = [], []
+            for value, cls_id in ((128, PERSON), (255, KNIFE)):
+                mask = (image[:, :, 0] == value).astype(np.uint8)
+                n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+                for x, y, w, h, _ in stats[1:n]:
+                    if min(w, h) * scale >= self.min_side:
+                        xyxy.append((x, y, x + w, y + h))
+                        cls.append(cls_id)
+            results.append(StubResult(StubBoxes(np.array(xyxy, np.float32).reshape(-1, 4),
+                                                np.array(cls, np.float32), np.full(len(cls), 0.9, np.float32))))
+        return results
+
+
+def scene(people):
+    """1080p frame with distant people, each holding a 12 px knife."""
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    for x, y in people:
+        frame[y:y + 160, x:x + 60] = 128
+        frame[y + 60:y + 72, x + 62:x + 74] = 255
+    return frame
+
+
+def knives_found(detector, frame):
+    detector.model.pixels = 0
+    (xyxy, cls_ids, _), = detector._run([frame], [None])
+    return int((cls_ids == KNIFE).sum()), detector.model.pixels
+
+
+def make_detector(**tiled):
+    detector = WeaponDetector(model=ResolutionModel())
+    if tiled:
+        detector.set_tiled_mode(True, **tiled)
+    return detector
+
+
+def test_640_misses_small_knife_that_1280_finds():
+    frame = scene([(400, 300)])
+    assert knives_found(make_detector(), frame)[0] == 0
+    detector = make_detector()
+    detector.set_high_res_mode(True)
+    assert knives_found(detector, frame)[0] == 1
+
+
+def test_person_tiles_match_1280_recall_at_lower_cost():
+    frame = scene([(400, 300)])
+    high_res = make_detector()
+    high_res.set_high_res_mode(True)
+    found_1280, cost_1280 = knives_found(high_res, frame)
+    found, cost = knives_found(make_detector(focus='persons'), frame)
+    assert found == found_1280 == 1
+    assert cost < cost_1280
+
+
+def test_tile_budget_caps_cost_at_1280_pass():
+    frame = scene([(100 + 300 * k, 200 + 100 * (k % 3)) for k in range(6)])
+    high_res = make_detector()
+    high_res.set_high_res_mode(True)
+    cost_1280 = knives_found(high_res, frame)[1]
+    for focus in ('persons', 'all'):
+        assert knives_found(make_detector(focus=focus), frame)[1] <= cost_1280
+        uncapped = make_detector(focus=focus)
+        uncapped.tile_budget = None
+        assert knives_found(uncapped, frame)[1] > cost_1280
+
+
+def test_zones_keep_recall_where_they_are_watched():
+    # Two people far apart; the budget only affords one tile, the zone picks which
+    frame = scene([(300, 300), (1500, 600)])
+    zone = [(1400, 500), (1700, 500), (1700, 900), (1400, 900)]
+    for focus in ('persons', 'all'):
+        detector = make_detector(focus=focus, zones=[zone])
+        (xyxy, cls_ids, _), = detector._run([frame], [None])
+        knives = xyxy[cls_ids == KNIFE]
+        assert len(knives) == 1 and knives[0][0] > 1400
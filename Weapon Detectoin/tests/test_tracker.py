@@ -0,0 +1,77 @@
+from tracker import Tracker
+
+
+def det(box, label='knife', confidence=0.9):
+    return {'label': label, 'confidence': confidence, 'box': box, 'person': None}
+
+
+def moving(x, y=100):
+    return det((x, y, x + 40, y + 80))
+
+
+def test_moving_object_keeps_its_track():
+    tracker = Tracker()
+    ids = [tracker.update([moving(100 + 8 * i)])[0]['track_id'] for i in range(10)]
+    assert set(ids) == {ids[0]}
+    assert tracker.tracks[0].hits == 10
+
+
+def test_label_flicker_keeps_track_and_majority_label():
+    tracker = Tracker()
+    labels = ['knife', 'knife', 'scissors', 'knife', 'scissors', 'knife']
+    ids = {tracker.update([dict(moving(100 + 4 * i), label=label)])[0]['track_id'] for i, label in enumerate(labels)}
+    assert len(ids) == 1
+    assert tracker.tracks[0].label == 'knife'
+
+
+def test_two_objects_match_by_highest_iou():
+    tracker = Tracker()
+    first = tracker.update([moving(100), moving(400)])
+    a, b = first[0]['track_id'], first[1]['track_id']
+    # Same objects, reported in the other order and slightly moved
+    second = tracker.update([moving(405), moving(104)])
+    assert (second[0]['track_id'], second[1]['track_id']) == (b, a)
+
+
+def test_far_detection_starts_a_new_track():
+    tracker = Tracker(iou_threshold=0.3)
+    a = tracker.update([moving(100)])[0]['track_id']
+    b = tracker.update([moving(600)])[0]['track_id']
+    assert a != b and len(tracker.tracks) == 2
+
+
+def test_track_dropped_after_max_age_missed_frames():
+    tracker = Tracker(max_age=3)
+    tracker.update([moving(100)])
+    tracker.update([moving(104)])
+    for _ in range(3):
+        assert tracker.predict()  # Still within max_age
+    assert not tracker.predict() and not tracker.tracks
+
+
+def test_update_without_match_ages_tracks_too():
+    tracker = Tracker(max_age=2)
+    tracker.update([moving(100)])
+    for _ in range(2):
+        tracker.update([])
+    assert tracker.tracks
+    tracker.update([])
+    assert not tracker.tracks
+
+
+def test_predict_carries_only_tracks_with_min_hits():
+    tracker = Tracker(min_hits=3)
+    tracker.update([moving(100), moving(400)])
+    tracker.update([moving(104)])
+    tracker.update([moving(108)])
+    predicted = tracker.predict()
+    assert len(predicted) == 1
+    assert predicted[0]['predicted'] and predicted[0]['hits'] == 3
+
+
+def test_prediction_follows_velocity():
+    tracker = Tracker()
+    for i in range(8):
+        tracker.update([moving(100 + 10 * i)])
+    x1 = tracker.predict()[0]['box'][0]
+    assert 170 < x1 < 195  # Last seen at 170, moving ~10 px per frame
@@ -0,0 +1,82 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from workers import SharedFrameRing
+
+SHAPE = (120, 160, 3)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create(SHAPE, slots=4)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def frame(value, shape=SHAPE):
+    return np.full(shape, value % 256, dtype=np.uint8)
+
+
+def test_reader_gets_exactly_what_was_written(ring):
+    # The same bytes the supervisor used to get by pickling the frame through the queue
+    reader = SharedFrameRing.attach(ring.name, ring.shape, ring.slots)
+    image = np.random.default_rng(0).integers(0, 256, SHAPE, dtype=np.uint8)
+    seq = ring.write(image)
+    copy = reader.read(seq)
+    assert np.array_equal(copy, image)
+    ring.write(frame(1))  # A private copy is unaffected by later writes
+    assert np.array_equal(copy, image)
+    reader.close()
+
+
+def test_lapped_frames_are_reported_lost(ring):
+    seqs = [ring.write(frame(k)) for k in range(6)]
+    assert ring.read(seqs[0]) is None and ring.read(seqs[1]) is None
+    assert [ring.read(s)[0, 0, 0] for s in seqs[2:]] == [2, 3, 4, 5]
+    assert ring.view(seqs[1]) is None
+
+
+def test_slot_being_written_is_not_readable(ring):
+    seq = ring.write(frame(7))
+    ring._seqs[seq % ring.slots] = -1  # What a writer caught mid-copy looks like
+    assert ring.view(seq) is None and ring.read(seq) is None
+
+
+def test_other_sizes_are_resized_into_the_slot(ring):
+    seq = ring.write(frame(9, (240, 320, 3)))
+    assert ring.read(seq).shape == SHAPE
+
+
+def _writer(name, shape, slots, latest, stop):
+    ring = SharedFrameRing.attach(name, shape, slots)
+    while not stop.value:
+        # Fill each frame with its own sequence number
+        latest.value = ring.write(np.full(shape, ring._next % 256, dtype=np.uint8))
+    ring.close()
+
+
+def test_concurrent_reads_are_never_torn(ring):
+    ctx = mp.get_context("spawn")
+    latest, stop = ctx.RawValue('q', -1), ctx.RawValue('b', 0)
+    writer = ctx.Process(target=_writer, args=(ring.name, ring.shape, ring.slots, latest, stop), daemon=True)
+    writer.start()
+    try:
+        read = lost = 0
+        while read < 300 and read + lost < 20000:
+            seq = latest.value
+            if seq < 0:
+                continue
+            copy = ring.read(seq)
+            if copy is None:
+                lost += 1
+                continue
+            # Every pixel from the one write of `seq`: nothing torn, nothing from a later lap
+            assert (copy == seq % 256).all()
+            read += 1
+        assert read > 0
+    finally:
+        stop.value = 1
+        writer.join(10)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from benchmark import StubModel, legacy_check_zone, make_boxes, make_zones
+from detector import WeaponDetector
+
+geometry = pytest.importorskip("shapely.geometry")
+
+SHAPE = (720, 1280, 3)
+
+
+@pytest.fixture
+def detector():
+    return WeaponDetector(model=StubModel())
+
+
+def test_center_test_matches_shapely_away_from_edges(detector):
+    zones = make_zones(10)
+    detector.set_zones(zones)
+    polygons = [geometry.Polygon(z) for z in zones]
+    boxes = make_boxes(500, weapon_ratio=1.0, seed=7).xyxy.array.astype(np.int32)
+
+    raster = detector._in_zone_mask(boxes, SHAPE)
+    for box, inside in zip(boxes.tolist(), raster):
+        center = geometry.Point((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        if min(p.exterior.distance(center) for p in polygons) <= 1.5:
+            continue  # Within a pixel of an edge: see the boundary test below
+        assert inside == legacy_check_zone(polygons, box)
+
+
+def test_center_on_boundary_counts_as_inside(detector):
+    # Shapely's contains() excludes the boundary; the filled raster includes it
+    square = [(100, 100), (200, 100), (200, 200), (100, 200)]
+    detector.set_zones([square])
+    on_edge = np.array([[90, 140, 110, 160], [180, 190, 220, 210]])
+    assert detector._in_zone_mask(on_edge, SHAPE).tolist() == [True, True]
+    assert not any(legacy_check_zone([geometry.Polygon(square)], box) for box in on_edge.tolist())
+
+
+def test_coverage_matches_shapely_area(detector):
+    zones = make_zones(5)
+    detector.set_zones(zones)
+    union = geometry.MultiPolygon([geometry.Polygon(z) for z in zones]).buffer(0)
+    boxes = make_boxes(200, weapon_ratio=1.0, seed=11).xyxy.array.astype(np.int32)
+
+    coverage = detector.zone_coverage(boxes, SHAPE)
+    for box, fraction in zip(boxes.tolist(), coverage):
+        rect = geometry.box(*box)
+        expected = rect.intersection(union).area / rect.area
+        # Edge pixels count as inside the raster, so it runs a little high on small boxes
+        assert abs(fraction - expected) <= 0.1
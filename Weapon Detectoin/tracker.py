@@ -0,0 +1,161 @@
+from collections import Counter
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    inter_w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class KalmanBoxTrack:
+    """
+    Constant-velocity Kalman filter over [cx, cy, area, aspect, vx, vy, v_area] (as in SORT).
+    """
+
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, track_id, det):
+        self.id = track_id
+        self.x = np.zeros(7)
+        self.x[:4] = self._to_z(det['box'])
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+        self.labels = Counter([det['label']])
+        self.last_det = det
+
+    @staticmethod
+    def _to_z(box):
+        x1, y1, x2, y2 = box
+        w, h = max(1.0, x2 - x1), max(1.0, y2 - y1)
+        return np.array([x1 + w / 2, y1 + h / 2, w * h, w / h])
+
+    def box(self):
+        cx, cy, area, aspect = self.x[:4]
+        area = max(area, 1.0)
+        w = np.sqrt(area * aspect)
+        h = area / max(w, 1e-6)
+        return (int(cx - w / 2), int(cy - h / 2), int(cx + w / 2), int(cy + h / 2))
+
+    @property
+    def label(self):
+        # Majority vote, so one frame of knife<->scissors flicker doesn't change the track
+        return self.labels.most_common(1)[0][0]
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        self.age += 1
+        self.time_since_update += 1
+
+    def update(self, det):
+        z = self._to_z(det['box'])
+        y = z - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+
+        self.hits += 1
+        self.time_since_update = 0
+        self.labels[det['label']] += 1
+        self.last_det = det
+
+
+class Tracker:
+    """
+    Lightweight SORT-style multi-object tracker for weapon detections.
+
+    Call update() with every inferred frame's detections and predict() on frames
+    that were skipped. Detections are matched to tracks by IoU regardless of label.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=15, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age   # Frames a track survives without a matching detection
+        self.min_hits = min_hits # Hits before a track is carried over skipped frames
+        self.tracks = []
+        self._next_id = 1
+
+    def _match(self, detections):
+        """Greedy highest-IoU-first matching. Returns (matches, unmatched_det_indices)."""
+        if not self.tracks or not detections:
+            return [], list(range(len(detections)))
+
+        iou = iou_matrix([t.box() for t in self.tracks], [d['box'] for d in detections])
+        matches = []
+        used_tracks, used_dets = set(), set()
+        for flat in np.argsort(-iou, axis=None):
+            t_idx, d_idx = np.unravel_index(flat, iou.shape)
+            if iou[t_idx, d_idx] < self.iou_threshold:
+                break
+            if t_idx in used_tracks or d_idx in used_dets:
+                continue
+            used_tracks.add(t_idx)
+            used_dets.add(d_idx)
+            matches.append((int(t_idx), int(d_idx)))
+        return matches, [i for i in range(len(detections)) if i not in used_dets]
+
+    def update(self, detections):
+        """Associate detections with tracks. Adds 'track_id' and 'hits' to each detection dict."""
+        for track in self.tracks:
+            track.predict()
+
+        matches, unmatched = self._match(detections)
+        for t_idx, d_idx in matches:
+            track = self.tracks[t_idx]
+            track.update(detections[d_idx])
+            detections[d_idx]['track_id'] = track.id
+            detections[d_idx]['hits'] = track.hits
+
+        for d_idx in unmatched:
+            track = KalmanBoxTrack(self._next_id, detections[d_idx])
+            self._next_id += 1
+            self.tracks.append(track)
+            detections[d_idx]['track_id'] = track.id
+            detections[d_idx]['hits'] = track.hits
+
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+        return detections
+
+    def predict(self):
+        """Advance every track one frame without a detection and return the confirmed ones."""
+        predicted = []
+        for track in self.tracks:
+            track.predict()
+            if track.hits >= self.min_hits and track.time_since_update <= self.max_age:
+                predicted.append({
+                    'label': track.label,
+                    'confidence': track.last_det['confidence'],
+                    'box': track.box(),
+                    'person': None,
+                    'track_id': track.id,
+                    'hits': track.hits,
+                    'predicted': True
+                })
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+        return predicted
+
+    def active(self):
+        """track_id -> hits for every live track."""
+        return {t.id: t.hits for t in self.tracks}
+
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,341 @@
+"""
+Multi-process camera workers, so detection scales past one core's worth of Python.
+
+Each worker process runs the usual capture -> batched inference pipeline (its own
+WeaponDetector, post-processing and privacy blur) for a share of the cameras. Processed
+frames come back through one shared-memory ring per camera; only small result
+messages (detections, boxes, timings) are pickled. The supervisor in the main process
+restarts a worker that crashes or stops heart-beating, without touching the others.
+"""
+import multiprocessing as mp
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from pipeline import FramePacket, InferenceResult
+
+
+class SharedFrameRing:
+    """
+    `slots` frames of one fixed shape in a single shared_memory block.
+
+    Layout: one int64 sequence number per slot, then the frames. There is one writer;
+    a slot's sequence number is cleared while it is written, and readers compare it
+    before and after copying (a seqlock), so a frame overwritten mid-read is reported
+    as lost instead of returned torn.
+    """
+
+    def __init__(self, shm, shape, slots):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=slots * 8)
+        self._next = 0
+
+    @classmethod
+    def create(cls, shape, slots=4):
+        shm = shared_memory.SharedMemory(create=True, size=slots * 8 + slots * int(np.prod(shape)))
+        ring = cls(shm, shape, slots)
+        ring._seqs[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots):
+        return cls(shared_memory.SharedMemory(name=name), shape, slots)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Copy a frame into the next slot (resized if the source changed size). Returns its sequence number."""
+        seq = self._next
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        if frame.shape == self.shape:
+            np.copyto(self._frames[slot], frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self._frames[slot])
+        self._seqs[slot] = seq
+        self._next += 1
+        return seq
+
+    def view(self, seq):
+        """Zero-copy view of frame `seq`, or None if it was already overwritten. Valid until the writer laps it."""
+        slot = seq % self.slots
+        return self._frames[slot] if self._seqs[slot] == seq else None
+
+    def read(self, seq):
+        """Private copy of frame `seq`, or None if it was overwritten before or during the copy."""
+        view = self.view(seq)
+        if view is None:
+            return None
+        frame = view.copy()
+        return frame if self._seqs[seq % self.slots] == seq else None
+
+    def close(self):
+        self._seqs = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A caller still holds a view; the mapping goes when it does
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _worker_main(worker_id, config, sources, results, control, heartbeat, dropped, stop):
+    """Worker process: run the pipeline for `sources` and publish results."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is the supervisor's to handle
+    from headless import build_detector, build_manager, parse_source
+
+    detector = build_detector(config, load_async=False)
+    manager = build_manager(config, detector)
+    for stream_id, source in sources:
+        manager.add_source(parse_source(source), stream_id=stream_id)
+    failed = manager.start()
+    results.put(('started', worker_id, failed))
+
+    rings = {}  # stream_id -> SharedFrameRing
+    slots = config["worker_ring_slots"]
+    while not stop.value and manager.is_running:
+        heartbeat.value = time.time()
+        while True:
+            try:
+                kind, stream_id, value = control.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'threat' and manager.scheduler:
+                manager.scheduler.update_threat(stream_id, value)
+            elif kind == 'force':
+                manager.set_force_infer(stream_id, value)
+
+        for result in manager.poll_results():
+            ring = rings.get(result.stream_id)
+            if ring is None:
+                # Sized by the first processed frame; the supervisor attaches on this message
+                ring = rings[result.stream_id] = SharedFrameRing.create(result.frame.shape, slots)
+                results.put(('ring', result.stream_id, ring.name, ring.shape, slots))
+            seq = ring.write(result.frame)
+            try:
+                results.put_nowait(('result', result.stream_id, seq, result.frame_id, result.captured_at,
+                                    result.detections, result.persons, result.safe_persons,
+                                    result.infer_ms, result.inferred))
+            except queue.Full:
+                dropped.value += 1
+        time.sleep(0.005)
+
+    manager.stop()
+    results.put(('stopped', worker_id, None))
+    for ring in rings.values():
+        ring.close()  # Unlinking is the supervisor's job, crashed or not
+
+
+class CameraSupervisor:
+    """
+    Runs the cameras in `workers` processes (sources assigned round-robin).
+
+    Same interface as MultiSourceManager (add_source, start, poll_results, update_threat,
+    set_force_infer, stats, stop, is_running), so HeadlessRunner can use either. poll_results() also supervises:
+    a worker that exits unexpectedly, or stops heart-beating for `hang_timeout`
+    seconds, is killed and restarted with exponential backoff. Each worker has its
+    own queues, so one dying mid-write can't wedge the others.
+    """
+
+    def __init__(self, config, workers=2, result_queue_size=256, hang_timeout=30.0,
+                 max_backoff=30.0, start_timeout=120.0):
+        self.config = config
+        self.result_queue_size = result_queue_size
+        self.hang_timeout = hang_timeout
+        self.max_backoff = max_backoff
+        self.start_timeout = start_timeout  # Workers load their model before reporting in
+
+        self.sources = {}   # stream_id -> source
+        self.rings = {}     # stream_id -> attached SharedFrameRing
+        self.workers = [{"id": i, "sources": [], "process": None, "restarts": 0, "backoff": 1.0,
+                         "restart_at": 0.0, "started": False, "finished": False, "failed": []}
+                        for i in range(workers)]
+        self._ctx = mp.get_context("spawn")  # No forking a process that runs threads
+        # Shared flags and counters are lock-free RawValues (one writer each): a worker
+        # killed while holding a lock or waiting on an Event would otherwise hang us
+        self._stop = self._ctx.RawValue('b', False)
+        self.frames_lost = 0  # Ring slots overwritten before the supervisor read them
+        self._early = []      # Results that arrived while start() was waiting
+
+    def add_source(self, source, stream_id=None):
+        if stream_id is None:
+            stream_id = len(self.sources)
+        self.sources[stream_id] = source
+        return stream_id
+
+    def start(self):
+        """Start every worker and wait until each reports in. Returns the stream_ids that failed to open."""
+        for i, (stream_id, source) in enumerate(self.sources.items()):
+            self.workers[i % len(self.workers)]["sources"].append((stream_id, source))
+        self.workers = [w for w in self.workers if w["sources"]]
+        for worker in self.workers:
+            self._spawn(worker)
+
+        deadline = time.time() + self.start_timeout
+        while time.time() < deadline and not all(w["started"] or not w["process"].is_alive()
+                                                 for w in self.workers):
+            self._early += self._drain()
+            time.sleep(0.05)
+        failed = [sid for w in self.workers for sid in w["failed"]]
+        failed += [sid for w in self.workers if not w["started"] for sid, _ in w["sources"]]
+        return failed
+
+    def _spawn(self, worker):
+        worker["results"] = self._ctx.Queue(maxsize=self.result_queue_size)
+        worker["control"] = self._ctx.Queue()
+        worker["heartbeat"] = self._ctx.RawValue('d', time.time())
+        worker["dropped"] = self._ctx.RawValue('i', 0)
+        worker["started"] = False
+        worker["started_at"] = time.time()
+        worker["process"] = self._ctx.Process(
+            target=_worker_main, name=f"camera-worker-{worker['id']}", daemon=True,
+            args=(worker["id"], self.config, worker["sources"], worker["results"], worker["control"],
+                  worker["heartbeat"], worker["dropped"], self._stop))
+        worker["process"].start()
+
+    def _drain(self):
+        results = []
+        for worker in self.workers:
+            if worker["process"] is None:
+                continue
+            while True:
+                try:
+                    message = worker["results"].get_nowait()
+                except (queue.Empty, EOFError, OSError):
+                    break
+                result = self._handle(worker, message)
+                if result is not None:
+                    results.append(result)
+        return results
+
+    def _handle(self, worker, message):
+        kind = message[0]
+        if kind == 'result':
+            _, stream_id, seq, frame_id, captured_at, detections, persons, safe_persons, infer_ms, inferred = message
+            ring = self.rings.get(stream_id)
+            frame = ring.read(seq) if ring else None
+            if frame is None:
+                self.frames_lost += 1
+                return None
+            return InferenceResult(FramePacket(frame_id, frame, captured_at, stream_id), frame, detections,
+                                   persons, safe_persons, infer_ms, inferred=inferred)
+        if kind == 'ring':
+            _, stream_id, name, shape, slots = message
+            self._release_ring(stream_id)
+            self.rings[stream_id] = SharedFrameRing.attach(name, shape, slots)
+        elif kind == 'started':
+            worker["started"] = True
+            worker["failed"] = message[2]
+        elif kind == 'stopped':
+            worker["finished"] = True  # Its sources ended; not a crash
+        return None
+
+    def _release_ring(self, stream_id):
+        ring = self.rings.pop(stream_id, None)
+        if ring:
+            ring.close()
+            ring.unlink()
+
+    def _supervise(self):
+        now = time.time()
+        for worker in self.workers:
+            process = worker["process"]
+            if worker["finished"] or self._stop.value:
+                continue
+            if process is None:
+                if now >= worker["restart_at"]:
+                    self._spawn(worker)
+                continue
+            hung = worker["started"] and now - worker["heartbeat"].value > self.hang_timeout
+            if process.is_alive() and not hung:
+                if now - worker["started_at"] > 60:
+                    worker["backoff"] = 1.0  # Stable again
+                continue
+
+            reason = "stopped responding" if hung else f"exited with code {process.exitcode}"
+            print(f"Camera worker {worker['id']} {reason}; restarting in {worker['backoff']:.0f}s")
+            if process.is_alive():
+                process.kill()
+            process.join(1.0)
+            self._discard(worker)
+            worker["restarts"] += 1
+            worker["restart_at"] = now + worker["backoff"]
+            worker["backoff"] = min(worker["backoff"] * 2, self.max_backoff)
+
+    def _discard(self, worker):
+        """Drop a dead worker's queues and rings (it can't unlink them itself)."""
+        for q in (worker["results"], worker["control"]):
+            q.cancel_join_thread()
+            q.close()
+        for stream_id, _ in worker["sources"]:
+            self._release_ring(stream_id)
+        worker["process"] = None
+
+    def poll_results(self):
+        results, self._early = self._early, []
+        results += self._drain()
+        self._supervise()
+        return results
+
+    def _control(self, stream_id, kind, value):
+        """Send a control message to the worker that runs `stream_id`."""
+        for worker in self.workers:
+            if worker["process"] is not None and any(sid == stream_id for sid, _ in worker["sources"]):
+                worker["control"].put_nowait((kind, stream_id, value))
+                return
+
+    def update_threat(self, stream_id, level):
+        """Forward a stream's threat level to the scheduler in the worker that runs it."""
+        self._control(stream_id, 'threat', level)
+
+    def set_force_infer(self, stream_id, enabled):
+        """Infer every frame of `stream_id` in its worker (incident capture)."""
+        self._control(stream_id, 'force', enabled)
+
+    @property
+    def is_running(self):
+        return not self._stop.value and any(not w["finished"] for w in self.workers)
+
+    def stats(self):
+        return {
+            "workers": [{
+                "id": w["id"],
+                "pid": w["process"].pid if w["process"] else None,
+                "alive": bool(w["process"] and w["process"].is_alive()),
+                "streams": [sid for sid, _ in w["sources"]],
+                "restarts": w["restarts"],
+                "dropped_results": w["dropped"].value if w["process"] else 0,
+            } for w in self.workers],
+            "frames_lost": self.frames_lost,
+        }
+
+    def stop(self, timeout=5.0):
+        self._stop.value = True
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            process = worker["process"]
+            if process is None:
+                continue
+            # Keep draining so a worker blocked on a full queue can finish
+            while process.is_alive() and time.time() < deadline:
+                self._drain()
+                process.join(0.05)
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+            self._discard(worker)
+        for stream_id in list(self.rings):
+            self._release_ring(stream_id)